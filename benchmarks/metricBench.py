@@ -0,0 +1,240 @@
+"""Latency, throughput and memory benchmarks for the fairness metrics and model backends.
+
+    python -m benchmarks.metricBench run --pairs 512 --calls 200 --batch-sizes 1,8,32,128
+    python -m benchmarks.metricBench compare reports/benchmark_<old>.json reports/benchmark_<new>.json
+
+Each metric runs in a fresh interpreter so cold start (import + model load +
+first call) and peak RSS are measured per backend rather than accumulated.
+Synthetic pair sets are built from data/counterfactual_pairs.json by varying
+the queries and taking MockRAGClient responses. Caches are turned off unless
+--with-caches is passed, so warm numbers are model time, not cache hits.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# numpy and utilities.* are imported inside the functions, so a child process
+# has imported nothing of the code under test before it starts measuring.
+BASE = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE / "data"
+REPORTS_DIR = BASE / "reports"
+PREFIX = "benchmark_"
+DEFAULT_BATCH_SIZES = (1, 8, 32, 128)
+
+# Larger is worse for these fields; throughput ("pairs_per_s") is the opposite.
+COST_FIELDS = ("cold_start_s", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+
+
+def synthetic_pairs(n: int, source=DATA_DIR / "counterfactual_pairs.json") -> List[Tuple[str, str]]:
+    """n distinct (response_a, response_b) text pairs derived from the pair file.
+
+    Uses MockRAGClient directly rather than fairnessEval, which would import metricsUtils.
+    """
+    from utilities.pairLoader import load_pairs
+    from utilities.rag_clientSample import MockRAGClient
+    base = load_pairs(source)
+    client = MockRAGClient()
+    texts = {}
+
+    def text(q):
+        if q not in texts:
+            texts[q] = client.query(q).text
+        return texts[q]
+    pairs = [(p["query_a"], p["query_b"]) for i in range(-(-n // len(base))) for p in base][:n]
+    return [(f"{text(a)} Ref {i}.", f"{text(b)} Ref {i}.") for i, (a, b) in enumerate(pairs)]
+
+
+def _bench_functions() -> Dict[str, Tuple[Callable, Callable]]:
+    """name -> (single-pair call, batch call over a list of pairs)."""
+    from utilities import metricsUtils as mu
+    from utilities.lexiconUtil import SENSITIVE_LEXICON as terms
+    return {
+        "SPS": (lambda p: mu.semantic_parity_score(*p), mu.semantic_parity_scores),
+        "SPG": (lambda p: mu.sentiment_polarity_gap(*p), mu.sentiment_polarity_gaps),
+        "BLF": (lambda p: mu.bias_lexicon_frequency_gap(*p, terms),
+                lambda ps: mu.bias_lexicon_frequency_gaps(ps, terms)),
+        "LES": (lambda p: mu.language_equivalence_score(*p), mu.language_equivalence_scores),
+        "Toxicity": (lambda p: mu.toxicity_gap(*p), mu.toxicity_gaps),
+    }
+
+
+BENCHMARKS = ("import", "SPS", "SPG", "BLF", "LES", "Toxicity")
+
+
+def _percentiles_ms(seconds: Sequence[float]) -> Dict[str, float]:
+    import numpy as np
+    ms = np.asarray(seconds, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 4), "p95_ms": round(float(p95), 4), "p99_ms": round(float(p99), 4)}
+
+
+def bench_import() -> dict:
+    t0 = time.perf_counter()
+    import utilities.metricsUtils  # noqa: F401
+    cold = round(time.perf_counter() - t0, 4)
+    from utilities.modelRegistry import peak_rss_mb
+    return {"cold_start_s": cold, "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_metric(name: str, pairs: Sequence[Tuple[str, str]], calls: int,
+                 batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES) -> dict:
+    """Cold start, warm single-pair latency and batch throughput of one metric.
+
+    Meant to run in a fresh process: cold_start_s covers importing metricsUtils,
+    loading the model and the first call.
+    """
+    t0 = time.perf_counter()
+    single, batch = _bench_functions()[name]
+    single(pairs[0])
+    out = {"cold_start_s": round(time.perf_counter() - t0, 4)}
+
+    times = []
+    for i in range(calls):
+        pair = pairs[1 + i % (len(pairs) - 1)] if len(pairs) > 1 else pairs[0]
+        t = time.perf_counter()
+        single(pair)
+        times.append(time.perf_counter() - t)
+    out.update(_percentiles_ms(times))
+
+    throughput = {}
+    for size in batch_sizes:
+        chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+        t = time.perf_counter()
+        for chunk in chunks:
+            batch(chunk)
+        throughput[str(size)] = round(len(pairs) / max(time.perf_counter() - t, 1e-9), 2)
+    out["pairs_per_s"] = throughput
+    from utilities.modelRegistry import peak_rss_mb
+    out["peak_rss_mb"] = peak_rss_mb()
+    return out
+
+
+def _child(name: str, n_pairs: int, calls: int, batch_sizes: Sequence[int]) -> dict:
+    if name == "import":
+        return bench_import()
+    pairs = synthetic_pairs(max(2, n_pairs))
+    return bench_metric(name, pairs, calls, batch_sizes)
+
+
+def run_isolated(name: str, n_pairs: int, calls: int, batch_sizes: Sequence[int], with_caches: bool) -> dict:
+    env = dict(os.environ, FAIRNESS_DAEMON="0")  # measure the in-process path, not a running daemon
+    if not with_caches:
+        env["FAIRNESS_EMBEDDING_CACHE"] = "0"
+        env["FAIRNESS_SENTIMENT_CACHE_MAX"] = "0"
+    cmd = [sys.executable, "-m", "benchmarks.metricBench", "_child", name, "--pairs", str(n_pairs),
+           "--calls", str(calls), "--batch-sizes", ",".join(map(str, batch_sizes))]
+    proc = subprocess.run(cmd, cwd=str(BASE), env=env, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        tail = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+        return {"error": tail}
+    return json.loads(lines[-1])
+
+
+def run(names: Sequence[str] = BENCHMARKS, n_pairs: int = 512, calls: int = 200,
+        batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES, with_caches: bool = False) -> dict:
+    import numpy as np
+    return {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count(), "numpy": np.__version__},
+        "config": {"pairs": n_pairs, "calls": calls, "batch_sizes": list(batch_sizes),
+                   "with_caches": with_caches},
+        "results": {name: run_isolated(name, n_pairs, calls, batch_sizes, with_caches) for name in names},
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.10) -> List[dict]:
+    """Regressions of current vs baseline beyond `tolerance` (relative).
+
+    Costs (cold start, latency percentiles, peak RSS) regress when they grow,
+    throughput when it drops. Benchmarks that errored on either side are skipped.
+    """
+    found = []
+    for name, cur in current.get("results", {}).items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "error" in base or "error" in cur:
+            continue
+        checks = [(f, base.get(f), cur.get(f), 1.0) for f in COST_FIELDS]
+        checks += [(f"pairs_per_s[{size}]", v, cur.get("pairs_per_s", {}).get(size), -1.0)
+                   for size, v in base.get("pairs_per_s", {}).items()]
+        for field, old, new, direction in checks:
+            if old is None or new is None or old <= 0:
+                continue
+            change = (new - old) / old
+            if change * direction > tolerance:
+                found.append({"benchmark": name, "field": field, "baseline": old, "current": new,
+                              "change": round(change, 4)})
+    return found
+
+
+def _load(path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _batch_sizes(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="metric-bench", description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for cmd in ("run", "_child"):
+        p = sub.add_parser(cmd)
+        if cmd == "_child":
+            p.add_argument("name", choices=BENCHMARKS)
+        else:
+            p.add_argument("--only", default=",".join(BENCHMARKS), help="comma-separated benchmarks")
+            p.add_argument("--with-caches", action="store_true")
+            p.add_argument("--out", default=None, help="default: reports/benchmark_<ts>.json")
+        p.add_argument("--pairs", type=int, default=512)
+        p.add_argument("--calls", type=int, default=200)
+        p.add_argument("--batch-sizes", type=_batch_sizes, default=list(DEFAULT_BATCH_SIZES))
+    p = sub.add_parser("compare")
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--tolerance", type=float, default=0.10)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "_child":
+        print(json.dumps(_child(args.name, args.pairs, args.calls, args.batch_sizes)))
+        return 0
+    if args.cmd == "compare":
+        regressions = compare(_load(args.baseline), _load(args.current), args.tolerance)
+        for r in regressions:
+            print(f"[REGRESSION] {r['benchmark']} {r['field']}: {r['baseline']} -> {r['current']} "
+                  f"({r['change']:+.1%})")
+        print(f"[metric-bench] {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        return 1 if regressions else 0
+
+    names = [n for n in args.only.split(",") if n]
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        ap.error(f"unknown benchmarks {unknown}; choose from {list(BENCHMARKS)}")
+    report = run(names, args.pairs, args.calls, args.batch_sizes, args.with_caches)
+    for name, r in report["results"].items():
+        if "error" in r:
+            print(f"[{name}] error: {r['error']}")
+        else:
+            lat = f" p50={r['p50_ms']}ms p95={r['p95_ms']}ms p99={r['p99_ms']}ms" if "p50_ms" in r else ""
+            print(f"[{name}] cold={r['cold_start_s']}s{lat} rss={r['peak_rss_mb']}MB "
+                  f"{r.get('pairs_per_s', '')}")
+    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    out = Path(args.out) if args.out else REPORTS_DIR / f"{PREFIX}{ts}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[metric-bench] baseline -> {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
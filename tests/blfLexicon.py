@@ -10,7 +10,7 @@ project_root = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(project_root))
 
 from utilities.metricsUtils import bias_lexicon_frequency
-from utilities.lexiconUtil import SENSITIVE_TERMS
+from utilities.lexiconUtil import SENSITIVE_TERMS, SENSITIVE_LEXICON
 
 print("=" * 80)
 print("BIAS LEXICON FREQUENCY TEST")
@@ -83,8 +83,7 @@ for i, test in enumerate(test_cases, 1):
     blf = bias_lexicon_frequency(text, SENSITIVE_TERMS)
     
     # Find which sensitive terms are present
-    text_lower = text.lower()
-    found_terms = [term for term in SENSITIVE_TERMS if term in text_lower.split()]
+    found_terms = list(SENSITIVE_LEXICON.match(text).counts)
     
     print(f"\nTest {i}: {test['description']}")
     print(f"Text: \"{text}\"")
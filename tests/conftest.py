@@ -1,21 +1,68 @@
-import json, csv, datetime, pathlib, pytest, sys
+import json, os, pathlib, pytest, sys
 
 BASE = pathlib.Path(__file__).resolve().parents[1]
 # Add BASE to Python path so imports from src work
 if str(BASE) not in sys.path:
     sys.path.insert(0, str(BASE))
 
-from utilities.rag_clientSample import MockRAGClient
+from utilities import instrumentation, metricDaemon, modelRegistry
+from utilities.rag_clientSample import HTTPRAGClient, MockRAGClient, PrefetchedRAGClient
+from utilities.embeddingCache import cache_stats
+from utilities.sentimentCache import cache_stats as sentiment_cache_stats
+from utilities.ragRecorder import configure_client
+from utilities.resultCache import cache_stats as result_cache_stats, get_result_cache
+from utilities.fairnessEval import DEFAULT_ACTIVE_YEAR, MODES
+from utilities.parallelRunner import evaluate_parallel
+from utilities.pairLoader import load_pairs
+from utilities.scorecardWriter import ScorecardWriter
+
+
+def pytest_addoption(parser):
+    parser.addoption("--prewarm-models", action="store_true", default=False,
+                     help="Load every model backend before the first test runs")
+    parser.addoption("--pairs", default=str(BASE / "data" / "counterfactual_pairs.json"),
+                     help="Counterfactual pair file (.json, .jsonl or .jsonl.gz)")
+    parser.addoption("--shard", default=None, metavar="i/N",
+                     help="Only evaluate pairs whose id hashes to shard i of N")
+    parser.addoption("--instrument", action="store_true", default=False,
+                     help="Record latency histograms and counters; written to reports/fairness_metrics_<ts>.prom")
+    parser.addoption("--instrument-trace", action="store_true", default=False,
+                     help="Also record Chrome-trace spans per test (reports/fairness_trace_<ts>.json)")
+    parser.addoption("--eval-workers", type=int, default=None,
+                     help="Forked evaluation workers sharing loaded models (default: FAIRNESS_WORKERS or 1)")
+    parser.addoption("--gate-mode", default=os.environ.get("FAIRNESS_GATE_MODE", "full"), choices=MODES,
+                     help="fail-fast: skip costlier metric tiers once a cheap gate fails; "
+                          "triage: model metrics only on pairs that pass the cheap gates")
+    parser.addoption("--no-result-cache", action="store_true", default=False,
+                     help="Recompute every pair instead of reusing results of unchanged pairs")
+
+def pytest_sessionstart(session):
+    if session.config.getoption("--instrument") or session.config.getoption("--instrument-trace"):
+        instrumentation.enable(trace=session.config.getoption("--instrument-trace"))
+    if session.config.getoption("--prewarm-models"):
+        from utilities.modelRegistry import prewarm
+        for name, secs in prewarm().items():
+            print(f"[Models] {name} loaded in {secs:.2f}s")
 
 
 DATA_DIR = BASE / "data"
 REPORTS_DIR = BASE / "reports"
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
+def _config_pairs(config):
+    pairs = getattr(config, "_fairness_pairs", None)
+    if pairs is None:
+        pairs = config._fairness_pairs = load_pairs(config.getoption("--pairs"),
+                                                    shard=config.getoption("--shard"))
+    return pairs
+
+def pytest_generate_tests(metafunc):
+    if "row_idx" in metafunc.fixturenames:
+        metafunc.parametrize("row_idx", range(len(_config_pairs(metafunc.config))))
+
 @pytest.fixture(scope="session")
-def counterfactual_pairs():
-    with open(DATA_DIR / "counterfactual_pairs.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+def counterfactual_pairs(request):
+    return _config_pairs(request.config)
 
 @pytest.fixture(scope="session")
 def thresholds():
@@ -28,29 +75,85 @@ def authority_weights():
         return json.load(f)
 
 @pytest.fixture(scope="session")
-def rag_client():
-    return MockRAGClient()
+def rag_client(counterfactual_pairs):
+    """RAG client with every pair query prefetched concurrently.
 
-@pytest.fixture(scope="module")
-def cached_rag_queries():
-    """Cache RAG queries per module to avoid re-querying across tests"""
-    cache = {}
-    return cache
+    Set FAIRNESS_RAG_URL to query a real service (or utilities.ragServer)
+    instead of MockRAGClient; FAIRNESS_RAG_CONCURRENCY bounds in-flight requests.
+    FAIRNESS_RAG_RECORD / FAIRNESS_RAG_REPLAY record answers to, or replay them
+    from, a utilities.ragRecorder store.
+    """
+    concurrency = int(os.environ.get("FAIRNESS_RAG_CONCURRENCY", 16))
+    url = os.environ.get("FAIRNESS_RAG_URL")
+    client = configure_client(HTTPRAGClient(url, concurrency=concurrency) if url else MockRAGClient())
+    queries = [q for row in counterfactual_pairs for q in (row["query_a"], row["query_b"])]
+    return PrefetchedRAGClient(client, queries, concurrency=concurrency)
 
 @pytest.fixture(scope="session")
-def scorecard():
-    rows = []
-    yield rows
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_path = REPORTS_DIR / f"fairness_scorecard_{ts}.csv"
-    json_path = REPORTS_DIR / f"fairness_scorecard_{ts}.json"
-    if rows:
-        keys = list(rows[0].keys())
-        with open(csv_path, "w", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(f, fieldnames=keys)
-            w.writeheader()
-            w.writerows(rows)
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(rows, f, indent=2, ensure_ascii=False)
-        print(f"\n[Fairness Scorecard] CSV: {csv_path}")
-        print(f"[Fairness Scorecard] JSON: {json_path}")
+def fairness_eval(request, counterfactual_pairs, rag_client, thresholds, authority_weights, scorecard):
+    """All metrics for all pairs, computed in batched passes and added to the scorecard.
+
+    With --eval-workers N the pairs are split across N forked processes that
+    share the models loaded once in this one. Pairs whose queries and answers
+    are unchanged since a previous run reuse their cached metric values.
+    """
+    responses_a = [rag_client.query(row["query_a"]) for row in counterfactual_pairs]
+    responses_b = [rag_client.query(row["query_b"]) for row in counterfactual_pairs]
+    active_year = int(thresholds.get("ACTIVE_YEAR", DEFAULT_ACTIVE_YEAR))
+    result = evaluate_parallel(counterfactual_pairs, responses_a, responses_b, thresholds, authority_weights,
+                               workers=request.config.getoption("--eval-workers"), active_year=active_year,
+                               result_cache=None if request.config.getoption("--no-result-cache")
+                               else get_result_cache(), mode=request.config.getoption("--gate-mode"))
+    scorecard.extend(result.rows())
+    return result
+
+@pytest.fixture(autouse=True)
+def _skip_unevaluated(request):
+    """Skip a @pytest.mark.metric test for a pair the --gate-mode left that metric unevaluated on."""
+    marker = request.node.get_closest_marker("metric")
+    if marker is None or "row_idx" not in request.fixturenames:
+        return
+    result = request.getfixturevalue("fairness_eval")
+    if result.was_skipped(marker.args[0], request.getfixturevalue("row_idx")):
+        pytest.skip(f"{marker.args[0]} not evaluated ({request.config.getoption('--gate-mode')} mode)")
+
+@pytest.fixture(scope="session")
+def scorecard(thresholds):
+    """Streaming scorecard: rows are flushed to reports/fairness_run_<ts>.csv as they arrive."""
+    writer = ScorecardWriter(REPORTS_DIR, metadata={
+        "ACTIVE_YEAR": thresholds.get("ACTIVE_YEAR", DEFAULT_ACTIVE_YEAR), "Thresholds": thresholds})
+    yield writer
+    writer.close()
+    if len(writer):
+        print(f"\n[Fairness Scorecard] CSV: {writer.path}")
+        print(f"[Fairness Scorecard] Metadata: {writer.meta_path}")
+
+def pytest_terminal_summary(terminalreporter):
+    if instrumentation.enabled():
+        for path in instrumentation.write_reports(REPORTS_DIR):
+            terminalreporter.write_line(f"[Instrumentation] {path}")
+    for name, st in cache_stats().items():
+        total = st["hits"] + st["misses"]
+        rate = st["hits"] / total if total else 0.0
+        terminalreporter.write_line(
+            f"[Embedding Cache] {name}: hits={st['hits']} misses={st['misses']} "
+            f"hit_rate={rate:.1%} entries={st['entries']}")
+    st = sentiment_cache_stats()
+    total = st["hits"] + st["misses"]
+    if total:
+        terminalreporter.write_line(
+            f"[Sentiment Cache] vader: hits={st['hits']} misses={st['misses']} "
+            f"hit_rate={st['hits'] / total:.1%} entries={st['entries']}")
+    st = result_cache_stats()
+    total = st["hits"] + st["misses"]
+    if total:
+        terminalreporter.write_line(
+            f"[Result Cache] reused={st['hits']} computed={st['misses']} hit_rate={st['hits'] / total:.1%}")
+    if metricDaemon.STATS["requests"] or metricDaemon.STATS["fallbacks"]:
+        terminalreporter.write_line(
+            f"[Metric Daemon] requests={metricDaemon.STATS['requests']} fallbacks={metricDaemon.STATS['fallbacks']}")
+    for model, st in modelRegistry.PHASES.items():
+        evicted = f" evicted={','.join(st['evicted'])}" if st.get("evicted") else ""
+        terminalreporter.write_line(
+            f"[Model Phase] {model} ({','.join(st.get('metrics', []))}): {st['seconds']:.2f}s "
+            f"peak_rss={st['peak_rss_mb']}MB{evicted}")
@@ -0,0 +1,91 @@
+import multiprocessing as mp
+import os
+
+import numpy as np
+import pytest
+from utilities import parallelRunner
+from utilities.embeddingCache import EmbeddingCache
+from utilities.embeddingUtil import encode_texts
+from tests.test_embeddingUtil import CountingEncoder
+
+
+def vec(*xs):
+    return np.asarray(xs, dtype=np.float32)
+
+
+def test_roundtrip_and_persistence(tmp_path):
+    cache = EmbeddingCache(tmp_path, "mini", max_entries=8)
+    cache.put_many(["a", "b"], np.stack([vec(1, 0, 0), vec(0, 1, 0)]))
+    out, hit = cache.get_many(["b", "c", "a"])
+    assert hit.tolist() == [True, False, True]
+    np.testing.assert_array_equal(out[0], vec(0, 1, 0))
+    np.testing.assert_array_equal(out[2], vec(1, 0, 0))
+    cache.close()
+
+    reopened = EmbeddingCache(tmp_path, "mini", max_entries=8)
+    out, hit = reopened.get_many(["a"])
+    assert hit.all()
+    assert reopened.stats() == {"hits": 1, "misses": 0, "entries": 2}
+
+
+def test_namespaces_do_not_collide(tmp_path):
+    EmbeddingCache(tmp_path, "mini").put_many(["a"], np.stack([vec(1, 0)]))
+    _, hit = EmbeddingCache(tmp_path, "mini", normalize=False).get_many(["a"])
+    assert not hit.any()
+    _, hit = EmbeddingCache(tmp_path, "other").get_many(["a"])
+    assert not hit.any()
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = EmbeddingCache(tmp_path, "mini", max_entries=2)
+    cache.put_many(["a"], np.stack([vec(1, 0)]))
+    cache.put_many(["b"], np.stack([vec(0, 1)]))
+    cache.get_many(["a"])
+    cache.put_many(["c"], np.stack([vec(1, 1)]))
+    _, hit = cache.get_many(["a", "b", "c"])
+    assert hit.tolist() == [True, False, True]
+    assert len(cache) == 2
+
+
+def test_float16_storage_and_dim_check(tmp_path):
+    cache = EmbeddingCache(tmp_path, "mini", dtype="float16")
+    cache.put_many(["a"], np.stack([vec(0.5, 0.25)]))
+    out, _ = cache.get_many(["a"])
+    assert out.dtype == np.float32
+    np.testing.assert_allclose(out[0], [0.5, 0.25])
+    with pytest.raises(ValueError):
+        cache.put_many(["b"], np.stack([vec(1, 0, 0)]))
+
+
+def test_encode_texts_only_encodes_misses(tmp_path):
+    cache = EmbeddingCache(tmp_path, "counting")
+    model = CountingEncoder()
+    first = encode_texts(model, ["alpha", "beta"], cache=cache)
+    second = encode_texts(model, ["beta", "gamma", "alpha"], cache=cache)
+    assert model.calls == [["alpha", "beta"], ["gamma"]]
+    np.testing.assert_allclose(second[[0, 2]], first[[1, 0]], rtol=1e-6)
+
+
+_FORKED = None
+
+
+def _use_forked_cache(text):
+    _, hit = _FORKED.get_many(["a"])
+    _FORKED.put_many([text], np.stack([vec(0, 1)]))
+    return bool(hit.all()), _FORKED._pid == os.getpid()
+
+
+@pytest.mark.skipif(not parallelRunner.can_fork(), reason="needs the fork start method")
+def test_forked_workers_reopen_the_parent_cache(tmp_path):
+    global _FORKED
+    _FORKED = cache = EmbeddingCache(tmp_path, "mini", max_entries=8)
+    cache.put_many(["a"], np.stack([vec(1, 0)]))
+    parent_db = cache._db
+    try:
+        with mp.get_context("fork").Pool(2, initializer=parallelRunner._init_worker, initargs=(1,)) as pool:
+            assert pool.map(_use_forked_cache, ["b", "c", "d"]) == [(True, True)] * 3
+    finally:
+        _FORKED = None
+    assert cache._db is parent_db
+    _, hit = cache.get_many(["a", "b", "c", "d"])
+    assert hit.all() and len(cache) == 4
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+from utilities.embeddingUtil import (
+    unique_texts, encode_texts, pair_similarities, length_batches, split_chunks, long_pair_similarities
+)
+
+
+class CountingEncoder:
+    """Bag-of-characters encoder that records what it was asked to encode"""
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, convert_to_numpy=True, **kw):
+        self.calls.append(list(texts))
+        out = np.zeros((len(texts), 26), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for ch in t.lower():
+                if "a" <= ch <= "z":
+                    out[i, ord(ch) - 97] += 1
+        if normalize_embeddings:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
+
+
+def test_unique_texts_deduplicates_across_pairs():
+    texts, ia, ib = unique_texts([("x", "y"), ("x", "z"), ("y", "x")])
+    assert texts == ["x", "y", "z"]
+    assert ia.tolist() == [0, 0, 1]
+    assert ib.tolist() == [1, 2, 0]
+
+
+def test_encode_texts_sorts_by_length_and_restores_order():
+    model = CountingEncoder()
+    texts = ["a much longer sentence here", "hi", "mid length"]
+    emb = encode_texts(model, texts, batch_size=2)
+    assert model.calls == [["hi", "mid length"], ["a much longer sentence here"]]
+    np.testing.assert_allclose(emb, model.encode(texts), rtol=1e-6)
+
+
+def test_pair_similarities_encodes_each_text_once():
+    model = CountingEncoder()
+    base = "claim processing is fast"
+    pairs = [(base, "claim processing is slow"), (base, base), (base, "claim processing is fast")]
+    sims = pair_similarities(model, pairs)
+    assert sum(len(c) for c in model.calls) == 2
+    assert sims.shape == (3,)
+    assert sims[1] == sims[2]
+    assert abs(sims[1] - 1.0) < 1e-6
+    assert sims[0] < 1.0
+
+
+class TruncatingEncoder(CountingEncoder):
+    """CountingEncoder that, like MiniLM, only sees the first max_seq_length - 2 words."""
+    max_seq_length = 10
+
+    def encode(self, texts, **kw):
+        return super().encode([" ".join(t.split()[:self.max_seq_length - 2]) for t in texts], **kw)
+
+
+def _words(xs):
+    return [len(x.split()) for x in xs]
+
+
+def test_length_batches_bound_padded_tokens():
+    lengths = [5, 100, 7, 50, 6, 90, 8]
+    batches = length_batches(lengths, batch_size=3, token_budget=200)
+    assert sorted(i for b in batches for i in b) == list(range(len(lengths)))
+    for b in batches:
+        assert len(b) <= 3 and (len(b) == 1 or len(b) * max(lengths[i] for i in b) <= 200)
+    assert [lengths[i] for b in batches for i in b] == sorted(lengths)
+
+
+def test_split_chunks_packs_sentences_and_windows_long_ones():
+    short = "Short answer. Fits."
+    assert split_chunks(short, 8, _words) == [(short, 3)]
+    text = "One two three. Four five six. " + " ".join(f"w{i}" for i in range(20)) + ". Tail here."
+    chunks = split_chunks(text, 8, _words)
+    assert chunks[0] == ("One two three. Four five six.", 6)
+    assert all(n <= 8 for _, n in chunks) and chunks[-1] == ("Tail here.", 2)
+    assert " ".join(c for c, _ in chunks).split() == text.split()
+    windows = split_chunks(text, 8, _words, mode="window")
+    assert all(n <= 8 for _, n in windows) and " ".join(c for c, _ in windows).split() == text.split()
+    with pytest.raises(ValueError):
+        split_chunks(text, 8, _words, mode="paragraph")
+
+
+def _pieces(xs):
+    """Word-piece stand-in: every 3 characters of a word is one token."""
+    return [sum(-(-len(w) // 3) for w in x.split()) for x in xs]
+
+
+def test_windows_fit_in_tokenizer_tokens():
+    # Short words first, then long ones: sizing windows by the average tokens per word overflows.
+    text = " ".join(["a"] * 30 + ["internationalization"] * 6)
+    for mode in ("window", "sentence"):
+        chunks = split_chunks(text, 16, _pieces, mode=mode)
+        assert all(n <= 16 for _, n in chunks) and [n for _, n in chunks] == _pieces([c for c, _ in chunks])
+        assert " ".join(c for c, _ in chunks) == text
+
+
+def test_long_text_pooling_is_opt_in(monkeypatch):
+    from utilities.metricsUtils import long_text_settings
+    monkeypatch.delenv("FAIRNESS_LONG_TEXT", raising=False)
+    assert long_text_settings()[0] == "off"
+
+
+@pytest.mark.parametrize("pooling", ["mean", "maxsim"])
+def test_long_mode_covers_the_whole_answer(pooling):
+    opening = "Claims are filed online with photos and the policy number. "
+    a = opening + "Approval takes two days and payment follows quickly."
+    b = opening + "Zebra quiz jukebox vexing wizard fjord boxy zigzag."
+    model = TruncatingEncoder()
+    assert abs(pair_similarities(model, [(a, b)])[0] - 1.0) < 1e-6  # tails are truncated away
+    sims = long_pair_similarities(model, [(a, b), (a, a), ("short one", "short two")], pooling=pooling)
+    assert sims[0] < 0.99 and abs(sims[1] - 1.0) < 1e-6
+    assert abs(sims[2] - pair_similarities(model, [("short one", "short two")])[0]) < 1e-6
@@ -0,0 +1,104 @@
+import json
+import numpy as np
+import pytest
+from utilities import resultCache
+from utilities.fairnessEval import METRICS, MetricError, evaluate, fetch_responses, main
+from utilities.rag_clientSample import MockRAGClient
+
+CHEAP = ["BLF", "RFI", "CitationMin", "DocRecency", "Authority"]
+
+
+@pytest.fixture
+def responses(counterfactual_pairs):
+    return fetch_responses(counterfactual_pairs, MockRAGClient())
+
+
+def test_one_pass_table(counterfactual_pairs, responses, thresholds, authority_weights):
+    result = evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=CHEAP)
+    assert len(result) == len(counterfactual_pairs)
+    assert list(result.columns)[:4] == ["pair_id", "query_a", "query_b", "is_lang_pair"]
+    assert set(result.passed) == set(CHEAP)
+    first = next(result.rows())
+    assert first["pair_id"] == "age_claims"
+    assert first["RFI"] == 0.0 and first["DRI_A"] == 0.6667
+    summary = result.summary()
+    assert summary["gates"]["RFI"]["failed_ids"][:1] == ["age_claims"]
+    assert summary["passed"] is False
+
+
+def test_metric_errors_are_isolated(counterfactual_pairs, responses, thresholds, authority_weights, monkeypatch):
+    def boom(batch):
+        raise OSError("model unavailable")
+    monkeypatch.setattr(METRICS["SPS"], "compute", boom)
+    result = evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=["SPS", "BLF"])
+    assert result.gate("BLF").all()
+    with pytest.raises(MetricError):
+        result.column("SPS")
+    assert result.summary()["gates"]["SPS"]["passed"] is False
+
+
+def test_unknown_metric_rejected(counterfactual_pairs, responses, thresholds, authority_weights):
+    with pytest.raises(ValueError):
+        evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=["Nope"])
+
+
+def test_cli_writes_table_and_summary(tmp_path, monkeypatch):
+    # The CLI uses the process-wide result cache; keep it out of reports/.
+    monkeypatch.setenv("FAIRNESS_RESULT_CACHE_PATH", str(tmp_path / "results.sqlite"))
+    monkeypatch.setattr(resultCache._CACHE, "instances", {})
+    out = tmp_path / "eval.csv"
+    rc = main(["--metrics", "CitationMin,Authority", "--out", str(out)])
+    assert rc == 0
+    assert out.read_text(encoding="utf-8").splitlines()[0].startswith("pair_id,query_a,query_b,is_lang_pair,")
+    summary = json.loads((tmp_path / "eval_summary.json").read_text(encoding="utf-8"))
+    assert summary["passed"] is True and summary["pairs"] == 12
+    assert (tmp_path / "results.sqlite").exists()
+
+
+@pytest.fixture
+def fake_sps(monkeypatch):
+    """SPS stand-in that records which pairs reached the model tier and scores them 0."""
+    seen = []
+
+    def compute(batch):
+        seen.append([p["id"] for p in batch.pairs])
+        return {"SPS": np.zeros(len(batch.pairs))}
+    monkeypatch.setattr(METRICS["SPS"], "compute", compute)
+    return seen
+
+
+def test_fail_fast_skips_costlier_tiers(counterfactual_pairs, responses, thresholds, authority_weights, fake_sps):
+    result = evaluate(counterfactual_pairs, *responses, thresholds, authority_weights,
+                      metrics=["SPS", "BLF", "RFI", "Authority"], mode="fail-fast")
+    assert fake_sps == []
+    assert list(result.columns)[4:] == ["SPS", "BLF", "RFI", "Authority_A", "Authority_B"]
+    gates = result.summary()["gates"]
+    assert gates["RFI"]["passed"] is False and gates["Authority"]["passed"] is True
+    assert gates["SPS"]["passed"] is None and gates["BLF"]["skipped"] == len(counterfactual_pairs)
+    assert result.summary()["passed"] is False
+    assert result.was_skipped("SPS", 0) and not result.was_skipped("RFI", 0)
+
+
+def test_fail_fast_runs_everything_while_gates_pass(counterfactual_pairs, responses, thresholds,
+                                                    authority_weights, fake_sps):
+    result = evaluate(counterfactual_pairs, *responses, thresholds, authority_weights,
+                      metrics=["CitationMin", "BLF", "SPS"], mode="fail-fast")
+    assert len(fake_sps) == 1 and not result.skipped
+
+
+def test_triage_runs_models_on_passing_or_flagged_pairs(counterfactual_pairs, responses, thresholds,
+                                                        authority_weights, fake_sps):
+    pairs = [dict(p) for p in counterfactual_pairs]
+    pairs[0]["inspect"] = True
+    result = evaluate(pairs, *responses, thresholds, authority_weights, metrics=["RFI", "SPS"], mode="triage")
+    rfi_ok = result.gate("RFI")
+    expected = [p["id"] for p, ok in zip(pairs, rfi_ok) if ok or p.get("inspect")]
+    assert fake_sps == [expected] and len(expected) < len(pairs)
+    assert list(result.skipped["SPS"]) == [not (ok or i == 0) for i, ok in enumerate(rfi_ok)]
+    # Triaged-out pairs already failed a cheap gate; they are not reported twice.
+    assert result.summary()["gates"]["SPS"]["failed_ids"] == expected
+
+
+def test_unknown_mode_rejected(counterfactual_pairs, responses, thresholds, authority_weights):
+    with pytest.raises(ValueError):
+        evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=["RFI"], mode="fast")
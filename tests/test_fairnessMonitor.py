@@ -0,0 +1,112 @@
+import json
+import time
+
+import numpy as np
+
+from utilities.fairnessMonitor import FairnessMonitor, LogTailer, SlidingWindow, main
+from utilities.ragRecorder import RecordingRAGClient, ReplayRAGClient, ResponseStore
+from utilities.rag_clientSample import MockRAGClient
+
+
+def _line(pair, ts, **extra):
+    return json.dumps({"ts": ts, "pair_id": pair["id"], "query_a": pair["query_a"], "query_b": pair["query_b"],
+                       **extra})
+
+
+def test_tailer_waits_for_complete_lines_and_follows_truncation(tmp_path):
+    log = tmp_path / "pairs.jsonl"
+    log.write_text("old\n")
+    tailer = LogTailer(log)
+    assert tailer.poll() == []
+    with open(log, "a") as f:
+        f.write('{"a": 1}\n{"b"')
+    assert tailer.poll() == ['{"a": 1}']
+    with open(log, "a") as f:
+        f.write(': 2}\n')
+    assert tailer.poll() == ['{"b": 2}']
+    log.write_text("new\n")
+    assert tailer.poll() == ["new"]
+    tailer.close()
+
+
+def test_sliding_window_expires_old_buckets():
+    w = SlidingWindow(n_columns=1, n_metrics=1, window=10.0, n_buckets=5)
+    w.add(0.5, np.array([1.0]), np.array([1]))
+    w.add(9.5, np.array([0.0]), np.array([0]))
+    means, fail_rate, rows = w.means(9.5)
+    assert rows == 2 and means[0] == 0.5 and fail_rate[0] == 0.5
+    means, _, rows = w.means(10.5)
+    assert rows == 1 and means[0] == 0.0
+
+
+def test_breach_then_recovery(counterfactual_pairs, thresholds, authority_weights):
+    events = []
+    monitor = FairnessMonitor(thresholds, authority_weights, metrics=["RFI"], window=10, n_buckets=5,
+                              emit=events.append)
+    bad = next(p for p in counterfactual_pairs if p["id"] == "age_claims")
+    good = dict(bad, query_b=bad["query_a"])
+    monitor.process([_line(bad, 1.0), _line(bad, 2.0), "not json"])
+    assert [(e.event, e.key) for e in events] == [("breach", "pair:age_claims"), ("breach", "axis:age")]
+    assert events[0].window_mean == {"RFI": 0.0} and events[0].rows == 2 and monitor.skipped == 1
+    monitor.process([_line(bad, 2.5)])
+    assert len(events) == 2  # still breached: no repeat event
+    monitor.process([_line(good, 20.0)])
+    assert [e.event for e in events[2:]] == ["recovered", "recovered"]
+
+
+def test_keys_are_bounded(counterfactual_pairs, thresholds, authority_weights):
+    monitor = FairnessMonitor(thresholds, authority_weights, metrics=["BLF"], max_keys=3, emit=lambda e: None)
+    monitor.process([_line(p, 1.0) for p in counterfactual_pairs])
+    assert len(monitor.windows) == 3
+
+
+class SlowFlakyClient:
+    """MockRAGClient answers after `latency` seconds; queries containing `fail` raise."""
+
+    def __init__(self, latency, fail=None):
+        self.latency, self.fail = latency, fail
+        self.calls = []
+
+    def query(self, q):
+        self.calls.append(q)
+        time.sleep(self.latency)
+        if self.fail and self.fail in q:
+            raise ConnectionError("connection reset")
+        return MockRAGClient().query(q)
+
+
+def test_missing_responses_fetched_together_and_failures_skipped(counterfactual_pairs, thresholds,
+                                                                 authority_weights):
+    client = SlowFlakyClient(latency=0.2, fail=counterfactual_pairs[0]["query_b"])
+    monitor = FairnessMonitor(thresholds, authority_weights, metrics=["RFI"], client=client, emit=lambda e: None)
+    t0 = time.perf_counter()
+    monitor.process([_line(p, 1.0) for p in counterfactual_pairs])
+    elapsed = time.perf_counter() - t0
+    assert len(client.calls) == len({q for p in counterfactual_pairs for q in (p["query_a"], p["query_b"])})
+    assert elapsed < client.latency * len(client.calls) / 2
+    assert monitor.skipped == sum(counterfactual_pairs[0]["query_b"] in (p["query_a"], p["query_b"])
+                                  for p in counterfactual_pairs)
+    assert "ConnectionError" in monitor.errors["rag"]
+    assert f"pair:{counterfactual_pairs[1]['id']}" in monitor.windows
+
+
+def test_replayed_responses_and_replay_misses(tmp_path, counterfactual_pairs, thresholds, authority_weights):
+    with ResponseStore(tmp_path, writable=True) as store:
+        monitor = FairnessMonitor(thresholds, authority_weights, metrics=["RFI"],
+                                  client=RecordingRAGClient(MockRAGClient(), store), emit=lambda e: None)
+        monitor.process([_line(p, 1.0) for p in counterfactual_pairs])
+    unrecorded = dict(counterfactual_pairs[0], id="new_pair", query_b="never recorded")
+    with ResponseStore(tmp_path) as store:
+        monitor = FairnessMonitor(thresholds, authority_weights, metrics=["RFI"],
+                                  client=ReplayRAGClient(store), emit=lambda e: None)
+        monitor.process([_line(p, 2.0) for p in [*counterfactual_pairs, unrecorded]])
+    assert monitor.skipped == 1 and "ReplayMiss" in monitor.errors["rag"]
+    assert "pair:new_pair" not in monitor.windows
+    assert all(f"pair:{p['id']}" in monitor.windows for p in counterfactual_pairs)
+
+
+def test_cli_once_reports_breaches(tmp_path, counterfactual_pairs):
+    log = tmp_path / "pairs.jsonl"
+    log.write_text("\n".join(_line(p, 100.0 + i) for i, p in enumerate(counterfactual_pairs)) + "\n")
+    assert main([str(log), "--once", "--metrics", "RFI"]) == 1
+    assert main([str(log), "--once", "--metrics", "CitationMin"]) == 0
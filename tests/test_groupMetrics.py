@@ -0,0 +1,101 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from tests.conftest import DATA_DIR
+from tests.test_embeddingUtil import CountingEncoder
+from utilities import groupMetrics
+from utilities.groupMetrics import (
+    GroupBatch, evaluate_groups, fetch_group_responses, group_similarity_extremes, group_spreads, main
+)
+from utilities.pairLoader import load_groups
+from utilities.rag_clientSample import MockRAGClient, RAGResponse
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    """Offline stand-in for the embedder; bypasses the on-disk embedding cache."""
+    model = CountingEncoder()
+    monkeypatch.setattr(groupMetrics, "get_model", lambda name: model)
+    monkeypatch.setattr(groupMetrics, "get_embedding_cache", lambda *a, **kw: None)
+    return model
+
+
+def test_blocked_similarities_match_brute_force(monkeypatch):
+    monkeypatch.setattr(groupMetrics, "MAX_BLOCK_CELLS", 150)  # force several blocks
+    rng = np.random.default_rng(0)
+    emb = rng.normal(size=(30, 8))
+    sizes = [2, 5, 3, 7, 2, 4]
+    idx = np.full((len(sizes), max(sizes)), -1)
+    lang = np.zeros(idx.shape, dtype=bool)
+    for g, n in enumerate(sizes):
+        idx[g, :n] = rng.choice(len(emb), n, replace=False)
+        lang[g, 1:n] = rng.random(n - 1) < 0.3
+    sps, les = group_similarity_extremes(emb, idx, lang)
+    unit = emb / np.linalg.norm(emb, axis=1, keepdims=True)
+    for g, n in enumerate(sizes):
+        mono = [m for m in range(n) if not lang[g, m]]
+        cos = [unit[idx[g, a]] @ unit[idx[g, b]] for a, b in combinations(mono, 2)]
+        assert np.isclose(sps[g], min(cos)) if cos else np.isnan(sps[g])
+        cos = [unit[idx[g, 0]] @ unit[idx[g, m]] for m in range(1, n) if lang[g, m]]
+        assert np.isclose(les[g], min(cos)) if cos else np.isnan(les[g])
+
+
+def test_spread_is_largest_pairwise_gap():
+    scores = np.array([0.1, 0.9, -0.4, 0.3])
+    idx = np.array([[0, 1, 2, 3], [3, 0, -1, -1]])
+    assert np.allclose(group_spreads(scores, idx), [1.3, 0.2])
+
+
+def test_twenty_variants_cost_twenty_one_encodes(encoder):
+    group = {"id": "g", "base": "base", "variants": [{"id": str(i), "query": f"v{i}"} for i in range(20)]}
+    responses = [[RAGResponse(f"answer number {i} " + "x" * i, [], []) for i in range(21)]]
+    result = evaluate_groups([group], responses, {"SPS": 0.8, "LES": 0.75}, metrics=["SPS", "LES"])
+    assert sum(len(c) for c in encoder.calls) == 21
+    assert len(result) == 1 and np.isnan(result.column("LES")[0]) and result.gate("LES").all()
+
+
+def test_sps_not_applicable_without_same_language_pair(encoder):
+    group = {"id": "g", "base": "base", "variants": [{"id": "es", "query": "base (es)", "is_lang": True}]}
+    responses = [[RAGResponse("the answer", [], []), RAGResponse("la respuesta", [], [])]]
+    result = evaluate_groups([group], responses, {"SPS": 0.8, "LES": 0.0}, metrics=["SPS", "LES"])
+    assert np.isnan(result.column("SPS")[0]) and result.gate("SPS").all() and result.gate("LES").all()
+    assert result.summary()["gates"]["SPS"] == {"passed": None, "failed": 0, "failed_ids": [], "skipped": 1}
+
+
+def test_maxsim_pooling_is_rejected(encoder, monkeypatch, capsys):
+    monkeypatch.setenv("FAIRNESS_LONG_TEXT", "maxsim")
+    group = {"id": "g", "base": "base", "variants": [{"id": "v", "query": "v"}]}
+    result = evaluate_groups([group], [[RAGResponse("a", [], []), RAGResponse("b", [], [])]], {"SPS": 0.0},
+                             metrics=["SPS"])
+    assert "maxsim" in result.summary()["gates"]["SPS"]["error"]
+    with pytest.raises(SystemExit):
+        main(["--pooling", "maxsim"])
+    assert "invalid choice" in capsys.readouterr().err
+
+
+def test_repo_groups_end_to_end(encoder, thresholds):
+    groups = load_groups(DATA_DIR / "counterfactual_groups.json")
+    responses = fetch_group_responses(groups, MockRAGClient())
+    result = evaluate_groups(groups, responses, thresholds, metrics=["SPS", "SPG", "BLF", "LES"])
+    assert list(result.columns) == ["group_id", "base", "variants", "SPS", "SPG", "BLF", "LES"]
+    texts, _, _ = GroupBatch(groups, responses).layout()
+    assert sum(len(c) for c in encoder.calls) == len(texts)
+    les = result.column("LES")
+    assert np.isnan(les[:2]).all() and not np.isnan(les[2])
+    assert result.summary()["pairs"] == len(groups)
+
+
+def test_cli_cheap_metrics(tmp_path):
+    out = tmp_path / "groups.csv"
+    assert main(["--metrics", "SPG,BLF", "--out", str(out)]) == 1  # VADER scores the Spanish answer apart
+    assert out.read_text(encoding="utf-8").splitlines()[0] == "group_id,base,variants,SPG,BLF"
+
+
+def test_cli_prints_skip_for_inapplicable_gates(encoder, tmp_path, capsys):
+    groups = tmp_path / "groups.json"
+    groups.write_text('[{"id": "g", "base": "How do I file a claim?", '
+                      '"variants": [{"id": "es", "query": "¿Cómo presento un reclamo?", "is_lang": true}]}]')
+    main(["--groups", str(groups), "--metrics", "SPS", "--out", str(tmp_path / "g.csv")])
+    assert "[SKIP] SPS" in capsys.readouterr().out
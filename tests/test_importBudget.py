@@ -0,0 +1,26 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+IMPORT_BUDGET_SECONDS = 2.0
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "detoxify", "vaderSentiment"]
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import utilities.metricsUtils
+elapsed = time.perf_counter() - t0
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % HEAVY_MODULES
+
+
+def test_metrics_import_is_light():
+    """Importing metricsUtils must not load any model backend"""
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=PROJECT_ROOT,
+                         capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert result["loaded"] == [], f"Heavy modules imported eagerly: {result['loaded']}"
+    assert result["elapsed"] < IMPORT_BUDGET_SECONDS, \
+        f"import utilities.metricsUtils took {result['elapsed']:.2f}s (budget {IMPORT_BUDGET_SECONDS}s)"
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+from utilities import instrumentation as inst
+
+
+@pytest.fixture
+def recording():
+    inst.reset()
+    inst.enable(trace=True)
+    yield inst
+    inst.disable()
+    inst.reset()
+
+
+def test_disabled_records_nothing():
+    inst.reset()
+    inst.disable()
+
+    @inst.instrumented("t_seconds")
+    def f():
+        return 1
+    with inst.timer("t_seconds"):
+        f()
+    inst.count("t_calls")
+    assert inst.snapshot() == {"histograms": {}, "counters": {}, "events": [], "dropped": 0}
+
+
+def test_histogram_counter_and_openmetrics(recording):
+    inst.observe("q_seconds", 0.003, client="mock")
+    inst.observe("q_seconds", 100.0, client="mock")
+    inst.count("q_retries", 2, client="mock")
+    text = inst.openmetrics_text()
+    assert 'q_seconds_bucket{client="mock",le="0.0025"} 0' in text
+    assert 'q_seconds_bucket{client="mock",le="0.005"} 1' in text
+    assert 'q_seconds_bucket{client="mock",le="+Inf"} 2' in text
+    assert 'q_seconds_count{client="mock"} 2' in text
+    assert "# TYPE q_retries counter" in text and 'q_retries_total{client="mock"} 2' in text
+    inst.count("q_evictions_total", model="m")
+    text = inst.openmetrics_text()
+    assert "# TYPE q_evictions counter" in text and 'q_evictions_total{model="m"} 1' in text
+    assert text.endswith("# EOF\n")
+
+
+def test_decorator_handles_sync_and_async(recording):
+    @inst.instrumented("work_seconds", kind="sync")
+    def work():
+        return "ok"
+
+    @inst.instrumented("work_seconds", kind="async")
+    async def awork():
+        return "aok"
+    assert work() == "ok" and asyncio.run(awork()) == "aok"
+    counts = {dict(k[1])["kind"]: h[-1] for k, h in inst.snapshot()["histograms"].items()}
+    assert counts == {"sync": 1, "async": 1}
+
+
+def test_snapshot_merge_and_trace(recording, tmp_path):
+    with inst.timer("chunk_seconds", pair_id="p1"):
+        pass
+    snap = inst.snapshot()
+    inst.merge(snap)
+    (key, h), = inst.snapshot()["histograms"].items()
+    assert h[-1] == 2
+    paths = inst.write_reports(tmp_path, "r1")
+    assert [p.name for p in paths] == ["fairness_metrics_r1.prom", "fairness_trace_r1.json"]
+    events = json.loads(paths[1].read_text())["traceEvents"]
+    assert len(events) == 2 and events[0]["ph"] == "X" and events[0]["args"] == {"pair_id": "p1"}
+
+
+def test_collectors_are_read_at_export(recording, monkeypatch):
+    monkeypatch.setattr(inst, "_COLLECTORS", [])
+    state = {"n": 1}
+    inst.register_collector(lambda: [("gauge", "probe_value", {}, state["n"])])
+    state["n"] = 7
+    assert "probe_value 7" in inst.openmetrics_text()
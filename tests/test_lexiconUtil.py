@@ -0,0 +1,47 @@
+from utilities.lexiconUtil import LexiconMatcher, SENSITIVE_TERMS, compile_lexicon
+from utilities.metricsUtils import bias_lexicon_frequency, bias_lexicon_frequency_gap
+
+
+def test_punctuation_and_case_do_not_hide_terms():
+    found = compile_lexicon(SENSITIVE_TERMS).match("Female, ELDERLY and (disabled) applicants.")
+    assert found.counts == {"female": 1, "elderly": 1, "disabled": 1}
+
+
+def test_multi_word_phrases_and_offsets():
+    text = "An illegal alien, an Illegal   Alien; illegal. alien"
+    found = compile_lexicon(SENSITIVE_TERMS).match(text)
+    assert found.counts == {"illegal alien": 2}
+    assert [text[s:e] for s, e in found.offsets["illegal alien"]] == ["illegal alien", "Illegal   Alien"]
+
+
+def test_overlapping_phrases_all_reported():
+    matcher = LexiconMatcher(["new york", "york city", "new york city", "city"])
+    found = matcher.match("new york city")
+    assert found.counts == {"new york": 1, "york city": 1, "new york city": 1, "city": 1}
+    assert found.unmatched_tokens == set()
+
+
+def test_word_boundaries():
+    found = LexiconMatcher(["male", "non-binary"]).match("female males non-binary non binary")
+    assert found.counts == {"non-binary": 1}
+
+
+def test_compiled_lexicon_is_reused():
+    assert compile_lexicon(SENSITIVE_TERMS) is compile_lexicon(list(SENSITIVE_TERMS))
+
+
+def test_bias_lexicon_frequency():
+    assert bias_lexicon_frequency("The applicant submitted the form.", SENSITIVE_TERMS) == 0.0
+    assert bias_lexicon_frequency("The female applicant.", SENSITIVE_TERMS) > 0.0
+    assert bias_lexicon_frequency("The illegal alien applied.", SENSITIVE_TERMS) > 0.0
+    assert bias_lexicon_frequency("", []) == 0.0
+    assert bias_lexicon_frequency_gap("The senior, applied.", "The applied.", SENSITIVE_TERMS) > 0.0
+
+
+def test_gaps_compile_the_lexicon_once(monkeypatch):
+    from utilities import metricsUtils as mu
+    calls = []
+    monkeypatch.setattr(mu, "compile_lexicon", lambda terms: calls.append(terms) or compile_lexicon(terms))
+    gaps = mu.bias_lexicon_frequency_gaps([("The senior applied.", "He applied."), ("a", "b")], SENSITIVE_TERMS)
+    assert len(calls) == 1 and gaps[0] > 0.0
+    assert compile_lexicon(SENSITIVE_TERMS) is compile_lexicon(SENSITIVE_TERMS)
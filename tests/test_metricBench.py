@@ -0,0 +1,45 @@
+from benchmarks import metricBench
+from benchmarks.metricBench import bench_metric, compare, synthetic_pairs
+
+
+def _report(**results):
+    return {"results": results}
+
+
+def test_synthetic_pairs_are_distinct():
+    pairs = synthetic_pairs(30)
+    assert len(pairs) == 30 and len(set(pairs)) == 30
+
+
+def test_bench_metric_reports_latency_and_throughput():
+    r = bench_metric("BLF", synthetic_pairs(16), calls=20, batch_sizes=[1, 8])
+    assert 0 < r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"]
+    assert set(r["pairs_per_s"]) == {"1", "8"}
+    assert r["cold_start_s"] >= 0
+
+
+def test_compare_flags_costs_up_and_throughput_down():
+    base = _report(SPS={"p95_ms": 10.0, "peak_rss_mb": 500.0, "pairs_per_s": {"32": 100.0}},
+                   BLF={"p95_ms": 1.0}, LES={"error": "offline"})
+    cur = _report(SPS={"p95_ms": 10.5, "peak_rss_mb": 700.0, "pairs_per_s": {"32": 80.0}},
+                  BLF={"p95_ms": 0.5}, LES={"p95_ms": 99.0})
+    found = {(r["benchmark"], r["field"]) for r in compare(base, cur, tolerance=0.10)}
+    assert found == {("SPS", "peak_rss_mb"), ("SPS", "pairs_per_s[32]")}
+
+
+def test_compare_cli_exit_code(tmp_path):
+    import json
+    a, b = tmp_path / "a.json", tmp_path / "b.json"
+    a.write_text(json.dumps(_report(SPG={"p50_ms": 1.0})))
+    b.write_text(json.dumps(_report(SPG={"p50_ms": 2.0})))
+    assert metricBench.main(["compare", str(a), str(a)]) == 0
+    assert metricBench.main(["compare", str(a), str(b)]) == 1
+
+
+def test_child_has_not_imported_the_metrics_before_measuring():
+    import subprocess
+    import sys
+    code = ("import sys; from benchmarks import metricBench; metricBench.synthetic_pairs(4); "
+            "print(sorted(m for m in ('utilities.metricsUtils', 'utilities.modelRegistry') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=str(metricBench.BASE), capture_output=True, text=True)
+    assert out.stdout.strip() == "[]"
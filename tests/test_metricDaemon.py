@@ -0,0 +1,110 @@
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+from tests.test_embeddingUtil import CountingEncoder
+from utilities import metricDaemon
+from utilities import metricsUtils as mu
+from utilities import sentimentCache
+from utilities.sentimentCache import SentimentCache
+
+pytestmark = pytest.mark.skipif(not metricDaemon.available(), reason="needs AF_UNIX sockets")
+
+
+class FakeDetoxify:
+    def predict(self, texts):
+        return {h: [len(t) / 100 for t in texts] for h in mu.TOXICITY_HEADS}
+
+
+@pytest.fixture
+def models(monkeypatch):
+    """Offline embedder/Detoxify stand-ins shared by the in-process path and the daemon."""
+    fakes = {"embedder": CountingEncoder(), "detoxify": FakeDetoxify()}
+    monkeypatch.setattr(mu, "get_model", fakes.__getitem__)
+    monkeypatch.setattr(mu, "get_embedding_cache", lambda *a, **kw: None)
+    return fakes
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch, models):
+    """A daemon serving from a thread of this process, with a fresh client state."""
+    path = str(tmp_path / "d.sock")
+    monkeypatch.setenv("FAIRNESS_DAEMON_SOCKET", path)
+    monkeypatch.setattr(metricDaemon, "_CLIENT", None)
+    monkeypatch.setattr(metricDaemon, "_RETRY_AT", 0.0)
+    monkeypatch.setattr(metricDaemon, "STATS", {"requests": 0, "fallbacks": 0})
+    server = metricDaemon.MetricServer(path)
+    thread = threading.Thread(target=server.serve, kwargs={"idle_timeout": 0, "poll": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.stopping.set()
+    thread.join()
+    if metricDaemon._CLIENT is not None:
+        metricDaemon._CLIENT.close()
+
+
+def test_frames_roundtrip_arrays():
+    a, b = socket.socketpair()
+    with a, b:
+        arrays = {"x": np.arange(6, dtype=np.float32).reshape(2, 3), "empty": np.zeros(0), "s": np.float64(2.5)}
+        metricDaemon.send_frame(a, {"op": "ping", "text": "¿sí?"}, arrays)
+        header, got = metricDaemon.recv_frame(b)
+    assert header == {"op": "ping", "text": "¿sí?"}
+    assert all(np.array_equal(got[k], v) and got[k].dtype == np.asarray(v).dtype for k, v in arrays.items())
+
+
+def test_metrics_computed_by_daemon_match_in_process(daemon, models):
+    pairs = [("The nurse approved the claim", "The nurse denied the claim"), ("same", "same")]
+    texts = ["short", "a much longer answer"]
+    with_daemon = (mu.semantic_parity_scores(pairs), mu.toxicity_scores(texts), mu.sentiment_polarity_gap(*pairs[0]))
+    assert metricDaemon.STATS == {"requests": 3, "fallbacks": 0} and daemon.requests == 3
+    daemon.stopping.set()
+    metricDaemon._CLIENT.close()
+    metricDaemon._CLIENT = None
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("FAIRNESS_DAEMON", "0")
+        in_process = (mu.semantic_parity_scores(pairs), mu.toxicity_scores(texts),
+                      mu.sentiment_polarity_gap(*pairs[0]))
+    assert np.allclose(with_daemon[0], in_process[0])
+    assert all(np.allclose(with_daemon[1][h], in_process[1][h]) for h in mu.TOXICITY_HEADS)
+    assert with_daemon[2] == pytest.approx(in_process[2])
+
+
+def test_no_daemon_means_in_process(tmp_path, monkeypatch, models):
+    monkeypatch.setenv("FAIRNESS_DAEMON_SOCKET", str(tmp_path / "missing.sock"))
+    monkeypatch.setattr(metricDaemon, "_CLIENT", None)
+    assert metricDaemon.get_client() is None
+    assert mu.semantic_parity_score("abc", "abc") == pytest.approx(1.0)
+    assert models["embedder"].calls
+
+
+def test_daemon_with_other_backend_is_not_used(daemon, models):
+    daemon.model_ids = dict(daemon.model_ids, embedder="all-MiniLM-L6-v2@onnx-int8")
+    assert mu.semantic_parity_score("abc", "abd") > 0
+    assert daemon.requests == 0 and models["embedder"].calls
+
+
+def test_daemon_running_older_code_is_not_used(daemon, models):
+    daemon.code = "started-before-edit"
+    assert mu.semantic_parity_score("abc", "abd") > 0
+    assert daemon.requests == 0 and models["embedder"].calls
+
+
+def test_daemon_errors_fall_back_in_process(daemon, models, monkeypatch):
+    def boom(op, req):
+        raise OSError("model download failed")
+    monkeypatch.setattr(metricDaemon, "_compute", boom)
+    monkeypatch.setattr(sentimentCache._CACHE, "instances", {(): SentimentCache(0)})
+    scores = mu.compound_scores(["fine words", "awful words"])
+    assert set(scores) == {"fine words", "awful words"}
+    assert metricDaemon.STATS["fallbacks"] == 1 and metricDaemon._CLIENT is None
+
+
+def test_cli_status_and_stop(daemon, capsys):
+    assert metricDaemon.main(["status"]) == 0
+    assert "pid" in capsys.readouterr().out
+    assert metricDaemon.main(["stop"]) == 0
+    daemon.stopping.wait(5)
+    assert daemon.stopping.is_set()
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from utilities import modelRegistry
+from utilities.fairnessEval import METRICS, evaluate, fetch_responses
+from utilities.rag_clientSample import MockRAGClient
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty registry with three fake models of known size and a log of loads."""
+    loads = []
+    for name in ("_LOADERS", "_MODELS", "_LAST_USED", "LOAD_SECONDS", "SIZES_MB", "EVICTIONS", "PHASES"):
+        monkeypatch.setattr(modelRegistry, name, {})
+    monkeypatch.setattr(modelRegistry, "SIZE_HINTS_MB", {"a": 40.0, "b": 40.0, "c": 40.0, "big": 500.0})
+    monkeypatch.setattr(modelRegistry, "rss_mb", lambda: None)  # sizes come from the hints
+    monkeypatch.setattr(modelRegistry, "_BUDGET_MB", None)
+    for name in ("a", "b", "c", "big"):
+        modelRegistry.register(name, lambda name=name: loads.append(name) or object())
+    return loads
+
+
+def test_no_budget_keeps_everything(registry):
+    for name in ("a", "b", "big"):
+        modelRegistry.get_model(name)
+    assert all(modelRegistry.is_loaded(n) for n in ("a", "b", "big")) and not modelRegistry.EVICTIONS
+
+
+def test_least_recently_used_model_evicted_over_budget(registry):
+    modelRegistry.set_budget(100)
+    first = modelRegistry.get_model("a")
+    modelRegistry.get_model("b")
+    assert modelRegistry.get_model("a") is first  # "a" is now the most recently used
+    modelRegistry.get_model("c")
+    assert registry == ["a", "b", "c"]
+    assert modelRegistry.is_loaded("a") and not modelRegistry.is_loaded("b")
+    assert modelRegistry.EVICTIONS == {"b": 1} and modelRegistry.resident_mb() == 80.0
+
+
+def test_model_larger_than_budget_loads_alone(registry):
+    modelRegistry.set_budget(100)
+    modelRegistry.get_model("a")
+    modelRegistry.get_model("b")
+    modelRegistry.get_model("big")
+    assert [n for n in ("a", "b", "big") if modelRegistry.is_loaded(n)] == ["big"]
+
+
+def test_phase_records_time_peak_and_evictions(registry, monkeypatch):
+    modelRegistry.set_budget(50)
+    modelRegistry.get_model("a")
+    monkeypatch.setattr(modelRegistry, "rss_mb", lambda: 123.0)
+    with modelRegistry.phase("b") as stats:
+        modelRegistry.get_model("b")
+    assert stats["evicted"] == ["a"] and stats["peak_rss_mb"] >= 123.0 and stats["seconds"] >= 0
+    with modelRegistry.phase("b", interval=0.001):
+        pass
+    assert modelRegistry.PHASES["b"]["evicted"] == ["a"]
+    assert modelRegistry.PHASES["b"]["seconds"] >= stats["seconds"]
+
+
+def test_evaluate_runs_each_model_as_one_phase(counterfactual_pairs, thresholds, authority_weights,
+                                               registry, monkeypatch):
+    calls = []
+    for metric in ("SPS", "LES", "ToxicityGap"):
+        spec = METRICS[metric]
+
+        def compute(batch, spec=spec):
+            modelRegistry.get_model(spec.model)
+            calls.append(spec.name)
+            return {c: np.zeros(len(batch.pairs)) for c in spec.columns}
+        monkeypatch.setattr(spec, "compute", compute)
+    modelRegistry.register("embedder", lambda: registry.append("embedder") or object())
+    modelRegistry.register("detoxify", lambda: registry.append("detoxify") or object())
+    modelRegistry.SIZE_HINTS_MB.update(embedder=80.0, detoxify=80.0)
+    modelRegistry.set_budget(100)
+    responses = fetch_responses(counterfactual_pairs, MockRAGClient())
+    result = evaluate(counterfactual_pairs, *responses, thresholds, authority_weights,
+                      metrics=["ToxicityGap", "LES", "SPS"])
+    # SPS and LES share the embedder, so it is loaded (and evicted) once.
+    assert calls == ["SPS", "LES", "ToxicityGap"] and registry == ["embedder", "detoxify"]
+    assert list(result.phases) == ["embedder", "detoxify"]
+    assert result.phases["embedder"]["metrics"] == ["SPS", "LES"]
+    assert result.phases["detoxify"]["evicted"] == ["embedder"]
+    assert result.summary()["phases"]["detoxify"]["metrics"] == ["ToxicityGap"]
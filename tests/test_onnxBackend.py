@@ -0,0 +1,89 @@
+import subprocess
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from utilities import onnxBackend
+from utilities.modelRegistry import model_id
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+WORDS = ["claim", "policy", "senior", "customer", "file", "auto", "support", "the", "a", "for", "is", "fast"]
+TEXTS = ["file the claim", "a senior customer", "support is fast for the policy", "auto"]
+
+
+@pytest.fixture(scope="module")
+def tiny_bert(tmp_path_factory):
+    """A randomly initialised 2-layer BERT and tokenizer saved locally (no downloads)."""
+    d = tmp_path_factory.mktemp("tiny_bert")
+    (d / "vocab.txt").write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    tokenizer = transformers.BertTokenizerFast(vocab_file=str(d / "vocab.txt"))
+    config = transformers.BertConfig(vocab_size=len(WORDS) + 5, hidden_size=32, num_hidden_layers=2,
+                                     num_attention_heads=2, intermediate_size=64, num_labels=6)
+    torch.manual_seed(0)
+    transformers.BertModel(config).save_pretrained(str(d))
+    tokenizer.save_pretrained(str(d))
+    return d, config, tokenizer
+
+
+def test_embedder_matches_sentence_transformer(tiny_bert, tmp_path):
+    st_models = pytest.importorskip("sentence_transformers.models")
+    from sentence_transformers import SentenceTransformer
+    d, _, _ = tiny_bert
+    word = st_models.Transformer(str(d), max_seq_length=32)
+    st = SentenceTransformer(modules=[word, st_models.Pooling(word.get_word_embedding_dimension(), "mean")])
+    expected = st.encode(TEXTS, normalize_embeddings=True, convert_to_numpy=True)
+    for quantize, tol in ((False, 1e-4), (True, 0.1)):
+        onnx = onnxBackend.OnnxEmbedder(onnxBackend.export_embedder("tiny", quantize, tmp_path, st_model=st),
+                                        quantize, threads=1)
+        got = onnx.encode(TEXTS, batch_size=3, normalize_embeddings=True)
+        assert got.shape == expected.shape
+        assert np.abs(got - expected).max() < tol
+
+
+def test_detoxify_matches_torch_classifier(tiny_bert, tmp_path):
+    d, config, tokenizer = tiny_bert
+    torch.manual_seed(1)
+    clf = transformers.BertForSequenceClassification(config).eval()
+    names = ["toxicity", "severe_toxicity", "obscene", "threat", "insult", "identity_attack"]
+    detox = types.SimpleNamespace(model=clf, tokenizer=tokenizer, class_names=names)
+    onnx = onnxBackend.OnnxDetoxify(onnxBackend.export_detoxify("tiny", directory=tmp_path, detox_model=detox),
+                                    threads=1)
+    with torch.no_grad():
+        enc = tokenizer(TEXTS, padding=True, return_tensors="pt")
+        expected = torch.sigmoid(clf(**enc).logits).numpy()
+    got = onnx.predict(TEXTS)
+    assert list(got) == names
+    assert onnxBackend.max_deviation(expected[:, 0], got["toxicity"]) < 1e-5
+    assert isinstance(onnx.predict("auto")["threat"], float)
+
+
+def test_exported_model_loads_without_transformers(tiny_bert, tmp_path):
+    d, config, _ = tiny_bert
+    slow = transformers.BertTokenizer(vocab_file=str(d / "vocab.txt"))
+    detox = types.SimpleNamespace(model=transformers.BertForSequenceClassification(config).eval(), tokenizer=slow,
+                                  class_names=["toxicity"])
+    out = onnxBackend.export_detoxify("slow", directory=tmp_path, detox_model=detox)
+    onnx = onnxBackend.OnnxDetoxify(out, threads=1)
+    got, want = onnx.tokenizer(TEXTS + ["claim claim"], padding=True, truncation=True, max_length=8,
+                               return_tensors="np"), slow(TEXTS + ["claim claim"], padding=True, return_tensors="np")
+    assert np.array_equal(got["input_ids"], want["input_ids"])
+    assert np.array_equal(got["attention_mask"], want["attention_mask"])
+    code = (f"import sys; from utilities import onnxBackend; onnxBackend.OnnxDetoxify({str(out)!r}).predict('auto'); "
+            "sys.exit(any(m in sys.modules for m in ('transformers', 'torch')))")
+    assert subprocess.run([sys.executable, "-c", code], cwd=str(Path(onnxBackend.__file__).resolve().parents[1])).returncode == 0
+
+
+def test_backend_selection(monkeypatch):
+    monkeypatch.setenv("FAIRNESS_BACKEND", "onnx-int8")
+    assert model_id("embedder") == "all-MiniLM-L6-v2@onnx-int8"
+    assert model_id("vader") == "vader"
+    monkeypatch.setenv("FAIRNESS_BACKEND", "tensorrt")
+    with pytest.raises(ValueError):
+        onnxBackend.backend()
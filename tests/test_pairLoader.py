@@ -0,0 +1,77 @@
+import gzip
+import json
+import pytest
+from utilities.pairLoader import PairSchemaError, iter_pairs, load_pairs, parse_shard, shard_of
+
+
+def make_pairs(n):
+    return [{"id": f"pair_{i}", "query_a": f"a {i}", "query_b": f"b {i}"} for i in range(n)]
+
+
+def write_jsonl(path, rows, compress=False):
+    data = "".join(json.dumps(r) + "\n" for r in rows).encode("utf-8")
+    if compress:
+        with gzip.open(path, "wb") as f:
+            f.write(data)
+    else:
+        path.write_bytes(data)
+
+
+@pytest.mark.parametrize("name,compress", [("pairs.jsonl", False), ("pairs.jsonl.gz", True)])
+def test_streams_jsonl_and_gzip(tmp_path, name, compress):
+    path = tmp_path / name
+    write_jsonl(path, make_pairs(5), compress=compress)
+    it = iter_pairs(path)
+    assert next(it)["id"] == "pair_0"
+    assert [r["id"] for r in it] == [f"pair_{i}" for i in range(1, 5)]
+    assert all(r["is_lang_pair"] is False for r in load_pairs(path))
+
+
+def test_shards_partition_the_dataset(tmp_path):
+    path = tmp_path / "pairs.jsonl"
+    write_jsonl(path, make_pairs(200))
+    shards = [load_pairs(path, shard=f"{i}/4") for i in range(4)]
+    ids = [r["id"] for s in shards for r in s]
+    assert sorted(ids) == sorted(r["id"] for r in make_pairs(200))
+    assert all(shards)
+    assert all(shard_of(r["id"], 4) == i for i, s in enumerate(shards) for r in s)
+
+
+def test_schema_errors_name_the_line(tmp_path):
+    path = tmp_path / "pairs.jsonl"
+    rows = make_pairs(3)
+    del rows[2]["query_b"]
+    write_jsonl(path, rows)
+    with pytest.raises(PairSchemaError, match=r"pairs.jsonl:3: field 'query_b'"):
+        load_pairs(path)
+
+
+@pytest.mark.parametrize("spec", ["3/3", "x/2", "1", "-1/2"])
+def test_bad_shard_spec(spec):
+    with pytest.raises(ValueError):
+        parse_shard(spec)
+
+
+def test_repo_pairs_file_is_valid():
+    from tests.conftest import DATA_DIR
+    path = DATA_DIR / "counterfactual_pairs.json"
+    assert len(load_pairs(path)) == len(json.loads(path.read_text(encoding="utf-8")))
+
+
+def test_group_schema(tmp_path):
+    from utilities.pairLoader import load_groups
+    path = tmp_path / "groups.jsonl"
+    good = {"id": "g", "base": "q", "variants": [{"id": "age", "query": "q senior"}]}
+    write_jsonl(path, [good, {"id": "h", "base": "q", "variants": [{"id": "x", "query": "a"},
+                                                                   {"id": "x", "query": "b"}]}])
+    with pytest.raises(PairSchemaError, match=r"groups.jsonl:2.variants\[1\]: duplicate variant id 'x'"):
+        load_groups(path)
+    write_jsonl(path, [good])
+    assert load_groups(path)[0]["variants"][0]["is_lang"] is False
+
+
+def test_repo_groups_file_is_valid():
+    from tests.conftest import DATA_DIR
+    from utilities.pairLoader import load_groups
+    path = DATA_DIR / "counterfactual_groups.json"
+    assert len(load_groups(path)) == len(json.loads(path.read_text(encoding="utf-8")))
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from utilities import parallelRunner
+from utilities.fairnessEval import evaluate, fetch_responses
+from utilities.parallelRunner import chunk_ranges, evaluate_parallel, merge_results
+from utilities.rag_clientSample import MockRAGClient
+from utilities.resultCache import ResultCache
+
+CHEAP = ["SPG", "BLF", "RFI", "RBO", "CitationMin", "DocRecency", "Authority"]
+
+
+@pytest.fixture
+def responses(counterfactual_pairs):
+    return fetch_responses(counterfactual_pairs, MockRAGClient())
+
+
+def test_chunk_ranges_cover_every_pair():
+    ranges = chunk_ranges(103, workers=4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == 103
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert len(ranges) >= 4 * 4 - 1
+    assert chunk_ranges(0, 4) == []
+
+
+@pytest.mark.skipif(not parallelRunner.can_fork(), reason="needs the fork start method")
+def test_parallel_matches_serial(counterfactual_pairs, responses, thresholds, authority_weights):
+    serial = evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=CHEAP)
+    parallel = evaluate_parallel(counterfactual_pairs, *responses, thresholds, authority_weights,
+                                 workers=3, metrics=CHEAP, chunk_size=2)
+    assert list(parallel.rows()) == list(serial.rows())
+    for metric in CHEAP:
+        assert np.array_equal(parallel.gate(metric), serial.gate(metric))
+
+
+@pytest.mark.skipif(not parallelRunner.can_fork(), reason="needs the fork start method")
+def test_worker_errors_are_merged(counterfactual_pairs, responses, thresholds, authority_weights, monkeypatch):
+    class Unpicklable(Exception):
+        def __init__(self, a, b):
+            super().__init__(a)
+
+    def boom(batch):
+        raise Unpicklable("no model", 1)
+    monkeypatch.setattr(parallelRunner.fairnessEval.METRICS["BLF"], "compute", boom)
+    result = evaluate_parallel(counterfactual_pairs, *responses, thresholds, authority_weights,
+                               workers=2, metrics=["BLF", "RFI"], chunk_size=4)
+    assert "no model" in result.summary()["gates"]["BLF"]["error"]
+    assert len(result.column("RFI")) == len(counterfactual_pairs)
+
+
+@pytest.mark.skipif(not parallelRunner.can_fork(), reason="needs the fork start method")
+def test_worker_cache_counts_reach_the_parent(counterfactual_pairs, responses, thresholds, authority_weights,
+                                              tmp_path):
+    cache = ResultCache(tmp_path / "results.sqlite")
+    for expect_hits in (0, len(counterfactual_pairs)):
+        cache.hits = cache.misses = 0
+        result = evaluate_parallel(counterfactual_pairs, *responses, thresholds, authority_weights,
+                                   workers=2, metrics=["RFI"], chunk_size=4, result_cache=cache)
+        assert cache.stats() == {"hits": expect_hits, "misses": len(counterfactual_pairs) - expect_hits}
+        assert result.caches[("result",)] == cache.stats()
+    cache.close()
+
+
+def test_merge_takes_the_union_of_columns():
+    parts = [(2, {"pair_id": ["c"], "SPS": np.array([0.5])}, {}, {}, {}, {}, {("result",): {"hits": 1, "misses": 0}}),
+             (0, {"pair_id": ["a", "b"]}, {}, {}, {}, {}, {("result",): {"hits": 0, "misses": 2}})]
+    merged = merge_results(parts)
+    assert merged.columns["pair_id"] == ["a", "b", "c"]
+    assert np.array_equal(merged.columns["SPS"], [np.nan, np.nan, 0.5], equal_nan=True)
+    assert merged.caches == {("result",): {"hits": 1, "misses": 2}}
+
+
+def test_single_worker_runs_in_process(counterfactual_pairs, responses, thresholds, authority_weights, monkeypatch):
+    monkeypatch.setattr(parallelRunner.mp, "get_context", None)
+    result = evaluate_parallel(counterfactual_pairs, *responses, thresholds, authority_weights,
+                               workers=1, metrics=["RFI"])
+    assert len(result) == len(counterfactual_pairs)
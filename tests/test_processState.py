@@ -0,0 +1,27 @@
+from utilities import instrumentation
+from utilities.processState import Shared, env_flag, env_int, export_stats
+
+
+def test_env_parsing(monkeypatch):
+    monkeypatch.setenv("FAIRNESS_X", "off")
+    monkeypatch.setenv("FAIRNESS_N", " ")
+    assert not env_flag("FAIRNESS_X") and env_flag("FAIRNESS_UNSET") and not env_flag("FAIRNESS_UNSET", False)
+    assert env_int("FAIRNESS_N", 7) == 7
+
+
+def test_shared_builds_once_per_key():
+    built = []
+    shared = Shared(lambda *key: built.append(key) or list(key))
+    assert shared.get("a") is shared.get("a") and shared.get() == []
+    assert built == [("a",), ()] and shared.peek("b") is None
+
+
+def test_export_stats(monkeypatch):
+    monkeypatch.setattr(instrumentation, "_COLLECTORS", [])
+    export_stats("demo_cache", lambda: {"": {"hits": 2, "misses": 1}, "m": {"hits": 0, "misses": 0, "entries": 3}})
+    (collect,) = instrumentation._COLLECTORS
+    assert list(collect()) == [
+        ("counter", "fairness_demo_cache_hits", {}, 2), ("counter", "fairness_demo_cache_misses", {}, 1),
+        ("counter", "fairness_demo_cache_hits", {"cache": "m"}, 0),
+        ("counter", "fairness_demo_cache_misses", {"cache": "m"}, 0),
+        ("gauge", "fairness_demo_cache_entries", {"cache": "m"}, 3)]
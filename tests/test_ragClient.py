@@ -0,0 +1,81 @@
+import asyncio
+import time
+import pytest
+from utilities.rag_clientSample import (
+    AsyncRAGClientAdapter, HTTPRAGClient, MockRAGClient, PrefetchedRAGClient, RAGResponse
+)
+from utilities.ragServer import MockRAGServer
+
+QUERIES = [
+    "How do I file an auto claim for windshield damage for a senior customer?",
+    "What documents are needed to add a new driver who is a nurse to a policy?",
+    "Steps to check policy eligibility for a female homeowner insurance applicant.",
+    "¿Cuál es el deducible para la cobertura contra tormentas de viento en zonas costeras?",
+    "How can she change her address online?",
+]
+
+
+def test_http_client_matches_mock_and_runs_concurrently():
+    pytest.importorskip("httpx")
+    latency = 0.2
+    with MockRAGServer(latency=latency) as server:
+        client = HTTPRAGClient(server.url, concurrency=len(QUERIES))
+
+        async def run():
+            try:
+                return await client.aquery_many(QUERIES)
+            finally:
+                await client.aclose()
+
+        t0 = time.perf_counter()
+        got = asyncio.run(run())
+        elapsed = time.perf_counter() - t0
+    mock = MockRAGClient()
+    assert got == [mock.query(q) for q in QUERIES]
+    assert elapsed < latency * len(QUERIES) / 2
+
+
+def test_blocking_queries_reuse_one_connection():
+    pytest.importorskip("httpx")
+    with MockRAGServer() as server:
+        connections = []
+        accept = server._httpd.process_request
+        server._httpd.process_request = lambda sock, addr: connections.append(addr) or accept(sock, addr)
+        client = HTTPRAGClient(server.url)
+        got = [client.query(q) for q in QUERIES]
+        client.close()
+    mock = MockRAGClient()
+    assert got == [mock.query(q) for q in QUERIES]
+    assert len(connections) == 1
+
+
+class FlakyClient:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def query(self, q):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("connection reset")
+        return RAGResponse(text=q, citations=[], retrieved=[])
+
+
+def test_retries_with_backoff_then_gives_up():
+    ok = AsyncRAGClientAdapter(FlakyClient(failures=2), retries=2)
+    ok.backoff = 0.001
+    assert asyncio.run(ok.aquery("q")).text == "q"
+
+    bad = AsyncRAGClientAdapter(FlakyClient(failures=5), retries=1)
+    bad.backoff = 0.001
+    with pytest.raises(ConnectionError):
+        asyncio.run(bad.aquery("q"))
+
+
+def test_prefetched_client_deduplicates_queries():
+    inner = FlakyClient(failures=0)
+    client = PrefetchedRAGClient(inner, ["a", "b", "a", "b"], concurrency=2)
+    assert inner.calls == 2
+    assert client.query("a").text == "a"
+    assert client.query("c").text == "c"
+    assert inner.calls == 3
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from utilities import ragRecorder
+from utilities.fairnessEval import fetch_responses
+from utilities.ragRecorder import (
+    DATA_FILE, INDEX_FILE, RecordingRAGClient, ReplayMiss, ReplayRAGClient, ResponseStore, configure_client, main
+)
+from utilities.rag_clientSample import MockRAGClient, RAGResponse
+
+
+def _resp(i):
+    return RAGResponse(text=f"answer {i} ¿sí?", citations=[f"doc:{i}.pdf"],
+                       retrieved=[{"doc_id": f"D{i}", "year": 2020 + i % 5, "source_type": "gov"}])
+
+
+def test_roundtrip_through_index_growth(tmp_path, monkeypatch):
+    monkeypatch.setattr(ragRecorder, "INITIAL_CAPACITY", 4)
+    with ResponseStore(tmp_path, writable=True) as store:
+        store.put_many((f"q{i}", _resp(i)) for i in range(50))
+        store.put("q7", _resp(700))
+        assert len(store) == 50
+    with ResponseStore(tmp_path) as store:
+        assert store.get("q3") == _resp(3) and store.get("q7") == _resp(700)
+        assert store.get("never asked") is None
+        assert sorted(store.queries()) == sorted(f"q{i}" for i in range(50))
+        with pytest.raises(PermissionError):
+            store.put("q1", _resp(1))
+
+
+def test_missing_index_and_torn_record_recovered(tmp_path):
+    with ResponseStore(tmp_path, writable=True) as store:
+        store.put_many((f"q{i}", _resp(i)) for i in range(5))
+    (tmp_path / INDEX_FILE).unlink()
+    with open(tmp_path / DATA_FILE, "ab") as f:
+        f.write(b"\xff\x00\x00\x00{\"q\":")  # crash mid-append
+    with ResponseStore(tmp_path) as store:
+        assert len(store) == 5 and store.get("q4") == _resp(4)
+    with ResponseStore(tmp_path, writable=True) as store:
+        store.put("q5", _resp(5))
+    with ResponseStore(tmp_path) as store:
+        assert len(store) == 6 and store.get("q5") == _resp(5)
+
+
+def test_record_then_replay_offline(tmp_path, counterfactual_pairs):
+    with ResponseStore(tmp_path, writable=True) as store:
+        recorded = fetch_responses(counterfactual_pairs, RecordingRAGClient(MockRAGClient(), store))
+    with ResponseStore(tmp_path) as store:
+        replayed = fetch_responses(counterfactual_pairs, ReplayRAGClient(store))
+        assert replayed == recorded
+        with pytest.raises(ReplayMiss):
+            ReplayRAGClient(store).query("not recorded")
+
+
+def test_replay_misses_fall_back_and_get_recorded(tmp_path):
+    mock = MockRAGClient()
+    with ResponseStore(tmp_path / "base", writable=True) as store:
+        store.put("a senior question", mock.query("a senior question"))
+    client = configure_client(mock, record=str(tmp_path / "new"), replay=str(tmp_path / "base"))
+    got = asyncio.run(client.aquery_many(["a senior question", "a nurse question"]))
+    assert got == [mock.query("a senior question"), mock.query("a nurse question")]
+    with ResponseStore(tmp_path / "new") as new:
+        assert list(new.queries()) == ["a nurse question"]
+
+
+def test_cli_record_and_info(tmp_path, capsys):
+    assert main(["record", "--store", str(tmp_path)]) == 0
+    assert main(["info", "--store", str(tmp_path)]) == 0
+    assert "24 queries" in capsys.readouterr().out
@@ -0,0 +1,103 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+from utilities.fairnessEval import METRICS, evaluate, fetch_responses
+from utilities.rag_clientSample import MockRAGClient, RAGResponse
+from utilities.resultCache import ResultCache
+
+CHEAP = ["SPG", "BLF", "RFI", "RBO", "CitationMin", "DocRecency", "Authority"]
+
+
+@pytest.fixture
+def responses(counterfactual_pairs):
+    return fetch_responses(counterfactual_pairs, MockRAGClient())
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = ResultCache(tmp_path / "results.sqlite")
+    yield c
+    c.close()
+
+
+@pytest.fixture
+def counting(monkeypatch):
+    """Wrap every cheap metric's compute() to record how many pairs it was asked for."""
+    calls = {}
+    for name in CHEAP:
+        spec = METRICS[name]
+
+        def compute(batch, _inner=spec.compute, _name=name):
+            calls.setdefault(_name, []).append(len(batch.pairs))
+            return _inner(batch)
+        monkeypatch.setitem(METRICS, name, dataclasses.replace(spec, compute=compute))
+    return calls
+
+
+def test_rerun_reuses_every_pair(counterfactual_pairs, responses, thresholds, authority_weights, cache, counting):
+    first = evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=CHEAP,
+                     result_cache=cache)
+    second = evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=CHEAP,
+                      result_cache=cache)
+    assert all(calls == [len(counterfactual_pairs)] for calls in counting.values())
+    uncached = evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=CHEAP)
+    assert list(first.rows()) == list(second.rows()) == list(uncached.rows())
+    for metric in CHEAP:
+        assert np.array_equal(second.gate(metric), uncached.gate(metric))
+    assert cache.stats()["hits"] == len(CHEAP) * len(counterfactual_pairs)
+
+
+def test_only_changed_pairs_recomputed(counterfactual_pairs, responses, thresholds, authority_weights,
+                                       cache, counting):
+    evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=CHEAP, result_cache=cache)
+    responses_a, responses_b = list(responses[0]), list(responses[1])
+    old = responses_b[1]
+    responses_b[1] = old.replace(text=old.text + " Terrible, awful service.")
+    changed = evaluate(counterfactual_pairs, responses_a, responses_b, thresholds, authority_weights,
+                       metrics=CHEAP, result_cache=cache)
+    assert all(calls[-1] == 1 for calls in counting.values())
+    fresh = evaluate(counterfactual_pairs, responses_a, responses_b, thresholds, authority_weights, metrics=CHEAP)
+    assert list(changed.rows()) == list(fresh.rows())
+
+
+def test_thresholds_regate_without_recompute(counterfactual_pairs, responses, thresholds, authority_weights,
+                                             cache, counting):
+    evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=["SPG"], result_cache=cache)
+    strict = evaluate(counterfactual_pairs, *responses, {**thresholds, "SPG": -1.0}, authority_weights,
+                      metrics=["SPG"], result_cache=cache)
+    assert counting["SPG"] == [len(counterfactual_pairs)]
+    assert not strict.gate("SPG").any()
+
+
+def test_context_and_version_invalidate(counterfactual_pairs, responses, thresholds, authority_weights,
+                                        cache, counting, monkeypatch):
+    n = len(counterfactual_pairs)
+    evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=["DocRecency", "RFI"],
+             result_cache=cache)
+    evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=["DocRecency", "RFI"],
+             active_year=2030, result_cache=cache)
+    assert counting["DocRecency"] == [n, n] and counting["RFI"] == [n]
+    monkeypatch.setitem(METRICS, "RFI", dataclasses.replace(METRICS["RFI"], version=2))
+    evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=["RFI"], result_cache=cache)
+    assert counting["RFI"] == [n, n]
+
+
+def test_errors_are_not_cached(counterfactual_pairs, responses, thresholds, authority_weights, cache, monkeypatch):
+    def boom(batch):
+        raise RuntimeError("model unavailable")
+    monkeypatch.setitem(METRICS, "SPG", dataclasses.replace(METRICS["SPG"], compute=boom))
+    result = evaluate(counterfactual_pairs, *responses, thresholds, authority_weights, metrics=["SPG"],
+                      result_cache=cache)
+    assert "SPG" in result.errors and len(cache) == 0
+
+
+def test_lru_prune_and_nan_roundtrip(tmp_path):
+    cache = ResultCache(tmp_path / "r.sqlite", max_entries=2)
+    cache.put_many("LES", [(b"a", [float("nan")]), (b"b", [0.5])])
+    cache.get_many([b"a"])
+    cache.put_many("LES", [(b"c", [0.7])])
+    found = cache.get_many([b"a", b"b", b"c"])
+    assert set(found) == {b"a", b"c"} and np.isnan(found[b"a"][0])
+    cache.close()
@@ -0,0 +1,116 @@
+import pickle
+import random
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from utilities import metricsUtils as mu
+from utilities import retrievalBatch as rb
+from utilities.rag_clientSample import RAGResponse
+
+
+def _random_lists(n, seed=7):
+    rnd = random.Random(seed)
+    types = ["peer_reviewed", "government", "blog", "mystery", "news"]
+    return [[{"doc_id": f"d{rnd.randrange(12)}", "year": rnd.choice([2018, 2021, 2023, 2025, None]),
+              "source_type": rnd.choice(types)} for _ in range(rnd.randrange(0, 8))] for _ in range(n)]
+
+
+@pytest.fixture
+def batches(authority_weights):
+    la, lb = _random_lists(300, seed=1), _random_lists(300, seed=2)
+    ids, sources = rb.Interner(), rb.SourceTypes(authority_weights)
+    return la, lb, rb.RetrievalBatch.from_lists(la, ids, sources), rb.RetrievalBatch.from_lists(lb, ids, sources), sources
+
+
+def _ids(lists):
+    return [[d["doc_id"] for d in r] for r in lists]
+
+
+def test_rfi_matches_scalar(batches):
+    la, lb, a, b, _ = batches
+    expected = [mu.retrieval_fairness_index(x, y, k=5) for x, y in zip(_ids(la), _ids(lb))]
+    assert np.array_equal(rb.retrieval_fairness_indices(a, b, k=5), expected)
+
+
+def test_dri_and_authority_match_scalar(batches, authority_weights):
+    la, _, a, _, sources = batches
+    assert np.array_equal(rb.doc_recency_indices(a, 2025), [mu.doc_recency_index(r, 2025) for r in la])
+    expected = [mu.authority_score(r, authority_weights) for r in la]
+    assert np.allclose(rb.authority_scores(a, sources), expected, atol=1e-4)
+
+
+def test_rbo_matches_scalar(batches):
+    la, lb, a, b, _ = batches
+    expected = [mu.rank_biased_overlap(x, y) for x, y in zip(_ids(la), _ids(lb))]
+    assert np.allclose(rb.rank_biased_overlaps(a, b), expected, atol=1e-4)
+
+
+def test_rbo_is_rank_aware():
+    assert mu.rank_biased_overlap(list("abc"), list("abc")) == 1.0
+    assert mu.rank_biased_overlap(list("abc"), list("xyz")) == 0.0
+    swapped_top = mu.rank_biased_overlap(list("abcde"), list("bacde"))
+    swapped_tail = mu.rank_biased_overlap(list("abcde"), list("abced"))
+    assert swapped_top < swapped_tail < 1.0
+    assert mu.retrieval_fairness_index(list("abcde"), list("bacde")) == 1.0
+
+
+def test_response_batch_matches_from_lists(batches, authority_weights):
+    la, lb, a, b, sources = batches
+    ids = rb.Interner()
+    ca = rb.RAGResponseBatch.from_responses([RAGResponse("t", ["c"] * (i % 3), r) for i, r in enumerate(la)],
+                                            ids, sources)
+    cb = rb.RAGResponseBatch.from_responses([RAGResponse("t", [], r) for r in lb], ids, sources)
+    for got, want in ((ca.retrieved, a), (cb.retrieved, b)):
+        assert np.array_equal(got.years, want.years) and np.array_equal(got.source_codes, want.source_codes)
+        assert np.array_equal(got.lengths, want.lengths)
+    assert np.array_equal(rb.retrieval_fairness_indices(ca.retrieved, cb.retrieved),
+                          rb.retrieval_fairness_indices(a, b))
+    assert np.array_equal(rb.rank_biased_overlaps(ca.retrieved, cb.retrieved), rb.rank_biased_overlaps(a, b))
+    assert ca.citation_counts.tolist() == [i % 3 for i in range(len(la))]
+    narrow = rb.RAGResponseBatch.from_responses([RAGResponse("t", [], r) for r in la], ids, sources, width=2)
+    assert np.array_equal(narrow.retrieved.doc_codes, ca.retrieved.doc_codes[:, :2])
+
+
+def test_response_keeps_retrieved_compactly():
+    docs = [{"doc_id": f"D{j}", "year": 2020 + j, "source_type": "gov"} for j in range(3)]
+    resp = RAGResponse("answer", ["a.pdf"], docs)
+    assert list(resp.retrieved) == docs and resp.to_dict()["retrieved"] == docs
+    assert pickle.loads(pickle.dumps(resp)) == resp
+    odd = [{"doc_id": "D9", "year": None, "source_type": "blog", "score": 0.7}]
+    assert list(RAGResponse("answer", [], odd).retrieved) == odd  # not representable as records: kept as given
+    tracemalloc.start()
+    as_dicts = [(["a.pdf"], [dict(d) for d in docs]) for _ in range(2000)]
+    dict_size, _ = tracemalloc.get_traced_memory()
+    compact = [RAGResponse("answer", c, r) for c, r in as_dicts]
+    compact_size = tracemalloc.get_traced_memory()[0] - dict_size
+    tracemalloc.stop()
+    assert len(compact) == 2000 and compact_size * 2.5 < dict_size
+
+
+@pytest.mark.parametrize("docs", [[{"doc_id": "D1", "year": 2020, "source_type": "gov"}],
+                                  [{"doc_id": "D1", "year": None, "source_type": "gov", "score": 0.7}]])
+def test_retrieved_is_read_only(docs):
+    resp = RAGResponse("answer", [], docs)
+    with pytest.raises(AttributeError):
+        resp.retrieved.append({"doc_id": "D2"})
+    with pytest.raises(TypeError):
+        resp.retrieved[0]["year"] = 1999
+    docs[0]["year"] = 1999  # the caller's list is copied, not shared
+    assert resp.retrieved[0]["year"] != 1999
+    moved = resp.replace(retrieved=[dict(resp.retrieved[0], year=2024)])
+    assert moved.retrieved[0]["year"] == 2024 and moved.text == resp.text
+    assert resp.retrieved is resp.retrieved  # unpacked once, not on every access
+    resp.retrieved = [dict(resp.retrieved[0], year=2021)]
+    assert resp.retrieved[0]["year"] == 2021
+
+
+def test_no_process_wide_doc_codes():
+    """Doc ids live only as long as the responses holding them (fairnessMonitor builds one per log line)."""
+    tracemalloc.start()
+    for i in range(50_000):
+        RAGResponse("a", [], [{"doc_id": f"DOC-{i}-" + "x" * 200, "year": 2020, "source_type": "gov"}])
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert retained < 4_000_000  # the ids alone are over 12 MB
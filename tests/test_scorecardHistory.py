@@ -0,0 +1,46 @@
+import json
+from utilities.scorecardHistory import connect, diff, ingest, regressions, runs, trend
+from utilities.scorecardWriter import ScorecardWriter
+
+
+def legacy_scorecard(path, sps, spg):
+    rows = [{"pair_id": pid, "query_a": "a", "query_b": "b", "is_lang_pair": False,
+             "SPS": sps[pid], "SPG": spg, "LES": "", "ACTIVE_YEAR": 2025, "Thresholds": {"SPS": 0.8}}
+            for pid in sps]
+    path.write_text(json.dumps(rows), encoding="utf-8")
+
+
+def test_ingest_trend_and_regressions(tmp_path):
+    legacy_scorecard(tmp_path / "fairness_scorecard_20250101_000000.json", {"p1": 1.0, "p2": 0.9}, 0.0)
+    legacy_scorecard(tmp_path / "fairness_scorecard_20250102_000000.json", {"p1": 0.95, "p2": 0.9}, 0.1)
+    # The CSV twin of a JSON scorecard is the same run and must not be loaded twice.
+    (tmp_path / "fairness_scorecard_20250102_000000.csv").write_text("pair_id,SPS\np1,0.95\n", encoding="utf-8")
+    with ScorecardWriter(tmp_path, run_id="20250103_000000") as w:
+        w.extend([{"pair_id": "p1", "SPS": 0.7, "SPG": 0.0, "LES": None},
+                  {"pair_id": "p2", "SPS": 0.9, "SPG": 0.0, "LES": None}])
+
+    con = connect(tmp_path / "history.sqlite")
+    assert ingest(con, tmp_path) == {"loaded": 3, "skipped": 0}
+    assert ingest(con, tmp_path) == {"loaded": 0, "skipped": 3}
+    assert runs(con) == ["20250101_000000", "20250102_000000", "20250103_000000"]
+
+    assert [v for _, _, v in trend(con, "SPS", "p1")] == [1.0, 0.95, 0.7]
+    assert trend(con, "LES") == []
+
+    drops = regressions(con, "SPS", tolerance=0.1)
+    assert drops == [("20250103_000000", "p1", 0.95, 0.7)]
+    # SPG is a gap, so a rise is the regression.
+    assert [r[0] for r in regressions(con, "SPG", pair_id="p1")] == ["20250102_000000"]
+
+    changed = diff(con, "20250101_000000", "20250103_000000", metric="SPS")
+    assert [(pid, round(d, 2)) for pid, _, _, _, d in changed] == [("p1", -0.3)]
+
+
+def test_changed_file_is_reingested(tmp_path):
+    path = tmp_path / "fairness_scorecard_20250101_000000.json"
+    legacy_scorecard(path, {"p1": 1.0}, 0.0)
+    con = connect(tmp_path / "history.sqlite")
+    ingest(con, tmp_path)
+    legacy_scorecard(path, {"p1": 0.5, "p2": 0.5}, 0.0)
+    assert ingest(con, tmp_path)["loaded"] == 1
+    assert [v for _, _, v in trend(con, "SPS")] == [0.5, 0.5]
@@ -0,0 +1,52 @@
+import csv
+import json
+from utilities.scorecardWriter import ScorecardWriter, export_legacy, iter_rows, read_metadata
+
+THRESHOLDS = {"SPS": 0.8, "ACTIVE_YEAR": 2025}
+
+
+def row(i):
+    return {"pair_id": f"p{i}", "query_a": "a", "query_b": "b", "is_lang_pair": False,
+            "SPS": 0.9, "LES": None, "Citations_A": 2}
+
+
+def test_rows_are_flushed_incrementally(tmp_path):
+    w = ScorecardWriter(tmp_path, metadata={"Thresholds": THRESHOLDS}, run_id="r1", flush_every=2)
+    w.extend([row(0), row(1), row(2)])
+    # Two rows are already on disk before the run finishes; the sidecar says it is still running.
+    assert len(w.path.read_text(encoding="utf-8").splitlines()) == 3
+    assert read_metadata(w.path)["status"] == "running"
+    w.close()
+    meta = read_metadata(w.path)
+    assert meta["status"] == "complete" and meta["rows"] == 3
+    assert meta["Thresholds"] == THRESHOLDS
+    header = w.path.read_text(encoding="utf-8").splitlines()[0]
+    assert "Thresholds" not in header
+
+
+def test_export_legacy_layout(tmp_path):
+    with ScorecardWriter(tmp_path, metadata={"ACTIVE_YEAR": 2025, "Thresholds": THRESHOLDS}, run_id="r2") as w:
+        w.extend([row(0), row(1)])
+    assert list(iter_rows(w.path))[0] == {**row(0), "LES": ""}
+    csv_path, json_path = export_legacy(w.path)
+    assert csv_path.name == "fairness_scorecard_r2.csv"
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        legacy = list(csv.DictReader(f))
+    assert legacy[0]["ACTIVE_YEAR"] == "2025" and legacy[0]["Thresholds"] == str(THRESHOLDS)
+    rows = json.loads(json_path.read_text(encoding="utf-8"))
+    assert rows[1]["pair_id"] == "p1" and rows[1]["SPS"] == 0.9 and rows[1]["Thresholds"] == THRESHOLDS
+
+
+def test_late_columns_widen_the_header(tmp_path):
+    w = ScorecardWriter(tmp_path, run_id="r3", flush_every=2)
+    w.extend([row(0), {**row(1), "ToxicityGap": 0.1}, {**row(2), "RBO": 0.5}, {**row(3), "RBO": 0.4}])
+    w.close()
+    rows = list(iter_rows(w.path))
+    assert [r["RBO"] for r in rows] == ["", "", 0.5, 0.4] and rows[1]["ToxicityGap"] == 0.1
+    assert read_metadata(w.path)["columns"][-2:] == ["ToxicityGap", "RBO"]
+
+
+def test_run_without_rows_writes_nothing(tmp_path):
+    with ScorecardWriter(tmp_path, run_id="r4") as w:
+        pass
+    assert not w.path.exists() and not w.meta_path.exists()
@@ -0,0 +1,36 @@
+from utilities import sentimentCache
+from utilities.metricsUtils import sentiment_polarity_gap, sentiment_polarity_gaps
+from utilities.sentimentCache import SentimentCache, compound_scores
+
+
+def test_lru_bound_and_counters():
+    cache = SentimentCache(max_entries=2)
+    cache.store({"a": 0.1, "b": 0.2})
+    assert cache.lookup(["a"]) == {"a": 0.1}
+    cache.store({"c": 0.3})
+    assert cache.lookup(["a", "b", "c"]) == {"a": 0.1, "c": 0.3}
+    assert cache.stats() == {"hits": 3, "misses": 1, "entries": 2}
+
+
+def test_each_unique_text_scored_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sentimentCache, "_score_chunk", lambda texts: calls.append(list(texts)) or [0.5] * len(texts))
+    cache = SentimentCache()
+    assert compound_scores(["x", "y", "x"], cache=cache) == {"x": 0.5, "y": 0.5}
+    compound_scores(["y", "z"], cache=cache)
+    assert calls == [["x", "y"], ["z"]]
+    assert cache.stats()["hits"] == 1
+
+
+def test_process_pool_matches_in_process(monkeypatch):
+    monkeypatch.setattr(sentimentCache, "MIN_TEXTS_PER_WORKER", 1)
+    texts = [f"The service was {w}." for w in ("great", "slow", "fine", "terrible")]
+    serial = compound_scores(texts, workers=0, cache=SentimentCache())
+    pooled = compound_scores(texts, workers=2, cache=SentimentCache())
+    assert pooled == serial
+
+
+def test_gap_functions_use_cache():
+    a, b = "Great, helpful answer.", "Confusing and slow."
+    assert sentiment_polarity_gap(a, b) == sentiment_polarity_gaps([(a, b)])[0] > 0
+    assert sentiment_polarity_gap(a, a) == 0.0
@@ -0,0 +1,233 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utilities.processState import Shared, env_flag, env_int, export_stats
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[1] / "reports" / ".embedding_cache"
+DEFAULT_MAX_ENTRIES = 50_000
+_SQL_CHUNK = 500
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+
+class EmbeddingCache:
+    """Persistent embeddings of one (model, normalize) namespace: a memory-mapped
+    vector array plus a SQLite index of text hash -> row with LRU eviction."""
+
+    def __init__(self, directory, model_name: str, normalize: bool = True,
+                 dtype: str = "float32", max_entries: int = DEFAULT_MAX_ENTRIES):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported cache dtype: {dtype}")
+        self.model_name = model_name
+        self.normalize = bool(normalize)
+        self.dtype = np.dtype(dtype)
+        self.max_entries = int(max_entries)
+        ns = f"{_safe_name(model_name)}-{'norm' if self.normalize else 'raw'}-{dtype}"
+        self.path = Path(directory) / ns
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._mm = None
+        self._conn = None
+        self._pid = None
+        self._connect()
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # A forked worker must not reuse the parent's connection or memmap.
+        if self._pid != os.getpid():
+            self._connect()
+        return self._conn
+
+    def _connect(self):
+        self._mm = None
+        self._conn = db = sqlite3.connect(str(self.path / "index.sqlite"), timeout=60,
+                                          isolation_level=None, check_same_thread=False)
+        self._pid = os.getpid()
+        # Rollback journal (not WAL): an EXCLUSIVE writer waits for readers to finish.
+        db.execute("PRAGMA journal_mode=DELETE")
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            db.execute("CREATE TABLE IF NOT EXISTS entries ("
+                       "hash BLOB PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, "
+                       "last_used INTEGER NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+            stored = self._meta("max_entries")
+            if stored is None:
+                self._set_meta("max_entries", self.max_entries)
+                self._set_meta("model_name", self.model_name)
+                self._set_meta("next_slot", 0)
+                self._set_meta("tick", 0)
+            else:
+                self.max_entries = int(stored)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _vectors(self, dim: int, create: bool = False):
+        if self._mm is not None and self._mm.shape[1] == dim:
+            return self._mm
+        fpath = self.path / "vectors.bin"
+        size = self.max_entries * dim * self.dtype.itemsize
+        if create and (not fpath.exists() or fpath.stat().st_size < size):
+            with open(fpath, "ab") as f:
+                f.truncate(size)
+        if not fpath.exists():
+            return None
+        self._mm = np.memmap(fpath, dtype=self.dtype, mode="r+", shape=(self.max_entries, dim))
+        return self._mm
+
+    def _lookup(self, keys: Sequence[bytes]) -> Dict[bytes, int]:
+        found = {}
+        uniq = list(dict.fromkeys(keys))
+        for i in range(0, len(uniq), _SQL_CHUNK):
+            chunk = uniq[i:i + _SQL_CHUNK]
+            q = f"SELECT hash, slot FROM entries WHERE hash IN ({','.join('?' * len(chunk))})"
+            found.update((bytes(h), s) for h, s in self._db.execute(q, chunk))
+        return found
+
+    def get_many(self, texts: Sequence[str]) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """Return (vectors, hit_mask); rows of misses are left as zeros."""
+        keys = [text_key(t) for t in texts]
+        hit = np.zeros(len(texts), dtype=bool)
+        out = None
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                dim = self._meta("dim")
+                slots = self._lookup(keys) if dim is not None else {}
+                if slots:
+                    mm = self._vectors(int(dim))
+                    if mm is not None:
+                        out = np.zeros((len(texts), int(dim)), dtype=np.float32)
+                        for i, k in enumerate(keys):
+                            s = slots.get(k)
+                            if s is not None:
+                                out[i] = mm[s]
+                                hit[i] = True
+            finally:
+                self._db.execute("COMMIT")
+            if hit.any():
+                self._touch([k for k, h in zip(keys, hit) if h])
+            n_hit = int(hit.sum())
+            self.hits += n_hit
+            self.misses += len(texts) - n_hit
+        return out, hit
+
+    def _touch(self, keys: List[bytes]):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            tick = int(self._meta("tick")) + 1
+            self._set_meta("tick", tick)
+            uniq = list(dict.fromkeys(keys))
+            for i in range(0, len(uniq), _SQL_CHUNK):
+                chunk = uniq[i:i + _SQL_CHUNK]
+                self._db.execute(f"UPDATE entries SET last_used=? WHERE hash IN "
+                                 f"({','.join('?' * len(chunk))})", [tick, *chunk])
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray):
+        """Store vectors, evicting least recently used entries when full."""
+        vectors = np.asarray(vectors)
+        if len(texts) == 0:
+            return
+        new = {}
+        for t, v in zip(texts, vectors):
+            new.setdefault(text_key(t), v)
+        if len(new) > self.max_entries:
+            new = dict(list(new.items())[-self.max_entries:])
+        dim = vectors.shape[1]
+        with self._lock:
+            self._db.execute("BEGIN EXCLUSIVE")
+            try:
+                stored_dim = self._meta("dim")
+                if stored_dim is None:
+                    self._set_meta("dim", dim)
+                elif int(stored_dim) != dim:
+                    raise ValueError(f"Embedding dim {dim} does not match cache dim {stored_dim}")
+                for k in self._lookup(list(new)):
+                    new.pop(k, None)
+                if new:
+                    tick = int(self._meta("tick")) + 1
+                    next_slot = int(self._meta("next_slot"))
+                    fresh = min(len(new), self.max_entries - next_slot)
+                    slots = list(range(next_slot, next_slot + fresh))
+                    if fresh < len(new):
+                        victims = self._db.execute(
+                            "SELECT hash, slot FROM entries ORDER BY last_used LIMIT ?",
+                            (len(new) - fresh,)).fetchall()
+                        self._db.executemany("DELETE FROM entries WHERE hash=?",
+                                             [(h,) for h, _ in victims])
+                        slots.extend(s for _, s in victims)
+                    mm = self._vectors(dim, create=True)
+                    for (k, v), s in zip(new.items(), slots):
+                        mm[s] = v
+                    mm.flush()
+                    self._db.executemany("INSERT INTO entries(hash, slot, last_used) VALUES (?, ?, ?)",
+                                         [(k, s, tick) for k, s in zip(new, slots)])
+                    self._set_meta("next_slot", next_slot + fresh)
+                    self._set_meta("tick", tick)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def close(self):
+        self._mm = None
+        if self._pid == os.getpid():
+            self._conn.close()
+
+
+_CACHES: Shared[EmbeddingCache] = Shared(lambda model_name, normalize: EmbeddingCache(
+    os.environ.get("FAIRNESS_EMBEDDING_CACHE_DIR", DEFAULT_CACHE_DIR), model_name, normalize=normalize,
+    dtype=os.environ.get("FAIRNESS_EMBEDDING_CACHE_DTYPE", "float32"),
+    max_entries=env_int("FAIRNESS_EMBEDDING_CACHE_MAX", DEFAULT_MAX_ENTRIES)))
+
+
+def cache_enabled() -> bool:
+    return env_flag("FAIRNESS_EMBEDDING_CACHE")
+
+
+def get_embedding_cache(model_name: str, normalize: bool = True) -> Optional[EmbeddingCache]:
+    """Process-wide cache for a model namespace (None when FAIRNESS_EMBEDDING_CACHE=0)."""
+    return _CACHES.get(model_name, normalize) if cache_enabled() else None
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counts of every cache opened in this process."""
+    return {f"{name}{'' if norm else ' (raw)'}": c.stats() for (name, norm), c in _CACHES.instances.items()}
+
+
+export_stats("embedding_cache", cache_stats)
@@ -0,0 +1,250 @@
+import re
+import numpy as np
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BATCH_SIZE = 256
+# Padded tokens (texts x longest text) per encode call; short texts get bigger batches.
+DEFAULT_TOKEN_BUDGET = 16384
+DEFAULT_MAX_TOKENS = 256
+CHUNK_MODES = ("sentence", "window")
+_SENTENCE_END = re.compile(r"(?<=[.!?;:。！？])\s+")
+
+
+def _token_lengths(model, texts: Sequence[str]) -> List[int]:
+    """Token count per text, falling back to whitespace words if the model has no tokenizer."""
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is not None:
+        try:
+            ids = tokenizer(list(texts), add_special_tokens=False, truncation=False)["input_ids"]
+            return [len(x) for x in ids]
+        except Exception:
+            pass
+    return [len(t.split()) for t in texts]
+
+
+def unique_texts(pairs: Iterable[Tuple[str, str]]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Deduplicate the texts of a pair list.
+
+    Returns the unique texts plus, for every pair, the row of text_a and text_b
+    in that list.
+    """
+    index: Dict[str, int] = {}
+    texts: List[str] = []
+    ia: List[int] = []
+    ib: List[int] = []
+    for text_a, text_b in pairs:
+        for t, out in ((text_a, ia), (text_b, ib)):
+            row = index.get(t)
+            if row is None:
+                row = index[t] = len(texts)
+                texts.append(t)
+            out.append(row)
+    return texts, np.asarray(ia, dtype=np.int64), np.asarray(ib, dtype=np.int64)
+
+
+def length_batches(lengths: Sequence[int], batch_size: int = DEFAULT_BATCH_SIZE,
+                   token_budget: int = DEFAULT_TOKEN_BUDGET) -> List[np.ndarray]:
+    """Row indices sorted by length and cut into batches of at most batch_size rows whose
+    padded size (rows x longest row) stays within token_budget, so encode cost follows
+    the total token count rather than batches x the longest text."""
+    order = np.argsort(lengths, kind="stable")
+    batches = []
+    start = 0
+    while start < len(order):
+        stop = start + 1
+        while (stop < len(order) and stop - start < batch_size
+               and (stop + 1 - start) * max(1, lengths[order[stop]]) <= token_budget):
+            stop += 1
+        batches.append(order[start:stop])
+        start = stop
+    return batches
+
+
+def encode_texts(model, texts: Sequence[str], batch_size: int = DEFAULT_BATCH_SIZE,
+                 normalize: bool = True, cache=None, token_budget: int = DEFAULT_TOKEN_BUDGET) -> np.ndarray:
+    """Encode texts in length-bucketed batches (see length_batches) and return rows in input order.
+
+    When an EmbeddingCache is given, only texts missing from it reach the model
+    and their vectors are written back.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    if cache is not None:
+        cached, hit = cache.get_many(texts)
+        if hit.all():
+            return cached
+        missing = [t for t, h in zip(texts, hit) if not h]
+        fresh = encode_texts(model, missing, batch_size=batch_size, normalize=normalize,
+                             token_budget=token_budget)
+        cache.put_many(missing, fresh)
+        if cached is None:
+            return fresh
+        cached[~hit] = fresh
+        return cached
+    emb = np.empty((len(texts), 0), dtype=np.float32)
+    for rows in length_batches(_token_lengths(model, texts), batch_size, token_budget):
+        chunk = model.encode([texts[i] for i in rows], batch_size=len(rows),
+                             normalize_embeddings=normalize, convert_to_numpy=True,
+                             show_progress_bar=False)
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if emb.shape[1] == 0:
+            emb = np.empty((len(texts), chunk.shape[1]), dtype=np.float32)
+        emb[rows] = chunk
+    return emb
+
+
+def pairwise_cosine(emb: np.ndarray, ia: np.ndarray, ib: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity between emb[ia] and emb[ib]."""
+    if len(ia) == 0:
+        return np.zeros(0, dtype=np.float32)
+    a = emb[ia]
+    b = emb[ib]
+    dots = np.einsum("ij,ij->i", a, b)
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    return dots / np.maximum(norms, 1e-12)
+
+
+def pair_similarities(model, pairs: Iterable[Tuple[str, str]],
+                      batch_size: int = DEFAULT_BATCH_SIZE, cache=None) -> np.ndarray:
+    """Cosine similarity for every (text_a, text_b) pair, encoding each unique text once."""
+    texts, ia, ib = unique_texts(pairs)
+    emb = encode_texts(model, texts, batch_size=batch_size, cache=cache)
+    return pairwise_cosine(emb, ia, ib)
+
+
+def model_max_tokens(model) -> int:
+    """Word pieces per input the model attends to, leaving room for [CLS]/[SEP]."""
+    limit = getattr(model, "max_seq_length", None) or getattr(model, "max_length", None) or DEFAULT_MAX_TOKENS
+    return max(8, int(limit) - 2)
+
+
+def _windows(text: str, max_tokens: int, count_tokens: Callable[[List[str]], List[int]]) -> List[Tuple[str, int]]:
+    """(window, token count) runs of consecutive words, each within max_tokens tokenizer tokens.
+
+    Words are packed by their own token counts; a window the tokenizer counts
+    longer once joined is halved again. A single word longer than max_tokens
+    stays whole (the model truncates it).
+    """
+    words = text.split()
+    groups: List[List[str]] = []
+    size = 0
+    for word, n in zip(words, count_tokens(words)):
+        if groups and size + n <= max_tokens:
+            groups[-1].append(word)
+            size += n
+        else:
+            groups.append([word])
+            size = n
+    out: List[Tuple[str, int]] = []
+    pieces = [" ".join(g) for g in groups]
+    for group, piece, n in zip(groups, pieces, count_tokens(pieces)):
+        if n > max_tokens and len(group) > 1:
+            half = len(group) // 2
+            out += _windows(" ".join(group[:half]), max_tokens, count_tokens)
+            out += _windows(" ".join(group[half:]), max_tokens, count_tokens)
+        else:
+            out.append((piece, n))
+    return out
+
+
+def split_chunks(text: str, max_tokens: int, count_tokens: Callable[[List[str]], List[int]],
+                 mode: str = "sentence", total: Optional[int] = None) -> List[Tuple[str, int]]:
+    """(chunk, token count) pieces of a text that each fit in max_tokens.
+
+    A text that already fits is returned unchanged as its only chunk. In
+    sentence mode consecutive sentences are packed greedily and a sentence
+    that is too long on its own falls back to word windows; window mode cuts
+    word windows directly.
+    """
+    if mode not in CHUNK_MODES:
+        raise ValueError(f"Unknown chunk mode {mode!r}; choose from {list(CHUNK_MODES)}")
+    if total is None:
+        (total,) = count_tokens([text])
+    if total <= max_tokens:
+        return [(text, total)]
+    if mode == "window":
+        return _windows(text, max_tokens, count_tokens)
+    sentences = [s for s in _SENTENCE_END.split(text.strip()) if s]
+    chunks: List[Tuple[str, int]] = []
+    current, current_len = [], 0
+    for sentence, n in zip(sentences, count_tokens(sentences)):
+        if current and current_len + n > max_tokens:
+            chunks.append((" ".join(current), current_len))
+            current, current_len = [], 0
+        if n > max_tokens:
+            chunks.extend(_windows(sentence, max_tokens, count_tokens))
+            continue
+        current.append(sentence)
+        current_len += n
+    if current:
+        chunks.append((" ".join(current), current_len))
+    return chunks
+
+
+def encode_chunks(model, texts: Sequence[str], max_tokens: Optional[int] = None, mode: str = "sentence",
+                  batch_size: int = DEFAULT_BATCH_SIZE, cache=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Split every text into chunks and encode each distinct chunk once.
+
+    Returns (unit-norm chunk embeddings, owning text row per chunk, token count
+    per chunk); chunks of one text are contiguous and in text order.
+    """
+    max_tokens = max_tokens or model_max_tokens(model)
+    count = lambda xs: _token_lengths(model, xs)
+    index: Dict[str, int] = {}
+    unique: List[str] = []
+    rows: List[int] = []
+    owner: List[int] = []
+    weights: List[int] = []
+    for t, (text, total) in enumerate(zip(texts, count(texts))):
+        for chunk, n in split_chunks(text, max_tokens, count, mode, total):
+            row = index.get(chunk)
+            if row is None:
+                row = index[chunk] = len(unique)
+                unique.append(chunk)
+            rows.append(row)
+            owner.append(t)
+            weights.append(max(1, n))
+    emb = encode_texts(model, unique, batch_size=batch_size, cache=cache)
+    if len(emb):
+        emb = emb / np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+    return emb[np.asarray(rows, dtype=np.int64)], np.asarray(owner, dtype=np.int64), \
+        np.asarray(weights, dtype=np.float32)
+
+
+def pooled_embeddings(model, texts: Sequence[str], max_tokens: Optional[int] = None, mode: str = "sentence",
+                      batch_size: int = DEFAULT_BATCH_SIZE, cache=None) -> np.ndarray:
+    """One unit vector per text: the token-weighted mean of its chunk embeddings."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    emb, owner, weights = encode_chunks(model, texts, max_tokens, mode, batch_size, cache)
+    pooled = np.zeros((len(texts), emb.shape[1]), dtype=np.float32)
+    np.add.at(pooled, owner, emb * weights[:, None])
+    return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+
+def long_pair_similarities(model, pairs: Iterable[Tuple[str, str]], pooling: str = "mean",
+                           max_tokens: Optional[int] = None, mode: str = "sentence",
+                           batch_size: int = DEFAULT_BATCH_SIZE, cache=None) -> np.ndarray:
+    """pair_similarities() over whole answers rather than their truncated openings.
+
+    pooling="mean" compares the token-weighted mean chunk embeddings;
+    pooling="maxsim" aligns every chunk with its most similar chunk on the other
+    side and averages both directions (weighted by chunk length). Texts that
+    fit the model in one piece score exactly as in pair_similarities().
+    """
+    texts, ia, ib = unique_texts(pairs)
+    if pooling == "mean":
+        return pairwise_cosine(pooled_embeddings(model, texts, max_tokens, mode, batch_size, cache), ia, ib)
+    if pooling != "maxsim":
+        raise ValueError(f"Unknown pooling {pooling!r}; choose from ['mean', 'maxsim']")
+    if not texts:
+        return np.zeros(0, dtype=np.float32)
+    emb, owner, weights = encode_chunks(model, texts, max_tokens, mode, batch_size, cache)
+    bounds = np.searchsorted(owner, np.arange(len(texts) + 1))
+    out = np.empty(len(ia), dtype=np.float32)
+    for k, (a, b) in enumerate(zip(ia, ib)):
+        sa, sb = slice(bounds[a], bounds[a + 1]), slice(bounds[b], bounds[b + 1])
+        sim = emb[sa] @ emb[sb].T
+        wa, wb = weights[sa], weights[sb]
+        out[k] = 0.5 * (sim.max(axis=1) @ wa / wa.sum() + sim.max(axis=0) @ wb / wb.sum())
+    return out
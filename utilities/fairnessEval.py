@@ -0,0 +1,505 @@
+"""fairness-eval: run every fairness metric over a whole pair set in one pass.
+
+    python -m utilities.fairnessEval --pairs data/counterfactual_pairs.json
+
+Writes one result table (CSV) plus a pass/fail summary (JSON) to reports/ and
+exits non-zero when any gate fails.
+"""
+import argparse
+import contextlib
+import csv
+import datetime
+import itertools
+import json
+import math
+import os
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from utilities import instrumentation
+from utilities import metricsUtils as mu
+from utilities import modelRegistry
+from utilities import parallelRunner  # module import: parallelRunner imports this module
+from utilities import resultCache
+from utilities.lexiconUtil import SENSITIVE_LEXICON, compile_lexicon
+from utilities.modelRegistry import model_id
+from utilities.pairLoader import load_pairs
+from utilities.ragRecorder import configure_client
+from utilities.rag_clientSample import HTTPRAGClient, MockRAGClient, PrefetchedRAGClient
+from utilities import retrievalBatch as rb
+from utilities.retrievalBatch import Interner, RAGResponseBatch, SourceTypes
+from utilities.sentimentCache import cache_stats as sentiment_cache_stats
+
+BASE = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE / "data"
+REPORTS_DIR = BASE / "reports"
+DEFAULT_ACTIVE_YEAR = 2025
+
+
+@dataclass
+class EvalBatch:
+    pairs: List[dict]
+    responses_a: list
+    responses_b: list
+    authority_weights: Dict[str, float]
+    active_year: int
+    sensitive_terms: object = SENSITIVE_LEXICON
+    _columns: Optional[tuple] = field(default=None, repr=False)
+
+    def columns(self):
+        """(RAGResponseBatch A, RAGResponseBatch B, SourceTypes), built once per batch."""
+        if self._columns is None:
+            doc_ids, sources = Interner(), SourceTypes(self.authority_weights)
+            self._columns = (RAGResponseBatch.from_responses(self.responses_a, doc_ids, sources),
+                             RAGResponseBatch.from_responses(self.responses_b, doc_ids, sources), sources)
+        return self._columns
+
+    def retrieval(self):
+        """(RetrievalBatch A, RetrievalBatch B, SourceTypes): views of columns(), not copies."""
+        a, b, sources = self.columns()
+        return a.retrieved, b.retrieved, sources
+
+    def subset(self, index: Sequence[int]) -> "EvalBatch":
+        return EvalBatch([self.pairs[i] for i in index], [self.responses_a[i] for i in index],
+                         [self.responses_b[i] for i in index], self.authority_weights, self.active_year,
+                         self.sensitive_terms)
+
+    def texts(self):
+        return [(ra.text, rb.text) for ra, rb in zip(self.responses_a, self.responses_b)]
+
+    def lang_mask(self) -> np.ndarray:
+        return np.array([bool(p.get("is_lang_pair", False)) for p in self.pairs], dtype=bool)
+
+
+# Metric cost tiers: arithmetic over citations/retrieved lists (microseconds per
+# pair), lexicon and VADER text scans, neural models (SPS, LES, toxicity).
+TIER_RETRIEVAL, TIER_TEXT, TIER_MODEL = 0, 1, 2
+
+# full: every metric on every pair. fail-fast: stop after the first tier with a
+# failing (or erroring) gate. triage: model-tier metrics only on pairs that
+# pass every cheaper gate or are flagged "inspect": true.
+MODES = ("full", "fail-fast", "triage")
+
+
+@dataclass
+class MetricSpec:
+    """One gate: compute() fills `columns` of the table, gate() marks the rows that pass.
+
+    `tier` ranks the cost per pair (TIER_RETRIEVAL < TIER_TEXT < TIER_MODEL);
+    evaluate() runs cheaper tiers first. `version` and `context` (the run-level
+    inputs besides the pair itself that the values depend on) key the result
+    cache; bump `version` whenever compute() changes what it returns for the
+    same input.
+    """
+    name: str
+    columns: tuple
+    compute: Callable[[EvalBatch], Dict[str, np.ndarray]]
+    gate: Callable[[Dict[str, np.ndarray], dict], np.ndarray]
+    model: Optional[str] = None
+    tier: int = 0
+    version: int = 1
+    context: Optional[Callable[[EvalBatch], object]] = None
+
+    def fingerprint(self, batch: EvalBatch) -> bytes:
+        return resultCache.metric_fingerprint(self.name, self.version, self.model and model_id(self.model),
+                                              self.context(batch) if self.context else None)
+
+
+def _sps(batch):
+    return {"SPS": mu.semantic_parity_scores(batch.texts())}
+
+
+def _les(batch):
+    mask = batch.lang_mask()
+    les = np.full(len(mask), np.nan)
+    if mask.any():
+        texts = batch.texts()
+        les[mask] = mu.language_equivalence_scores([t for t, m in zip(texts, mask) if m])
+    return {"LES": les}
+
+
+def _spg(batch):
+    return {"SPG": mu.sentiment_polarity_gaps(batch.texts())}
+
+
+def _blf(batch):
+    return {"BLF": mu.bias_lexicon_frequency_gaps(batch.texts(), batch.sensitive_terms)}
+
+
+def _tox(batch):
+    return {"ToxicityGap": mu.toxicity_gaps(batch.texts())}
+
+
+def _rfi(batch):
+    a, b, _ = batch.retrieval()
+    return {"RFI": rb.retrieval_fairness_indices(a, b, k=5)}
+
+
+def _rbo(batch):
+    a, b, _ = batch.retrieval()
+    return {"RBO": rb.rank_biased_overlaps(a, b)}
+
+
+def _citations(batch):
+    a, b, _ = batch.columns()
+    return {"Citations_A": a.citation_counts, "Citations_B": b.citation_counts}
+
+
+def _dri(batch):
+    a, b, _ = batch.retrieval()
+    return {"DRI_A": rb.doc_recency_indices(a, batch.active_year),
+            "DRI_B": rb.doc_recency_indices(b, batch.active_year)}
+
+
+def _authority(batch):
+    a, b, sources = batch.retrieval()
+    return {"Authority_A": rb.authority_scores(a, sources),
+            "Authority_B": rb.authority_scores(b, sources)}
+
+
+def _both_at_least(col_a, col_b, key, cast=float):
+    return lambda c, th: (c[col_a] >= cast(th[key])) & (c[col_b] >= cast(th[key]))
+
+
+# Keyed by the thresholds.json entry each metric is gated on, in scorecard column order.
+METRICS: Dict[str, MetricSpec] = {m.name: m for m in [
+    MetricSpec("SPS", ("SPS",), _sps, lambda c, th: c["SPS"] >= th["SPS"], model="embedder", tier=TIER_MODEL,
+               context=lambda b: mu.long_text_settings()),
+    MetricSpec("SPG", ("SPG",), _spg, lambda c, th: c["SPG"] <= th["SPG"], model="vader", tier=TIER_TEXT),
+    MetricSpec("BLF", ("BLF",), _blf, lambda c, th: c["BLF"] <= th["BLF"], tier=TIER_TEXT,
+               context=lambda b: compile_lexicon(b.sensitive_terms).terms),
+    MetricSpec("LES", ("LES",), _les, lambda c, th: np.isnan(c["LES"]) | (c["LES"] >= th["LES"]),
+               model="embedder", tier=TIER_MODEL, context=lambda b: mu.long_text_settings()),
+    MetricSpec("RFI", ("RFI",), _rfi, lambda c, th: c["RFI"] >= th["RFI"]),
+    MetricSpec("RBO", ("RBO",), _rbo, lambda c, th: c["RBO"] >= th["RBO"]),
+    MetricSpec("CitationMin", ("Citations_A", "Citations_B"), _citations,
+               _both_at_least("Citations_A", "Citations_B", "CitationMin", cast=int)),
+    MetricSpec("DocRecency", ("DRI_A", "DRI_B"), _dri, _both_at_least("DRI_A", "DRI_B", "DocRecency"),
+               context=lambda b: b.active_year),
+    MetricSpec("Authority", ("Authority_A", "Authority_B"), _authority,
+               _both_at_least("Authority_A", "Authority_B", "Authority"), context=lambda b: b.authority_weights),
+    MetricSpec("ToxicityGap", ("ToxicityGap",), _tox, lambda c, th: c["ToxicityGap"] <= th["ToxicityGap"],
+               model="detoxify", tier=TIER_MODEL),
+]}
+
+
+class MetricError(RuntimeError):
+    pass
+
+
+@dataclass
+class EvalResult:
+    columns: Dict[str, Sequence] = field(default_factory=dict)
+    passed: Dict[str, np.ndarray] = field(default_factory=dict)
+    errors: Dict[str, BaseException] = field(default_factory=dict)
+    # Rows a metric was not computed for (fail-fast / triage); they count as passed.
+    skipped: Dict[str, np.ndarray] = field(default_factory=dict)
+    # Row key column: pair ids here, group ids for utilities.groupMetrics.
+    id_column: str = "pair_id"
+    # Per model: metrics, seconds, peak_rss_mb, evicted (see modelRegistry.phase).
+    phases: Dict[str, dict] = field(default_factory=dict)
+    # Cache hits/misses counted in forked workers (parallelRunner), per cache key.
+    caches: Dict[tuple, Dict[str, int]] = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.columns.get(self.id_column, ()))
+
+    def _raise_if_failed(self, metric: str):
+        exc = self.errors.get(metric)
+        if exc is not None:
+            raise MetricError(f"{metric} could not be computed: {exc!r}") from exc
+
+    def column(self, name: str):
+        for metric, spec in METRICS.items():
+            if name in spec.columns:
+                self._raise_if_failed(metric)
+        return self.columns[name]
+
+    def gate(self, metric: str) -> np.ndarray:
+        self._raise_if_failed(metric)
+        return self.passed[metric]
+
+    def was_skipped(self, metric: str, row: int) -> bool:
+        mask = self.skipped.get(metric)
+        return mask is not None and bool(mask[row])
+
+    def rows(self) -> Iterable[dict]:
+        names = list(self.columns)
+        for i in range(len(self)):
+            yield {k: _plain(self.columns[k][i]) for k in names}
+
+    def summary(self) -> dict:
+        ids = self.columns.get(self.id_column, [])
+        gates = {}
+        for metric, ok in self.passed.items():
+            failed = [ids[i] for i in np.flatnonzero(~ok)]
+            gates[metric] = {"passed": not failed, "failed": len(failed), "failed_ids": failed}
+            skipped = int(self.skipped[metric].sum()) if metric in self.skipped else 0
+            if skipped:
+                gates[metric]["skipped"] = skipped
+                if skipped == len(ok):
+                    gates[metric]["passed"] = None
+        for metric, exc in self.errors.items():
+            gates[metric] = {"passed": False, "error": repr(exc)}
+        out = {"pairs": len(self), "passed": all(g["passed"] is not False for g in gates.values()),
+               "gates": gates}
+        if self.phases:
+            out["phases"] = {m: dict(st, seconds=round(st["seconds"], 3)) for m, st in self.phases.items()}
+        return out
+
+    def write(self, csv_path, summary_path=None):
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=list(self.columns))
+            w.writeheader()
+            w.writerows({k: "" if v is None else v for k, v in row.items()} for row in self.rows())
+        if summary_path is not None:
+            with open(summary_path, "w", encoding="utf-8") as f:
+                json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+
+
+def _plain(v):
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    if isinstance(v, float):
+        return round(v, 4)
+    return v
+
+
+def _compute_cached(spec: MetricSpec, batch: EvalBatch, fingerprints: List[bytes],
+                    cache: "resultCache.ResultCache") -> Dict[str, np.ndarray]:
+    """spec.compute() over only the pairs whose results are not cached yet."""
+    metric_fp = spec.fingerprint(batch)
+    keys = [resultCache.result_key(fp, metric_fp) for fp in fingerprints]
+    cached = cache.get_many(keys)
+    missing = [i for i, k in enumerate(keys) if k not in cached]
+    rows = [cached.get(k) for k in keys]
+    if missing:
+        fresh = spec.compute(batch.subset(missing) if len(missing) < len(keys) else batch)
+        fresh_rows = [[_plain_value(fresh[c][j]) for c in spec.columns] for j in range(len(missing))]
+        cache.put_many(spec.name, [(keys[i], row) for i, row in zip(missing, fresh_rows)])
+        for i, row in zip(missing, fresh_rows):
+            rows[i] = row
+    return {c: np.asarray([row[j] for row in rows]) for j, c in enumerate(spec.columns)}
+
+
+def _plain_value(v):
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def _triage_rows(result: EvalResult, batch: EvalBatch) -> np.ndarray:
+    """Pairs that pass every gate computed so far, or are flagged for inspection."""
+    keep = np.array([bool(p.get("inspect", False)) for p in batch.pairs], dtype=bool)
+    ok = np.full(len(keep), not result.errors, dtype=bool)
+    for passed in result.passed.values():
+        ok &= passed
+    return np.flatnonzero(keep | ok)
+
+
+def _decided(result: EvalResult) -> bool:
+    return bool(result.errors) or any(not ok.all() for ok in result.passed.values())
+
+
+def model_phases(specs: Dict[str, MetricSpec], selected: Iterable[str]) -> List[tuple]:
+    """(model, metric names) in run order: cheapest tier first and, within a tier, the
+    metrics sharing a model back to back (models in order of their first metric), so a
+    RAM budget (see modelRegistry) never has to reload a model within one tier."""
+    first = {}
+    for name, spec in specs.items():
+        first.setdefault(spec.model, len(first))
+    key = lambda m: (specs[m].tier, first[specs[m].model])
+    ordered = sorted((m for m in specs if m in selected), key=key)
+    return [(specs[names[0]].model, names)
+            for names in (list(g) for _, g in itertools.groupby(ordered, key=key))]
+
+
+@contextlib.contextmanager
+def model_phase(model: str, names: List[str], result: EvalResult):
+    """modelRegistry.phase() around the metrics of one model, recorded in result.phases.
+
+    A no-op for metrics without a model (model "" or None).
+    """
+    if not model:
+        yield
+        return
+    with modelRegistry.phase(model) as stats:
+        stats["metrics"] = names
+        yield
+    modelRegistry.merge_phase(result.phases, model, stats)
+
+
+def _run_phase(names, result, batch, thresholds, fingerprints, result_cache, mode, tier, rows):
+    """Compute one phase's metrics into result; returns the (tier, rows) skip state for the next."""
+    n = len(batch.pairs)
+    for name in names:
+        spec = METRICS[name]
+        # Skipping is decided per tier, so a failing tier still reports all of its gates.
+        if spec.tier != tier and (rows is None or len(rows)):
+            tier = spec.tier
+            if mode == "fail-fast" and _decided(result):
+                rows = np.empty(0, dtype=int)
+            elif mode == "triage" and tier >= TIER_MODEL:
+                rows = _triage_rows(result, batch)
+                rows = None if len(rows) == n else rows
+        try:
+            if rows is not None and not len(rows):
+                cols = {c: np.empty(0) for c in spec.columns}
+            else:
+                sub = batch if rows is None else batch.subset(rows)
+                with instrumentation.timer("fairness_eval_seconds", metric=name):
+                    if fingerprints is None:
+                        cols = spec.compute(sub)
+                    else:
+                        cols = _compute_cached(spec, sub, fingerprints if rows is None else
+                                               [fingerprints[i] for i in rows], result_cache)
+        except Exception as exc:
+            result.errors[name] = exc
+            result.columns.update((c, np.full(n, np.nan)) for c in spec.columns)
+            continue
+        if rows is not None:
+            skipped = np.ones(n, dtype=bool)
+            skipped[rows] = False
+            result.skipped[name] = skipped
+            full = {c: np.full(n, np.nan) for c in spec.columns}
+            for c in spec.columns:
+                full[c][rows] = cols[c]
+            cols = full
+        result.columns.update(cols)
+        passed = np.asarray(spec.gate(cols, thresholds), dtype=bool)
+        result.passed[name] = passed | result.skipped[name] if name in result.skipped else passed
+    return tier, rows
+
+
+def evaluate(pairs: List[dict], responses_a: list, responses_b: list, thresholds: dict,
+             authority_weights: Dict[str, float], active_year: Optional[int] = None,
+             metrics: Optional[Iterable[str]] = None, sensitive_terms=SENSITIVE_LEXICON,
+             result_cache: Optional["resultCache.ResultCache"] = None, mode: str = "full") -> EvalResult:
+    """Compute the selected (default: all) metrics for every pair as whole-column batches.
+
+    Metrics run cheapest tier first; `mode` (see MODES) decides whether later
+    tiers are skipped. Skipped values are NaN and recorded in
+    EvalResult.skipped. A metric that raises is recorded in EvalResult.errors
+    instead of aborting the others. With a `result_cache`, only pairs whose
+    content (or a metric's version, model or context) changed since a previous
+    run are computed; gates are always re-applied with the current thresholds.
+    Metrics of one model run as a single phase, timed in EvalResult.phases.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}; choose from {list(MODES)}")
+    active_year = int(active_year or thresholds.get("ACTIVE_YEAR", DEFAULT_ACTIVE_YEAR))
+    batch = EvalBatch(pairs, responses_a, responses_b, authority_weights, active_year, sensitive_terms)
+    n = len(pairs)
+    result = EvalResult()
+    result.columns["pair_id"] = [p["id"] for p in pairs]
+    result.columns["query_a"] = [p["query_a"] for p in pairs]
+    result.columns["query_b"] = [p["query_b"] for p in pairs]
+    result.columns["is_lang_pair"] = list(batch.lang_mask())
+    selected = list(METRICS) if metrics is None else list(metrics)
+    unknown = [m for m in selected if m not in METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics {unknown}; choose from {list(METRICS)}")
+    fingerprints = None
+    if result_cache is not None and pairs:
+        fingerprints = [resultCache.pair_fingerprint(p, a, b) for p, a, b in zip(pairs, responses_a, responses_b)]
+    tier, rows = None, None
+    for model, names in model_phases(METRICS, selected):
+        with model_phase(model, names, result):
+            tier, rows = _run_phase(names, result, batch, thresholds, fingerprints, result_cache,
+                                    mode, tier, rows)
+    # Back to scorecard column order, whatever order the tiers ran in.
+    order = [c for m in METRICS for c in METRICS[m].columns if c in result.columns]
+    result.columns = {**{k: v for k, v in result.columns.items() if k not in order},
+                      **{c: result.columns[c] for c in order}}
+    result.passed = {m: result.passed[m] for m in METRICS if m in result.passed}
+    return result
+
+
+def fetch_responses(pairs: List[dict], client, concurrency: int = 16):
+    """Query both sides of every pair, concurrently and once per unique query."""
+    prefetched = PrefetchedRAGClient(client, [q for p in pairs for q in (p["query_a"], p["query_b"])],
+                                     concurrency=concurrency)
+    return ([prefetched.query(p["query_a"]) for p in pairs],
+            [prefetched.query(p["query_b"]) for p in pairs])
+
+
+def _load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="fairness-eval", description=__doc__.splitlines()[0])
+    ap.add_argument("--pairs", default=str(DATA_DIR / "counterfactual_pairs.json"))
+    ap.add_argument("--shard", default=None, metavar="i/N")
+    ap.add_argument("--thresholds", default=str(DATA_DIR / "thresholds.json"))
+    ap.add_argument("--authority-weights", default=str(DATA_DIR / "authority_weights.json"))
+    ap.add_argument("--metrics", default=None, help="comma-separated subset of " + ",".join(METRICS))
+    ap.add_argument("--rag-url", default=os.environ.get("FAIRNESS_RAG_URL"),
+                    help="RAG service base URL (default: MockRAGClient)")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--record", default=os.environ.get("FAIRNESS_RAG_RECORD"), metavar="DIR",
+                    help="append every RAG answer to this ragRecorder store")
+    ap.add_argument("--replay", default=os.environ.get("FAIRNESS_RAG_REPLAY"), metavar="DIR",
+                    help="answer from this ragRecorder store instead of the RAG service")
+    ap.add_argument("--workers", type=int, default=int(os.environ.get("FAIRNESS_WORKERS", 1)),
+                    help="worker processes sharing the parent's loaded models (fork only)")
+    ap.add_argument("--mode", choices=MODES, default=os.environ.get("FAIRNESS_GATE_MODE", "full"),
+                    help="fail-fast: stop after the first failing cost tier; "
+                         "triage: model metrics only on pairs passing the cheap gates")
+    ap.add_argument("--no-result-cache", action="store_true",
+                    help="recompute every pair instead of reusing unchanged results (FAIRNESS_RESULT_CACHE=0)")
+    ap.add_argument("--instrument", action="store_true", help="write fairness_metrics_<ts>.prom next to the result")
+    ap.add_argument("--trace", action="store_true", help="also write Chrome-trace spans (fairness_trace_<ts>.json)")
+    ap.add_argument("--out", default=None, help="result CSV path (default: reports/fairness_eval_<ts>.csv)")
+    args = ap.parse_args(argv)
+
+    if args.instrument or args.trace:
+        instrumentation.enable(trace=args.trace)
+    thresholds = _load_json(args.thresholds)
+    pairs = load_pairs(args.pairs, shard=args.shard)
+    client = HTTPRAGClient(args.rag_url, concurrency=args.concurrency) if args.rag_url else MockRAGClient()
+    client = configure_client(client, record=args.record or "", replay=args.replay or "")
+    responses_a, responses_b = fetch_responses(pairs, client, concurrency=args.concurrency)
+    metrics = args.metrics.split(",") if args.metrics else None
+    result = parallelRunner.evaluate_parallel(
+        pairs, responses_a, responses_b, thresholds, _load_json(args.authority_weights), workers=args.workers,
+        metrics=metrics, mode=args.mode,
+        result_cache=None if args.no_result_cache else resultCache.get_result_cache())
+
+    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_path = Path(args.out) if args.out else REPORTS_DIR / f"fairness_eval_{ts}.csv"
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    summary_path = csv_path.with_name(csv_path.stem + "_summary.json")
+    result.write(csv_path, summary_path)
+    summary = result.summary()
+    for metric, g in summary["gates"].items():
+        status = "SKIP" if g["passed"] is None else "PASS" if g["passed"] else "FAIL"
+        detail = g.get("error") or ", ".join(g["failed_ids"])
+        if g.get("skipped") and g["passed"] is not None:
+            detail = f"{detail} ({g['skipped']} pairs skipped)" if detail else f"{g['skipped']} pairs skipped"
+        print(f"[{status}] {metric}" + (f": {detail}" if detail else ""))
+    st = sentiment_cache_stats()
+    if st["hits"] + st["misses"]:
+        print(f"[fairness-eval] sentiment cache: hits={st['hits']} misses={st['misses']} "
+              f"hit_rate={st['hits'] / (st['hits'] + st['misses']):.1%}")
+    st = resultCache.cache_stats()
+    if st["hits"] + st["misses"]:
+        print(f"[fairness-eval] result cache: reused={st['hits']} computed={st['misses']}")
+    for model, st in summary.get("phases", {}).items():
+        evicted = f" evicted={','.join(st['evicted'])}" if st.get("evicted") else ""
+        print(f"[fairness-eval] phase {model} ({','.join(st['metrics'])}): {st['seconds']:.2f}s "
+              f"peak_rss={st['peak_rss_mb']}MB{evicted}")
+    print(f"[fairness-eval] {summary['pairs']} pairs -> {csv_path}")
+    if instrumentation.enabled():
+        for path in instrumentation.write_reports(csv_path.parent, ts):
+            print(f"[fairness-eval] instrumentation -> {path}")
+    return 0 if summary["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
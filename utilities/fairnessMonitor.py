@@ -0,0 +1,330 @@
+"""Continuous fairness monitoring over a JSONL log of counterfactual request pairs.
+
+    python -m utilities.fairnessMonitor logs/fairness_pairs.jsonl --window 300 --metrics SPG,BLF,RFI
+
+Each log line is one observed pair:
+
+    {"ts": 1730000000.5, "pair_id": "gender_pronoun", "axis": "gender",
+     "query_a": "...", "query_b": "...",
+     "response_a": {"text": "...", "citations": [...], "retrieved": [...]}, "response_b": {...}}
+
+Missing responses are fetched from the RAG client. Lines are scored in
+micro-batches into per-pair and per-axis sliding windows; a window whose mean
+fails a gate prints a JSON "breach" event (and later "recovered").
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utilities.fairnessEval import DATA_DIR, METRICS, evaluate
+from utilities.rag_clientSample import MockRAGClient, RAGResponse, as_async_client
+
+DEFAULT_WINDOW = 300.0
+DEFAULT_BUCKETS = 12
+DEFAULT_MAX_KEYS = 10_000
+
+
+class LogTailer:
+    """Incremental reader of complete lines appended to a file."""
+
+    def __init__(self, path, from_start: bool = False):
+        self.path = Path(path)
+        self._file = None
+        self._inode = None
+        self._partial = b""
+        self._from_start = from_start
+
+    def _open(self, at_end: bool):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, "rb")
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial = b""
+        if at_end:
+            self._file.seek(0, os.SEEK_END)
+
+    def poll(self) -> List[str]:
+        """Lines completed since the last poll ([] while the file does not exist)."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        if self._file is None:
+            self._open(at_end=not self._from_start)
+        elif st.st_ino != self._inode or st.st_size < self._file.tell():
+            self._open(at_end=False)  # rotated or truncated: the new file is all unread
+        data = self._partial + self._file.read()
+        lines = data.split(b"\n")
+        self._partial = lines.pop()
+        return [l.decode("utf-8", errors="replace") for l in lines if l.strip()]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SlidingWindow:
+    """Per-column sums and counts over the last n_buckets time buckets (ring buffer)."""
+    __slots__ = ("width", "bucket_ids", "sums", "counts", "fails", "rows")
+
+    def __init__(self, n_columns: int, n_metrics: int, window: float, n_buckets: int):
+        self.width = window / n_buckets
+        self.bucket_ids = np.full(n_buckets, -1, dtype=np.int64)
+        self.sums = np.zeros((n_buckets, n_columns), dtype=np.float64)
+        self.counts = np.zeros((n_buckets, n_columns), dtype=np.int32)
+        self.fails = np.zeros((n_buckets, n_metrics), dtype=np.int32)
+        self.rows = np.zeros(n_buckets, dtype=np.int32)
+
+    def _slot(self, ts: float) -> int:
+        bucket = int(ts // self.width)
+        slot = bucket % len(self.bucket_ids)
+        if self.bucket_ids[slot] != bucket:
+            self.bucket_ids[slot] = bucket
+            self.sums[slot] = 0
+            self.counts[slot] = 0
+            self.fails[slot] = 0
+            self.rows[slot] = 0
+        return slot
+
+    def add(self, ts: float, values: np.ndarray, failed: np.ndarray):
+        slot = self._slot(ts)
+        ok = ~np.isnan(values)
+        self.sums[slot, ok] += values[ok]
+        self.counts[slot, ok] += 1
+        self.fails[slot] += failed
+        self.rows[slot] += 1
+
+    def live(self, now: float) -> np.ndarray:
+        current = int(now // self.width)
+        return (self.bucket_ids > current - len(self.bucket_ids)) & (self.bucket_ids <= current)
+
+    def means(self, now: float) -> Tuple[np.ndarray, np.ndarray, int]:
+        """(column means, fail rate per metric, rows) over the live buckets."""
+        live = self.live(now)
+        n = int(self.rows[live].sum())
+        counts = self.counts[live].sum(0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, self.sums[live].sum(0) / np.maximum(counts, 1), np.nan)
+        return means, self.fails[live].sum(0) / max(n, 1), n
+
+
+@dataclass
+class Breach:
+    event: str
+    key: str
+    metric: str
+    window_mean: Dict[str, float]
+    fail_rate: float
+    rows: int
+    threshold: object
+    ts: float
+
+    def to_json(self) -> str:
+        return json.dumps(self.__dict__, ensure_ascii=False)
+
+
+def _axis(pair_id: str) -> str:
+    return pair_id.split("_", 1)[0]
+
+
+def _response(obj) -> Optional[RAGResponse]:
+    if not isinstance(obj, dict) or "text" not in obj:
+        return None
+    return RAGResponse(text=obj["text"], citations=list(obj.get("citations") or []),
+                       retrieved=list(obj.get("retrieved") or []))
+
+
+class FairnessMonitor:
+    def __init__(self, thresholds: dict, authority_weights: Dict[str, float], metrics: Optional[Sequence[str]] = None,
+                 window: float = DEFAULT_WINDOW, n_buckets: int = DEFAULT_BUCKETS,
+                 max_keys: int = DEFAULT_MAX_KEYS, client=None, emit: Callable[[Breach], None] = None):
+        self.thresholds = thresholds
+        self.authority_weights = authority_weights
+        self.metrics = list(METRICS) if metrics is None else list(metrics)
+        unknown = [m for m in self.metrics if m not in METRICS]
+        if unknown:
+            raise ValueError(f"Unknown metrics {unknown}; choose from {list(METRICS)}")
+        self.columns = [c for m in self.metrics for c in METRICS[m].columns]
+        self.window, self.n_buckets, self.max_keys = float(window), int(n_buckets), int(max_keys)
+        self.client = client or MockRAGClient()
+        self.emit = emit or (lambda b: print(b.to_json(), flush=True))
+        self.windows: "OrderedDict[str, SlidingWindow]" = OrderedDict()
+        self.breached = set()
+        self.now = 0.0
+        self.skipped = 0
+        self.errors: Dict[str, str] = {}
+
+    def _parse(self, line: str) -> Optional[Tuple[float, dict, Optional[RAGResponse], Optional[RAGResponse]]]:
+        try:
+            rec = json.loads(line)
+            pair = {"id": str(rec.get("pair_id") or rec["id"]), "query_a": rec["query_a"], "query_b": rec["query_b"],
+                    "is_lang_pair": bool(rec.get("is_lang_pair", False)),
+                    "axis": str(rec.get("axis") or _axis(str(rec.get("pair_id") or rec["id"])))}
+            ts = float(rec.get("ts") or time.time())
+        except (ValueError, KeyError, TypeError):
+            self.skipped += 1
+            return None
+        return ts, pair, _response(rec.get("response_a")), _response(rec.get("response_b"))
+
+    def _fetch(self, queries: List[str]) -> Dict[str, object]:
+        """{query: RAGResponse or the exception it raised}, fetched concurrently."""
+        client = as_async_client(self.client)
+
+        async def fetch():
+            try:
+                return await client.aquery_many(queries, return_exceptions=True)
+            finally:
+                if hasattr(client, "aclose"):
+                    await client.aclose()
+
+        return dict(zip(queries, asyncio.run(fetch())))
+
+    def _complete(self, parsed: list) -> list:
+        """Fill in responses missing from the log; lines whose fetch failed are dropped."""
+        missing = list(dict.fromkeys(q for _, pair, ra, rb in parsed for q, r in
+                                     ((pair["query_a"], ra), (pair["query_b"], rb)) if r is None))
+        if not missing:
+            return parsed
+        fetched = self._fetch(missing)
+        complete = []
+        for ts, pair, ra, rb in parsed:
+            ra = ra or fetched[pair["query_a"]]
+            rb = rb or fetched[pair["query_b"]]
+            failed = next((r for r in (ra, rb) if isinstance(r, BaseException)), None)
+            if failed is not None:
+                self.skipped += 1
+                self.errors["rag"] = repr(failed)
+                continue
+            complete.append((ts, pair, ra, rb))
+        return complete
+
+    def _window(self, key: str) -> SlidingWindow:
+        w = self.windows.get(key)
+        if w is None:
+            w = self.windows[key] = SlidingWindow(len(self.columns), len(self.metrics), self.window, self.n_buckets)
+            if len(self.windows) > self.max_keys:
+                evicted, _ = self.windows.popitem(last=False)
+                self.breached = {b for b in self.breached if b[0] != evicted}
+        else:
+            self.windows.move_to_end(key)
+        return w
+
+    def process(self, lines: Sequence[str]) -> List[Breach]:
+        """Score one micro-batch of log lines and return the breach/recovery events it caused."""
+        parsed = self._complete([p for p in map(self._parse, lines) if p is not None])
+        if not parsed:
+            return []
+        ts, pairs, ra, rb = (list(x) for x in zip(*parsed))
+        result = evaluate(pairs, ra, rb, self.thresholds, self.authority_weights, metrics=self.metrics)
+        values = np.column_stack([np.asarray(result.columns[c], dtype=np.float64) for c in self.columns])
+        failed = np.column_stack([~result.passed[m] if m in result.passed else np.zeros(len(pairs), dtype=bool)
+                                  for m in self.metrics]).astype(np.int32)
+        self.errors.update((m, repr(exc)) for m, exc in result.errors.items())
+        self.now = max(self.now, max(ts))
+        touched = OrderedDict()
+        for i, pair in enumerate(pairs):
+            for key in (f"pair:{pair['id']}", f"axis:{pair['axis']}"):
+                self._window(key).add(ts[i], values[i], failed[i])
+                touched[key] = None
+        events = []
+        for key in touched:
+            if key in self.windows:  # may already have been evicted by later keys of this batch
+                events.extend(self._check(key))
+        for e in events:
+            self.emit(e)
+        return events
+
+    def _check(self, key: str) -> Iterator[Breach]:
+        means, fail_rate, rows = self.windows[key].means(self.now)
+        col = dict(zip(self.columns, means))
+        for j, metric in enumerate(self.metrics):
+            spec = METRICS[metric]
+            window_mean = {c: col[c] for c in spec.columns}
+            if any(np.isnan(v) for v in window_mean.values()):
+                continue  # nothing to gate yet (e.g. LES without language pairs, or a metric that errored)
+            ok = bool(np.asarray(spec.gate({c: np.array([v]) for c, v in window_mean.items()}, self.thresholds))[0])
+            state = (key, metric)
+            if ok == (state not in self.breached):
+                continue
+            if ok:
+                self.breached.discard(state)
+            else:
+                self.breached.add(state)
+            yield Breach("recovered" if ok else "breach", key, metric,
+                         {c: (None if np.isnan(v) else round(float(v), 4)) for c, v in window_mean.items()},
+                         round(float(fail_rate[j]), 4), rows, self.thresholds.get(metric), self.now)
+
+    def run(self, tailer: LogTailer, batch_size: int = 64, max_wait: float = 1.0, poll_interval: float = 0.2,
+            once: bool = False):
+        """Tail forever (or, with once=True, until the file has no unread lines)."""
+        pending: List[str] = []
+        deadline = None
+        while True:
+            lines = tailer.poll()
+            pending.extend(lines)
+            if pending and deadline is None:
+                deadline = time.monotonic() + max_wait
+            while len(pending) >= batch_size:
+                self.process(pending[:batch_size])
+                del pending[:batch_size]
+            if pending and (once or time.monotonic() >= deadline):
+                self.process(pending)
+                pending.clear()
+            if not pending:
+                deadline = None
+                if once and not lines:
+                    return
+            time.sleep(0 if once else poll_interval)
+
+
+def _load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="fairness-monitor", description=__doc__.splitlines()[0])
+    ap.add_argument("log", help="JSONL log of counterfactual pairs")
+    ap.add_argument("--thresholds", default=str(DATA_DIR / "thresholds.json"))
+    ap.add_argument("--authority-weights", default=str(DATA_DIR / "authority_weights.json"))
+    ap.add_argument("--metrics", default=None, help="comma-separated subset of " + ",".join(METRICS))
+    ap.add_argument("--window", type=float, default=DEFAULT_WINDOW, help="sliding window in seconds")
+    ap.add_argument("--buckets", type=int, default=DEFAULT_BUCKETS, help="time buckets per window")
+    ap.add_argument("--max-keys", type=int, default=DEFAULT_MAX_KEYS, help="pair ids/axes kept (LRU)")
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--max-wait", type=float, default=1.0, help="seconds before a partial batch is scored")
+    ap.add_argument("--rag-url", default=os.environ.get("FAIRNESS_RAG_URL"),
+                    help="fetch responses missing from the log here (default: MockRAGClient)")
+    ap.add_argument("--from-start", action="store_true", help="also score lines already in the file")
+    ap.add_argument("--once", action="store_true", help="exit once the file is read (implies --from-start)")
+    args = ap.parse_args(argv)
+
+    client = None
+    if args.rag_url:
+        from utilities.rag_clientSample import HTTPRAGClient
+        client = HTTPRAGClient(args.rag_url)
+    monitor = FairnessMonitor(_load_json(args.thresholds), _load_json(args.authority_weights),
+                              metrics=args.metrics.split(",") if args.metrics else None, window=args.window,
+                              n_buckets=args.buckets, max_keys=args.max_keys, client=client)
+    tailer = LogTailer(args.log, from_start=args.from_start or args.once)
+    try:
+        monitor.run(tailer, batch_size=args.batch_size, max_wait=args.max_wait, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tailer.close()
+    return 1 if monitor.breached else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
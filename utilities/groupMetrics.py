@@ -0,0 +1,281 @@
+"""fairness-groups: parity metrics over N-way counterfactual groups.
+
+    python -m utilities.groupMetrics --groups data/counterfactual_groups.json
+
+A group is one base query plus N demographic variants (see
+pairLoader.validate_group). All members' responses are scored in one pass:
+each unique response is encoded (or sentiment/lexicon/toxicity scored) once,
+SPS and LES are the worst cosine similarity in each group's member-by-member
+similarity matrix, computed a block of groups at a time, and SPG, BLF and
+ToxicityGap are the max-min spread of the per-member score. A group with 20
+variants costs 21 encodes instead of 190 pair evaluations.
+
+Gates reuse the pair thresholds: a group passes when its worst pair would.
+"""
+import argparse
+import datetime
+import os
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utilities import instrumentation
+from utilities import metricsUtils as mu
+from utilities.embeddingCache import get_embedding_cache
+from utilities.embeddingUtil import encode_texts, pooled_embeddings
+from utilities.fairnessEval import (
+    DATA_DIR, METRICS, REPORTS_DIR, TIER_MODEL, TIER_TEXT, EvalResult, MetricSpec, _load_json, model_phase,
+    model_phases
+)
+from utilities.lexiconUtil import SENSITIVE_LEXICON
+from utilities.modelRegistry import get_model, model_id
+from utilities.pairLoader import load_groups
+from utilities.rag_clientSample import HTTPRAGClient, MockRAGClient, PrefetchedRAGClient
+
+# Upper bound on the floats one block holds at once: the group x member x dim
+# gathered embeddings plus the group x member x member similarities.
+MAX_BLOCK_CELLS = 1 << 22
+# Pooling modes group SPS/LES support (maxsim aligns chunks of exactly two texts).
+GROUP_POOLING = ("off", "mean")
+
+
+def members(group: dict) -> List[str]:
+    """The group's queries, base first."""
+    return [group["base"]] + [v["query"] for v in group["variants"]]
+
+
+@dataclass
+class GroupBatch:
+    groups: List[dict]
+    responses: List[list]  # per group: [base response, *variant responses]
+    sensitive_terms: object = SENSITIVE_LEXICON
+    pooling: Optional[str] = None  # one of GROUP_POOLING; None reads FAIRNESS_LONG_TEXT
+    _layout: Optional[tuple] = field(default=None, repr=False)
+    _similarities: Optional[tuple] = field(default=None, repr=False)
+
+    def layout(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """(unique texts, (groups, max members) rows into them with -1 padding, translated-member mask)."""
+        if self._layout is None:
+            width = max((len(r) for r in self.responses), default=0)
+            idx = np.full((len(self.groups), width), -1, dtype=np.int64)
+            lang = np.zeros(idx.shape, dtype=bool)
+            index: Dict[str, int] = {}
+            texts: List[str] = []
+            for g, (group, resps) in enumerate(zip(self.groups, self.responses)):
+                for m, r in enumerate(resps):
+                    row = index.get(r.text)
+                    if row is None:
+                        row = index[r.text] = len(texts)
+                        texts.append(r.text)
+                    idx[g, m] = row
+                lang[g, 1:len(resps)] = [v.get("is_lang", False) for v in group["variants"]]
+            self._layout = (texts, idx, lang)
+        return self._layout
+
+    def similarities(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(SPS, LES) per group from one encode of the unique texts.
+
+        Long answers are chunked and mean-pooled when pooling is "mean"; maxsim
+        alignment is pairwise and raises here.
+        """
+        if self._similarities is None:
+            pooling, mode, max_tokens = mu.long_text_settings()
+            pooling = self.pooling or pooling
+            if pooling not in GROUP_POOLING:
+                raise ValueError(f"Group SPS/LES support pooling {list(GROUP_POOLING)}, got {pooling!r}")
+            texts, idx, lang = self.layout()
+            model = get_model("embedder")
+            cache = get_embedding_cache(model_id("embedder"), normalize=True)
+            if pooling == "off":
+                emb = encode_texts(model, texts, cache=cache)
+            else:
+                emb = pooled_embeddings(model, texts, max_tokens=max_tokens, mode=mode, cache=cache)
+            self._similarities = group_similarity_extremes(emb, idx, lang)
+        return self._similarities
+
+    def spreads(self, per_text: np.ndarray) -> np.ndarray:
+        _, idx, _ = self.layout()
+        return group_spreads(per_text, idx)
+
+
+def _blocks(sizes: np.ndarray, dim: int) -> Iterable[np.ndarray]:
+    """Group indices in blocks of similar size, each within MAX_BLOCK_CELLS once padded."""
+    order = np.argsort(sizes, kind="stable")
+    start = 0
+    while start < len(order):
+        stop = start + 1
+        while stop < len(order) and \
+                (stop + 1 - start) * int(sizes[order[stop]]) * (int(sizes[order[stop]]) + dim) <= MAX_BLOCK_CELLS:
+            stop += 1
+        yield order[start:stop]
+        start = stop
+
+
+def group_similarity_extremes(emb: np.ndarray, idx: np.ndarray, lang: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per group, the lowest cosine similarity between two same-language members (SPS) and
+    between the base and a translated variant (LES); NaN where a group has no such pair.
+
+    Groups are processed in blocks of similar size so one batched matmul covers
+    a whole block with little padding.
+    """
+    n_groups = idx.shape[0]
+    sps, les = np.full(n_groups, np.nan), np.full(n_groups, np.nan)
+    if not n_groups or not len(emb):
+        return sps, les
+    emb = emb / np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+    valid = idx >= 0
+    sizes = valid.sum(axis=1)
+    for block in _blocks(sizes, emb.shape[1]):
+        width = int(sizes[block].max())
+        rows, ok, cross = idx[block, :width], valid[block, :width], lang[block, :width]
+        e = emb[np.maximum(rows, 0)]
+        sim = np.einsum("bmd,bnd->bmn", e, e)
+        mono = ok & ~cross
+        pair_ok = mono[:, :, None] & mono[:, None, :] & ~np.eye(width, dtype=bool)
+        lowest = np.where(pair_ok, sim, np.inf).min(axis=(1, 2))
+        sps[block] = np.where(pair_ok.any(axis=(1, 2)), lowest, np.nan)
+        translated = ok & cross
+        lowest = np.where(translated, sim[:, 0, :], np.inf).min(axis=1)
+        les[block] = np.where(translated.any(axis=1), lowest, np.nan)
+    return sps, les
+
+
+def group_spreads(per_text: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """max - min of a per-text score over each group's members (the largest pairwise gap)."""
+    if not idx.size:
+        return np.zeros(idx.shape[0])
+    values = np.where(idx >= 0, np.asarray(per_text, dtype=np.float64)[np.maximum(idx, 0)], np.nan)
+    return np.nanmax(values, axis=1) - np.nanmin(values, axis=1)
+
+
+def _sps(batch):
+    return {"SPS": batch.similarities()[0]}
+
+
+def _les(batch):
+    return {"LES": batch.similarities()[1]}
+
+
+def _spg(batch):
+    texts, _, _ = batch.layout()
+    compound = mu.compound_scores(texts)
+    return {"SPG": batch.spreads(np.array([compound[t] for t in texts]))}
+
+
+def _blf(batch):
+    texts, _, _ = batch.layout()
+    return {"BLF": batch.spreads(mu.bias_lexicon_frequencies(texts, batch.sensitive_terms))}
+
+
+def _tox(batch):
+    texts, _, _ = batch.layout()
+    return {"ToxicityGap": batch.spreads(mu.toxicity_scores(texts)["toxicity"])}
+
+
+def _sps_gate(c, th):
+    # A group whose variants are all translations has no same-language pair to score.
+    return np.isnan(c["SPS"]) | (c["SPS"] >= th["SPS"])
+
+
+# Same names, columns and gates as the pair metrics, in scorecard column order.
+GROUP_METRICS: Dict[str, MetricSpec] = {m.name: m for m in [
+    MetricSpec("SPS", ("SPS",), _sps, _sps_gate, model="embedder", tier=TIER_MODEL),
+    MetricSpec("SPG", ("SPG",), _spg, METRICS["SPG"].gate, model="vader", tier=TIER_TEXT),
+    MetricSpec("BLF", ("BLF",), _blf, METRICS["BLF"].gate, tier=TIER_TEXT),
+    MetricSpec("LES", ("LES",), _les, METRICS["LES"].gate, model="embedder", tier=TIER_MODEL),
+    MetricSpec("ToxicityGap", ("ToxicityGap",), _tox, METRICS["ToxicityGap"].gate, model="detoxify",
+               tier=TIER_MODEL),
+]}
+
+
+def evaluate_groups(groups: List[dict], responses: List[list], thresholds: dict,
+                    metrics: Optional[Iterable[str]] = None, sensitive_terms=SENSITIVE_LEXICON,
+                    pooling: Optional[str] = None) -> EvalResult:
+    """One row per group; like fairnessEval.evaluate, a metric that raises is recorded, not fatal.
+
+    Groups a metric does not apply to (all its columns NaN) are marked skipped.
+    """
+    batch = GroupBatch(groups, responses, sensitive_terms, pooling)
+    result = EvalResult(id_column="group_id")
+    result.columns["group_id"] = [g["id"] for g in groups]
+    result.columns["base"] = [g["base"] for g in groups]
+    result.columns["variants"] = [len(g["variants"]) for g in groups]
+    selected = list(GROUP_METRICS) if metrics is None else list(metrics)
+    unknown = [m for m in selected if m not in GROUP_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown group metrics {unknown}; choose from {list(GROUP_METRICS)}")
+    for model, names in model_phases(GROUP_METRICS, selected):
+        with model_phase(model, names, result):
+            for name in names:
+                spec = GROUP_METRICS[name]
+                try:
+                    with instrumentation.timer("fairness_group_eval_seconds", metric=name):
+                        cols = spec.compute(batch)
+                except Exception as exc:
+                    result.errors[name] = exc
+                    result.columns.update((c, np.full(len(groups), np.nan)) for c in spec.columns)
+                    continue
+                result.columns.update(cols)
+                result.passed[name] = np.asarray(spec.gate(cols, thresholds), dtype=bool)
+                na = np.all([np.isnan(np.asarray(cols[c], dtype=np.float64)) for c in spec.columns], axis=0)
+                if na.any():
+                    result.skipped[name] = na
+    order = [c for m in GROUP_METRICS for c in GROUP_METRICS[m].columns if c in result.columns]
+    result.columns = {**{k: v for k, v in result.columns.items() if k not in order},
+                      **{c: result.columns[c] for c in order}}
+    result.passed = {m: result.passed[m] for m in GROUP_METRICS if m in result.passed}
+    return result
+
+
+def fetch_group_responses(groups: List[dict], client, concurrency: int = 16) -> List[list]:
+    """Every member's response per group, fetched concurrently and once per unique query."""
+    prefetched = PrefetchedRAGClient(client, [q for g in groups for q in members(g)], concurrency=concurrency)
+    return [[prefetched.query(q) for q in members(g)] for g in groups]
+
+
+def main(argv=None) -> int:
+    from utilities.ragRecorder import configure_client
+
+    ap = argparse.ArgumentParser(prog="fairness-groups", description=__doc__.splitlines()[0])
+    ap.add_argument("--groups", default=str(DATA_DIR / "counterfactual_groups.json"))
+    ap.add_argument("--shard", default=None, metavar="i/N")
+    ap.add_argument("--thresholds", default=str(DATA_DIR / "thresholds.json"))
+    ap.add_argument("--metrics", default=None, help="comma-separated subset of " + ",".join(GROUP_METRICS))
+    ap.add_argument("--pooling", choices=GROUP_POOLING, default=None,
+                    help="long-answer pooling for SPS/LES (default: FAIRNESS_LONG_TEXT; maxsim is pairwise only)")
+    ap.add_argument("--rag-url", default=os.environ.get("FAIRNESS_RAG_URL"),
+                    help="RAG service base URL (default: MockRAGClient)")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--replay", default=os.environ.get("FAIRNESS_RAG_REPLAY"), metavar="DIR",
+                    help="answer from this ragRecorder store instead of the RAG service")
+    ap.add_argument("--out", default=None, help="result CSV path (default: reports/fairness_groups_<ts>.csv)")
+    args = ap.parse_args(argv)
+
+    groups = load_groups(args.groups, shard=args.shard)
+    client = HTTPRAGClient(args.rag_url, concurrency=args.concurrency) if args.rag_url else MockRAGClient()
+    client = configure_client(client, replay=args.replay or "")
+    responses = fetch_group_responses(groups, client, concurrency=args.concurrency)
+    result = evaluate_groups(groups, responses, _load_json(args.thresholds),
+                             metrics=args.metrics.split(",") if args.metrics else None, pooling=args.pooling)
+
+    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_path = Path(args.out) if args.out else REPORTS_DIR / f"fairness_groups_{ts}.csv"
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    result.write(csv_path, csv_path.with_name(csv_path.stem + "_summary.json"))
+    summary = result.summary()
+    for metric, g in summary["gates"].items():
+        status = "SKIP" if g["passed"] is None else "PASS" if g["passed"] else "FAIL"
+        detail = g.get("error") or ", ".join(g["failed_ids"])
+        if g.get("skipped") and g["passed"] is not None:
+            detail = f"{detail} ({g['skipped']} groups skipped)" if detail else f"{g['skipped']} groups skipped"
+        print(f"[{status}] {metric}" + (f": {detail}" if detail else ""))
+    print(f"[fairness-groups] {summary['pairs']} groups, "
+          f"{sum(result.columns['variants'])} variants -> {csv_path}")
+    return 0 if summary["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
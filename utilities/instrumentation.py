@@ -0,0 +1,274 @@
+"""Latency histograms, counters and trace spans for the gate pipeline.
+
+Off by default; FAIRNESS_INSTRUMENT=1 (or enable()) turns on histograms and
+counters, FAIRNESS_TRACE=1 (or enable(trace=True)) also records Chrome-trace
+spans. While disabled, instrumented calls cost one global flag check.
+
+    write_reports(REPORTS_DIR)  # fairness_metrics_<ts>.prom (+ fairness_trace_<ts>.json)
+
+The .prom file is OpenMetrics text for Prometheus' textfile collector or
+promtool; the trace opens in chrome://tracing or Perfetto. Point-in-time
+values owned by other modules (model load seconds, cache hit/miss counts) are
+pulled at export time through register_collector(), so they add no overhead.
+"""
+import asyncio
+import bisect
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MAX_TRACE_EVENTS = 500_000
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "0").lower() not in ("0", "false", "off", "no", "")
+
+
+_TRACE = _env_flag("FAIRNESS_TRACE")
+_ENABLED = _env_flag("FAIRNESS_INSTRUMENT") or _TRACE
+_LOCK = threading.Lock()
+_T0 = time.perf_counter()
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+_HISTOGRAMS: Dict[Key, List] = {}  # key -> [count per bucket..., count above the last, sum, count]
+_COUNTERS: Dict[Key, float] = {}
+_EVENTS: List[dict] = []
+_DROPPED = 0
+_COLLECTORS: List[Callable[[], Iterable[Tuple[str, str, dict, float]]]] = []
+
+
+def enable(trace: bool = False):
+    global _ENABLED, _TRACE
+    _ENABLED = True
+    _TRACE = _TRACE or trace
+
+
+def disable():
+    global _ENABLED, _TRACE
+    _ENABLED = _TRACE = False
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+def tracing() -> bool:
+    return _ENABLED and _TRACE
+
+
+def reset():
+    global _DROPPED
+    with _LOCK:
+        _HISTOGRAMS.clear()
+        _COUNTERS.clear()
+        _EVENTS.clear()
+        _DROPPED = 0
+
+
+def _key(name: str, labels: dict) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _observe(key: Key, seconds: float, start: Optional[float] = None):
+    global _DROPPED
+    with _LOCK:
+        h = _HISTOGRAMS.get(key)
+        if h is None:
+            h = _HISTOGRAMS[key] = [0] * (len(BUCKETS) + 1) + [0.0, 0]
+        h[bisect.bisect_left(BUCKETS, seconds)] += 1
+        h[-2] += seconds
+        h[-1] += 1
+        if _TRACE and start is not None:
+            if len(_EVENTS) < MAX_TRACE_EVENTS:
+                _EVENTS.append({"name": key[0], "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                                "ts": (start - _T0) * 1e6, "dur": seconds * 1e6, "args": dict(key[1])})
+            else:
+                _DROPPED += 1
+
+
+def observe(name: str, seconds: float, **labels):
+    if _ENABLED:
+        _observe(_key(name, labels), seconds)
+
+
+def count(name: str, value: float = 1, **labels):
+    if _ENABLED:
+        key = _key(name, labels)
+        with _LOCK:
+            _COUNTERS[key] = _COUNTERS.get(key, 0) + value
+
+
+class _Timer:
+    __slots__ = ("key", "start")
+
+    def __init__(self, key: Key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _observe(self.key, time.perf_counter() - self.start, self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str, **labels):
+    """Context manager timing its block into histogram `name` (and a trace span)."""
+    return _Timer(_key(name, labels)) if _ENABLED else _NULL_TIMER
+
+
+def instrumented(name: str, **labels):
+    """Decorator form of timer() for plain and async functions; labels are fixed at decoration."""
+    key = _key(name, labels)
+
+    def deco(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                if not _ENABLED:
+                    return await fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    _observe(key, time.perf_counter() - start, start)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _observe(key, time.perf_counter() - start, start)
+        return wrapper
+    return deco
+
+
+def register_collector(fn: Callable[[], Iterable[Tuple[str, str, dict, float]]]):
+    """fn() yields (type, name, labels, value) with type "counter" or "gauge", read at export."""
+    _COLLECTORS.append(fn)
+
+
+def snapshot() -> dict:
+    """Picklable copy of the recorded data, e.g. to ship from a worker process to its parent."""
+    with _LOCK:
+        return {"histograms": {k: list(v) for k, v in _HISTOGRAMS.items()}, "counters": dict(_COUNTERS),
+                "events": list(_EVENTS), "dropped": _DROPPED}
+
+
+def merge(snap: dict):
+    global _DROPPED
+    with _LOCK:
+        for key, h in snap["histograms"].items():
+            mine = _HISTOGRAMS.setdefault(key, [0] * len(h))
+            for i, v in enumerate(h):
+                mine[i] += v
+        for key, v in snap["counters"].items():
+            _COUNTERS[key] = _COUNTERS.get(key, 0) + v
+        room = MAX_TRACE_EVENTS - len(_EVENTS)
+        _EVENTS.extend(snap["events"][:room])
+        _DROPPED += snap["dropped"] + max(0, len(snap["events"]) - room)
+
+
+def _labels(labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def openmetrics_text() -> str:
+    lines = []
+    with _LOCK:
+        histograms = sorted(_HISTOGRAMS.items())
+        counters = sorted(_COUNTERS.items())
+    collected = {}
+    for collector in _COLLECTORS:
+        for kind, name, labels, value in collector():
+            collected[(kind, _key(name, labels))] = value
+    by_family: Dict[Tuple[str, str], list] = {}
+    for key, h in histograms:
+        by_family.setdefault(("histogram", key[0]), []).append((key[1], h))
+    for key, v in counters:
+        by_family.setdefault(("counter", key[0]), []).append((key[1], v))
+    for (kind, key), v in sorted(collected.items()):
+        by_family.setdefault((kind, key[0]), []).append((key[1], v))
+
+    for (kind, name), samples in sorted(by_family.items(), key=lambda kv: kv[0][1]):
+        if kind == "counter" and name.endswith("_total"):
+            name = name[:-len("_total")]  # the family name; samples get the suffix back below
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            lines.append(f"# UNIT {name} seconds")
+        for labels, v in samples:
+            if kind == "histogram":
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ("+Inf",), v[:-2]):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_labels(labels, (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_num(v[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {v[-1]}")
+            elif kind == "counter":
+                lines.append(f"{name}_total{_labels(labels)} {_num(v)}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {_num(v)}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_openmetrics(path) -> Path:
+    path = Path(path)
+    path.write_text(openmetrics_text(), encoding="utf-8")
+    return path
+
+
+def write_trace(path) -> Path:
+    path = Path(path)
+    with _LOCK:
+        trace = {"traceEvents": list(_EVENTS), "displayTimeUnit": "ms",
+                 "otherData": {"dropped_events": _DROPPED}}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
+    return path
+
+
+def write_reports(directory, run_id: Optional[str] = None) -> List[Path]:
+    """Write fairness_metrics_<run_id>.prom, plus fairness_trace_<run_id>.json when tracing."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    run_id = run_id or datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    paths = [write_openmetrics(directory / f"fairness_metrics_{run_id}.prom")]
+    if _TRACE:
+        paths.append(write_trace(directory / f"fairness_trace_{run_id}.json"))
+    return paths
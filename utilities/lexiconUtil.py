@@ -6,3 +6,116 @@ SENSITIVE_TERMS = [
     "muslim", "christian", "hindu", "sikh", "jewish",
     "poor", "rich"
 ]
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+# A token is a run of word characters, optionally joined by hyphens/apostrophes
+# ("non-binary", "low-income", "o'neil"); everything else is a separator.
+_TOKEN_RE = re.compile(r"\w+(?:[-'’]\w+)*")
+
+
+@dataclass
+class LexiconMatches:
+    counts: Dict[str, int] = field(default_factory=dict)
+    offsets: Dict[str, List[Tuple[int, int]]] = field(default_factory=dict)
+    unmatched_tokens: set = field(default_factory=set)
+
+
+class LexiconMatcher:
+    """Token-level Aho-Corasick automaton over a lexicon of words and phrases.
+
+    Matching is a single left-to-right pass over the text's tokens, so its cost
+    depends on the text length and not on the number of lexicon terms. Phrases
+    only match across whitespace, never across punctuation.
+    """
+
+    def __init__(self, terms: Sequence[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[Tuple[str, int]]] = [[]]
+        self.terms: List[str] = []
+        for term in terms:
+            tokens = [t.casefold() for t in _TOKEN_RE.findall(term)]
+            if not tokens:
+                continue
+            key = " ".join(tokens)
+            if key in self.terms:
+                continue
+            self.terms.append(key)
+            node = 0
+            for tok in tokens:
+                nxt = self._goto[node].get(tok)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][tok] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((key, len(tokens)))
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for tok, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and tok not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(tok, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def __len__(self):
+        return len(self.terms)
+
+    def match(self, text: str) -> LexiconMatches:
+        result = LexiconMatches()
+        starts: List[int] = []
+        ends: List[int] = []
+        tokens: List[str] = []
+        covered: List[bool] = []
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        prev_end = None
+        for m in _TOKEN_RE.finditer(text):
+            start, end = m.span()
+            if prev_end is not None and not text[prev_end:start].isspace():
+                node = 0
+            prev_end = end
+            tok = m.group().casefold()
+            tokens.append(tok)
+            starts.append(start)
+            ends.append(end)
+            covered.append(False)
+            while node and tok not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(tok, 0)
+            i = len(tokens) - 1
+            for term, n in out[node]:
+                result.counts[term] = result.counts.get(term, 0) + 1
+                result.offsets.setdefault(term, []).append((starts[i - n + 1], end))
+                for j in range(i - n + 1, i + 1):
+                    covered[j] = True
+        result.unmatched_tokens = {t for t, c in zip(tokens, covered) if not c}
+        return result
+
+
+@lru_cache(maxsize=32)
+def _compile(terms: Tuple[str, ...]) -> LexiconMatcher:
+    return LexiconMatcher(terms)
+
+
+def compile_lexicon(terms) -> LexiconMatcher:
+    """Compiled matcher for a term list; repeated calls with the same terms reuse it.
+
+    SENSITIVE_TERMS itself is matched by identity, without hashing the list.
+    """
+    if isinstance(terms, LexiconMatcher):
+        return terms
+    if terms is SENSITIVE_TERMS:
+        return SENSITIVE_LEXICON
+    return _compile(tuple(terms))
+
+
+SENSITIVE_LEXICON = _compile(tuple(SENSITIVE_TERMS))
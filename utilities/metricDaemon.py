@@ -0,0 +1,422 @@
+"""metric-daemon: keep the metric models loaded between runs.
+
+    python -m utilities.metricDaemon start      # background; exits after --idle-timeout
+    python -m utilities.metricDaemon status
+    python -m utilities.metricDaemon stop
+
+metricsUtils sends its model work to a running daemon serving the same models
+and code (CODE_MODULES) and otherwise computes in-process. FAIRNESS_DAEMON=0
+turns the client off. Needs AF_UNIX sockets, so Windows always runs in-process.
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utilities import instrumentation
+from utilities.processState import env_flag
+
+BASE = Path(__file__).resolve().parents[1]
+PROTOCOL = 1
+CONNECT_TIMEOUT = 1.0
+DEFAULT_IDLE_TIMEOUT = 1800.0
+RETRY_SECONDS = 5.0
+_HEAD = struct.Struct("<I")
+# Model each operation needs; the client only uses a daemon whose model ids match its own.
+OP_MODELS = {"similarities": "embedder", "toxicity": "detoxify", "compound": "vader"}
+# Modules whose code decides the daemon's outputs.
+CODE_MODULES = ("metricDaemon", "metricsUtils", "embeddingUtil", "embeddingCache", "sentimentCache",
+                "modelRegistry", "onnxBackend", "lexiconUtil")
+
+
+def code_fingerprint() -> str:
+    """Hash of the CODE_MODULES sources on disk."""
+    h = hashlib.sha1()
+    for name in CODE_MODULES:
+        h.update((Path(__file__).resolve().parent / f"{name}.py").read_bytes())
+    return h.hexdigest()[:16]
+
+
+# Taken at import, so it describes the code this process (client or daemon) runs.
+CODE_FINGERPRINT = code_fingerprint()
+
+
+def available() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+def socket_path() -> str:
+    """FAIRNESS_DAEMON_SOCKET, else a per-user, per-checkout path in the temp dir."""
+    path = os.environ.get("FAIRNESS_DAEMON_SOCKET")
+    if path:
+        return path
+    tag = hashlib.sha1(str(BASE).encode("utf-8")).hexdigest()[:8]
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(tempfile.gettempdir(), f"fairness-metricd-{uid}-{tag}.sock")
+
+
+# ---------------------------------------------------------------- framing
+
+def send_frame(sock, header: dict, arrays: Optional[Dict[str, np.ndarray]] = None):
+    """<u32 header length><JSON header naming each array's dtype and shape><raw arrays>."""
+    arrays = {k: np.asarray(v, order="C") for k, v in (arrays or {}).items()}
+    header = dict(header, arrays=[[k, v.dtype.str, list(v.shape)] for k, v in arrays.items()])
+    head = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEAD.pack(len(head)) + head)
+    for v in arrays.values():
+        if v.nbytes:
+            sock.sendall(memoryview(v).cast("B"))
+
+
+def _recv_exact(sock, n: int) -> bytearray:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if not k:
+            raise ConnectionError("metric daemon connection closed")
+        got += k
+    return buf
+
+
+def recv_frame(sock) -> Tuple[dict, Dict[str, np.ndarray]]:
+    (size,) = _HEAD.unpack(_recv_exact(sock, _HEAD.size))
+    header = json.loads(_recv_exact(sock, size).decode("utf-8"))
+    arrays = {}
+    for name, dtype, shape in header.pop("arrays", ()):
+        dt = np.dtype(dtype)
+        count = int(np.prod(shape)) if shape else 1
+        arrays[name] = np.frombuffer(_recv_exact(sock, count * dt.itemsize), dtype=dt).reshape(shape)
+    return header, arrays
+
+
+# ---------------------------------------------------------------- server
+
+_STATE = threading.local()  # .serving is set on daemon handler threads
+
+
+def _model_ids() -> Dict[str, str]:
+    from utilities.modelRegistry import model_id
+    return {name: model_id(name) for name in OP_MODELS.values()}
+
+
+def _compute(op: str, req: dict) -> Dict[str, np.ndarray]:
+    from utilities import metricsUtils as mu
+    from utilities.sentimentCache import compound_scores
+    if op == "similarities":
+        pairs = list(zip(req["a"], req["b"]))
+        settings = (req["pooling"], req["mode"], req["max_tokens"])
+        return {"values": np.asarray(mu.text_similarities(pairs, req["batch_size"], settings), dtype=np.float32)}
+    if op == "toxicity":
+        return {h: np.asarray(v, dtype=np.float32)
+                for h, v in mu.toxicity_scores(req["texts"], req["batch_size"]).items()}
+    if op == "compound":
+        scores = compound_scores(req["texts"])
+        return {"compound": np.array([scores[t] for t in req["texts"]], dtype=np.float64)}
+    raise ValueError(f"Unknown op {op!r}")
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        _STATE.serving = True
+        server = self.server
+        while True:
+            try:
+                req, _ = recv_frame(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+            op = req.get("op")
+            server.last_request = time.monotonic()
+            try:
+                if op == "hello":
+                    send_frame(self.request, {"ok": True, "protocol": PROTOCOL, "pid": os.getpid(),
+                                              "models": server.model_ids, "code": server.code})
+                elif op == "status":
+                    from utilities import modelRegistry
+                    send_frame(self.request, {"ok": True, "pid": os.getpid(), "requests": server.requests,
+                                              "uptime_s": round(time.monotonic() - server.started, 1),
+                                              "loaded": [m for m in modelRegistry.registered()
+                                                         if modelRegistry.is_loaded(m)],
+                                              "models": server.model_ids})
+                elif op == "shutdown":
+                    send_frame(self.request, {"ok": True})
+                    server.stopping.set()
+                    return
+                else:
+                    with server.compute_lock:
+                        out = _compute(op, req)
+                        server.requests += 1
+                    send_frame(self.request, {"ok": True}, out)
+            except (ConnectionError, BrokenPipeError):
+                return
+            except Exception as exc:
+                try:
+                    send_frame(self.request, {"ok": False, "error": repr(exc)})
+                except OSError:
+                    return
+            finally:
+                server.last_request = time.monotonic()
+
+
+if available():
+    class MetricServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """Answers metric requests on a UNIX socket; one thread per client connection,
+        one model computation at a time."""
+        daemon_threads = True
+
+        def __init__(self, path: str):
+            if os.path.exists(path):
+                os.unlink(path)
+            super().__init__(path, _Handler)
+            os.chmod(path, 0o600)
+            self.path = path
+            self.model_ids = _model_ids()
+            self.code = CODE_FINGERPRINT
+            self.compute_lock = threading.Lock()
+            self.stopping = threading.Event()
+            self.started = self.last_request = time.monotonic()
+            self.requests = 0
+
+        def serve(self, idle_timeout: float = DEFAULT_IDLE_TIMEOUT, poll: float = 0.5):
+            """Serve until a shutdown request or idle_timeout seconds without requests (0: never)."""
+            self.timeout = poll
+            try:
+                while not self.stopping.is_set():
+                    self.handle_request()
+                    if idle_timeout and time.monotonic() - self.last_request > idle_timeout \
+                            and not self.compute_lock.locked():
+                        break
+            finally:
+                self.server_close()
+                if os.path.exists(self.path):
+                    os.unlink(self.path)
+
+
+def serve(path: Optional[str] = None, idle_timeout: float = DEFAULT_IDLE_TIMEOUT, prewarm: bool = True):
+    """Run a daemon in this process until stopped; models load in the background."""
+    # Under `python -m` the metric modules import a second copy of this module,
+    # which must not forward the daemon's own work back to the daemon.
+    os.environ["FAIRNESS_DAEMON"] = "0"
+    server = MetricServer(path or socket_path())
+    if prewarm:
+        threading.Thread(target=_prewarm, daemon=True).start()
+    server.serve(idle_timeout)
+
+
+def _prewarm():
+    # Registry loads are serialized, so the cheapest model goes first; a model
+    # that fails here fails again (and is reported) on its first request.
+    from utilities.modelRegistry import get_model
+    for name in ("vader", "embedder", "detoxify"):
+        try:
+            get_model(name)
+        except Exception as exc:
+            print(f"[metric-daemon] {name} not preloaded: {exc!r}", flush=True)
+
+
+# ---------------------------------------------------------------- client
+
+class DaemonClient:
+    """One connection to a daemon; requests from several threads are serialized."""
+
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        self.path = path
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            self._sock.connect(path)
+            self.info = self.request("hello")[0]
+            # Only metric requests may take long (a daemon loading a model); a hung daemon fails hello fast.
+            self._sock.settimeout(timeout or float(os.environ.get("FAIRNESS_DAEMON_TIMEOUT", 600)))
+        except BaseException:
+            self._sock.close()
+            raise
+        self._serves: Dict[str, bool] = {}
+
+    def serves(self, model: str) -> bool:
+        """Whether the daemon's `model` produces the same outputs as this process would."""
+        ok = self._serves.get(model)
+        if ok is None:
+            ok = self._serves[model] = self.info.get("protocol") == PROTOCOL and \
+                self.info.get("code") == CODE_FINGERPRINT and \
+                self.info.get("models", {}).get(model) == _model_ids()[model]
+        return ok
+
+    def request(self, op: str, **fields) -> Tuple[dict, Dict[str, np.ndarray]]:
+        with self._lock:
+            send_frame(self._sock, dict(fields, op=op))
+            header, arrays = recv_frame(self._sock)
+        if not header.get("ok"):
+            raise RuntimeError(f"metric daemon {op} failed: {header.get('error')}")
+        return header, arrays
+
+    def close(self):
+        self._sock.close()
+
+
+_CLIENT: Optional[DaemonClient] = None
+_CLIENT_LOCK = threading.Lock()
+_RETRY_AT = 0.0
+STATS = {"requests": 0, "fallbacks": 0}
+
+
+def _enabled() -> bool:
+    return available() and env_flag("FAIRNESS_DAEMON") \
+        and not getattr(_STATE, "serving", False)
+
+
+def get_client() -> Optional[DaemonClient]:
+    """The connected client for this process, or None when no usable daemon is running."""
+    global _CLIENT, _RETRY_AT
+    client = _CLIENT
+    path = socket_path()
+    # A forked child must not share its parent's connection.
+    if client is not None and client.pid == os.getpid() and client.path == path:
+        return client
+    if time.monotonic() < _RETRY_AT or not os.path.exists(path):
+        return None
+    with _CLIENT_LOCK:
+        if _CLIENT is not None and _CLIENT.pid == os.getpid() and _CLIENT.path == path:
+            return _CLIENT
+        try:
+            client = DaemonClient(path)
+        except (OSError, ValueError, RuntimeError):
+            _RETRY_AT = time.monotonic() + RETRY_SECONDS
+            return None
+        _CLIENT = client
+    return client
+
+
+def _drop(client: DaemonClient):
+    global _CLIENT, _RETRY_AT
+    with _CLIENT_LOCK:
+        if _CLIENT is client:
+            _CLIENT = None
+        _RETRY_AT = time.monotonic() + RETRY_SECONDS
+    client.close()
+
+
+def call(op: str, **fields) -> Optional[Dict[str, np.ndarray]]:
+    """Run `op` on the daemon; None means "compute in-process" (no daemon, or it failed)."""
+    if not _enabled():
+        return None
+    client = get_client()
+    if client is None:
+        return None
+    if not client.serves(OP_MODELS[op]):
+        return None
+    try:
+        with instrumentation.timer("fairness_daemon_seconds", op=op):
+            _, arrays = client.request(op, **fields)
+    except (OSError, ValueError, RuntimeError):
+        STATS["fallbacks"] += 1
+        _drop(client)
+        return None
+    STATS["requests"] += 1
+    return arrays
+
+
+def similarities(pairs: Sequence[Tuple[str, str]], batch_size: int, settings) -> Optional[np.ndarray]:
+    pooling, mode, max_tokens = settings
+    out = call("similarities", a=[a for a, _ in pairs], b=[b for _, b in pairs], batch_size=batch_size,
+               pooling=pooling, mode=mode, max_tokens=max_tokens)
+    return None if out is None else out["values"]
+
+
+def toxicity(texts: Sequence[str], batch_size: int) -> Optional[Dict[str, np.ndarray]]:
+    return call("toxicity", texts=list(texts), batch_size=batch_size)
+
+
+def compound(texts: Sequence[str]) -> Optional[list]:
+    out = call("compound", texts=list(texts))
+    return None if out is None else out["compound"].tolist()
+
+
+# ---------------------------------------------------------------- CLI
+
+def _status(path: str) -> Optional[dict]:
+    try:
+        client = DaemonClient(path)
+    except (OSError, ValueError, RuntimeError):
+        return None
+    try:
+        return client.request("status")[0]
+    finally:
+        client.close()
+
+
+def start(path: str, idle_timeout: float, wait: float = 10.0) -> Optional[dict]:
+    """Launch a detached daemon and wait until it answers; returns its status."""
+    status = _status(path)
+    if status is not None:
+        return status
+    log = Path(tempfile.gettempdir()) / (Path(path).stem + ".log")
+    with open(log, "ab") as out:
+        subprocess.Popen([sys.executable, "-m", "utilities.metricDaemon", "serve", "--socket", path,
+                          "--idle-timeout", str(idle_timeout)], cwd=str(BASE), stdin=subprocess.DEVNULL,
+                         stdout=out, stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        status = _status(path)
+        if status is not None:
+            return status
+        time.sleep(0.05)
+    return None
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="metric-daemon", description=__doc__.splitlines()[0])
+    ap.add_argument("command", choices=("start", "serve", "status", "stop"))
+    ap.add_argument("--socket", default=None, help="UNIX socket path (default: FAIRNESS_DAEMON_SOCKET or temp dir)")
+    ap.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                    help="exit after this many seconds without requests (0: never)")
+    ap.add_argument("--no-prewarm", action="store_true", help="load models on first request instead of at start")
+    args = ap.parse_args(argv)
+    if not available():
+        print("[metric-daemon] UNIX sockets are not available on this platform; metrics run in-process")
+        return 1
+    path = args.socket or socket_path()
+    if args.command == "serve":
+        serve(path, args.idle_timeout, prewarm=not args.no_prewarm)
+        return 0
+    if args.command == "start":
+        status = start(path, args.idle_timeout)
+        if status is None:
+            print(f"[metric-daemon] did not come up on {path}")
+            return 1
+        print(f"[metric-daemon] pid {status['pid']} on {path}")
+        return 0
+    status = _status(path)
+    if status is None:
+        print(f"[metric-daemon] not running ({path})")
+        return 1 if args.command == "status" else 0
+    if args.command == "stop":
+        client = DaemonClient(path)
+        try:
+            client.request("shutdown")
+        finally:
+            client.close()
+        print(f"[metric-daemon] stopped pid {status['pid']}")
+        return 0
+    print(f"[metric-daemon] pid {status['pid']} up {status['uptime_s']}s, {status['requests']} requests, "
+          f"loaded: {', '.join(status['loaded']) or 'none'} ({path})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,45 +1,125 @@
 
 import math
+import os
 import re
+import numpy as np
 from collections import Counter
-from sentence_transformers import SentenceTransformer, util
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from detoxify import Detoxify
-_EMB_MODEL = SentenceTransformer("all-MiniLM-L6-v2")
-_VADER = SentimentIntensityAnalyzer()
+
+from utilities import metricDaemon
+from utilities.embeddingCache import get_embedding_cache
+from utilities.embeddingUtil import DEFAULT_BATCH_SIZE, long_pair_similarities, pair_similarities
+from utilities.instrumentation import instrumented
+from utilities.lexiconUtil import compile_lexicon
+from utilities.modelRegistry import get_model, model_id
+from utilities import sentimentCache
+
+
+LONG_TEXT_POOLING = ("off", "mean", "maxsim")
+
+
+def long_text_settings():
+    """(pooling, chunk mode, max tokens per chunk or None for the model limit) for SPS/LES.
+
+    FAIRNESS_LONG_TEXT=off|mean|maxsim (default off: answers longer than the
+    model limit are truncated as the model does; mean/maxsim chunk and pool them),
+    FAIRNESS_CHUNK_MODE=sentence|window, FAIRNESS_CHUNK_TOKENS=<n>.
+    """
+    pooling = os.environ.get("FAIRNESS_LONG_TEXT", "off").lower()
+    if pooling not in LONG_TEXT_POOLING:
+        raise ValueError(f"FAIRNESS_LONG_TEXT must be one of {list(LONG_TEXT_POOLING)}, got {pooling!r}")
+    return pooling, os.environ.get("FAIRNESS_CHUNK_MODE", "sentence"), \
+        int(os.environ.get("FAIRNESS_CHUNK_TOKENS", 0) or 0) or None
+
+
+def text_similarities(pairs, batch_size=DEFAULT_BATCH_SIZE, settings=None):
+    """Embedding cosine per pair over the whole answers (see long_text_settings).
+
+    Computed by the metric daemon when one is running (see utilities.metricDaemon).
+    """
+    pairs = list(pairs)
+    settings = settings or long_text_settings()
+    remote = metricDaemon.similarities(pairs, batch_size, settings) if pairs else None
+    if remote is not None:
+        return remote
+    model = get_model("embedder")
+    cache = get_embedding_cache(model_id("embedder"), normalize=True)
+    pooling, mode, max_tokens = settings
+    if pooling == "off":
+        return pair_similarities(model, pairs, batch_size=batch_size, cache=cache)
+    return long_pair_similarities(model, pairs, pooling=pooling, max_tokens=max_tokens, mode=mode,
+                                  batch_size=batch_size, cache=cache)
+
+
+@instrumented("fairness_metric_seconds", metric="SPS")
+def semantic_parity_scores(pairs, batch_size=DEFAULT_BATCH_SIZE):
+    """SPS for every (text_a, text_b) pair; each unique text (or chunk) is encoded once."""
+    return text_similarities(pairs, batch_size=batch_size)
+
 def semantic_parity_score(text_a: str, text_b: str) -> float:
-    ea = _EMB_MODEL.encode([text_a], normalize_embeddings=True)
-    eb = _EMB_MODEL.encode([text_b], normalize_embeddings=True)
-    return float(util.cos_sim(ea, eb)[0][0])
+    return float(semantic_parity_scores([(text_a, text_b)])[0])
 
 _POS = set(["good","great","helpful","clear","easy","fast","accurate","approved"])
 _NEG = set(["bad","poor","confusing","hard","slow","inaccurate","denied","rejected"])
 
 
+@instrumented("fairness_metric_seconds", metric="SPG")
+def compound_scores(texts, workers=None):
+    """sentimentCache.compound_scores; uncached texts go to the metric daemon when one is running."""
+    return sentimentCache.compound_scores(texts, workers, scorer=metricDaemon.compound)
+
+
+def sentiment_polarity_gaps(pairs):
+    """SPG for every pair; compound scores come from the shared sentiment cache."""
+    pairs = list(pairs)
+    compound = compound_scores(t for p in pairs for t in p)
+    return np.array([abs(compound[a] - compound[b]) for a, b in pairs], dtype=np.float64)
+
 def sentiment_polarity_gap(text_a, text_b):
-    va = _VADER.polarity_scores(text_a)['compound']
-    vb = _VADER.polarity_scores(text_b)['compound']
-    return abs(va - vb)
+    return float(sentiment_polarity_gaps([(text_a, text_b)])[0])
 
-def bias_lexicon_frequency(text, sensitive_terms):
-    check_terms = text.split()
-    check_terms = set(t.lower() for t in check_terms)
-    sensitive_terms = set(t.lower() for t in sensitive_terms)
-    if not check_terms and not sensitive_terms:
+def _blf(text, matcher):
+    found = matcher.match(text)
+    if not found.unmatched_tokens and not len(matcher):
         return 0.0
-    inter = len(check_terms & sensitive_terms)
-    union = len(check_terms | sensitive_terms)
+    inter = len(found.counts)
+    union = len(found.unmatched_tokens) + len(matcher)
     return round(inter/union if union else 0.0, 4)
 
+@instrumented("fairness_metric_seconds", metric="BLF")
+def bias_lexicon_frequency(text, sensitive_terms):
+    """Jaccard overlap between the text's words and the lexicon.
+
+    A matched phrase ("illegal alien") counts as one unit of the text, and
+    sensitive_terms may be a term list or a precompiled LexiconMatcher.
+    """
+    return _blf(text, compile_lexicon(sensitive_terms))
+
+@instrumented("fairness_metric_seconds", metric="BLF")
+def bias_lexicon_frequencies(texts, sensitive_terms):
+    """BLF of every text, with the lexicon compiled once."""
+    matcher = compile_lexicon(sensitive_terms)
+    return np.array([_blf(t, matcher) for t in texts], dtype=np.float64)
+
+@instrumented("fairness_metric_seconds", metric="BLF")
+def bias_lexicon_frequency_gaps(pairs, sensitive_terms):
+    pairs = list(pairs)
+    matcher = compile_lexicon(sensitive_terms)
+    blf = {t: _blf(t, matcher) for t in dict.fromkeys(t for p in pairs for t in p)}
+    return np.array([abs(blf[a] - blf[b]) for a, b in pairs], dtype=np.float64)
+
 def bias_lexicon_frequency_gap(text_a, text_b, sensitive_terms):
     """Calculate the difference in bias lexicon frequency between two texts."""
-    blf_a = bias_lexicon_frequency(text_a, sensitive_terms)
-    blf_b = bias_lexicon_frequency(text_b, sensitive_terms)
-    return abs(blf_a - blf_b)
+    matcher = compile_lexicon(sensitive_terms)
+    return abs(_blf(text_a, matcher) - _blf(text_b, matcher))
   
+@instrumented("fairness_metric_seconds", metric="LES")
+def language_equivalence_scores(pairs, batch_size=DEFAULT_BATCH_SIZE):
+    return text_similarities(pairs, batch_size=batch_size)
+
 def language_equivalence_score(text_a, text_b):
     return semantic_parity_score(text_a, text_b)
 
+@instrumented("fairness_metric_seconds", metric="RFI")
 def retrieval_fairness_index(doc_ids_a, doc_ids_b, k=5):
     a = set(doc_ids_a[:k])
     b = set(doc_ids_b[:k])
@@ -49,14 +129,68 @@ def retrieval_fairness_index(doc_ids_a, doc_ids_b, k=5):
     union = len(a | b)
     return round(inter/union if union else 0.0, 4)
 
+@instrumented("fairness_metric_seconds", metric="RBO")
+def rank_biased_overlap(doc_ids_a, doc_ids_b, p=0.9, depth=None):
+    """Extrapolated rank-biased overlap: like RFI, but agreement at the top ranks weighs more."""
+    def first_only(ids):
+        seen = set()
+        return [None if (d in seen or seen.add(d)) else d for d in ids]
+    a = first_only(list(doc_ids_a)[:depth])
+    b = first_only(list(doc_ids_b)[:depth])
+    k = max(len(a), len(b))
+    if k == 0:
+        return 1.0
+    seen_a, seen_b = set(), set()
+    overlap, total = 0, 0.0
+    for d in range(1, k + 1):
+        x = a[d - 1] if d <= len(a) else None
+        y = b[d - 1] if d <= len(b) else None
+        if x is not None:
+            overlap += x in seen_b
+            seen_a.add(x)
+        if y is not None:
+            overlap += y in seen_a
+            seen_b.add(y)
+        total += overlap / d * p ** d
+    return round((1 - p) / p * total + overlap / k * p ** k, 4)
+
+TOXICITY_HEADS = ("toxicity", "severe_toxicity", "obscene", "threat", "insult", "identity_attack")
+
+@instrumented("fairness_metric_seconds", metric="Toxicity")
+def toxicity_scores(texts, batch_size=32):
+    """All Detoxify heads for each text, as {head: np.ndarray} in input order."""
+    texts = list(texts)
+    uniq = list(dict.fromkeys(texts))
+    heads = metricDaemon.toxicity(uniq, batch_size) if uniq else None
+    if heads is None:
+        model = get_model("detoxify")
+        heads = {h: np.zeros(len(uniq), dtype=np.float32) for h in TOXICITY_HEADS}
+        for start in range(0, len(uniq), batch_size):
+            preds = model.predict(uniq[start:start + batch_size])
+            for h in TOXICITY_HEADS:
+                heads[h][start:start + batch_size] = preds[h]
+    row = {t: i for i, t in enumerate(uniq)}
+    idx = np.fromiter((row[t] for t in texts), dtype=np.int64, count=len(texts))
+    return {h: v[idx] for h, v in heads.items()}
+
 def toxicity_score(text):
-    model = Detoxify('original')
-    return model.predict(text)['toxicity']
+    return float(toxicity_scores([text])["toxicity"][0])
+
+def toxicity_gaps(pairs, batch_size=32):
+    pairs = list(pairs)
+    tox = toxicity_scores([t for p in pairs for t in p], batch_size=batch_size)["toxicity"]
+    return np.abs(tox[0::2] - tox[1::2])
+
+def toxicity_gap(text_a, text_b):
+    """Absolute difference of the overall Detoxify toxicity of two texts."""
+    return float(toxicity_gaps([(text_a, text_b)])[0])
     
+@instrumented("fairness_metric_seconds", metric="CitationMin")
 def citation_completeness(citations, min_required):
     count = len(citations or [])
     return (count >= int(min_required)), count
 
+@instrumented("fairness_metric_seconds", metric="DocRecency")
 def doc_recency_index(retrieved, active_year):
     if not retrieved:
         return 0.0
@@ -72,6 +206,7 @@ def doc_recency_index(retrieved, active_year):
             recent += 1
     return round(recent / max(1, len(retrieved)), 4)
 
+@instrumented("fairness_metric_seconds", metric="Authority")
 def authority_score(retrieved, weights):
     if not retrieved:
         return 0.0
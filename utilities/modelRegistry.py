@@ -0,0 +1,269 @@
+"""Process-wide model registry; FAIRNESS_MODEL_BUDGET_MB evicts least recently used models."""
+import ctypes
+import gc
+import itertools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from utilities import instrumentation
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# Resident size assumed for a model that has not been loaded in this process yet.
+SIZE_HINTS_MB = {"embedder": 150.0, "vader": 10.0, "detoxify": 700.0}
+PHASE_SAMPLE_SECONDS = 0.02
+
+_LOADERS: Dict[str, Callable[[], Any]] = {}
+_MODELS: Dict[str, Any] = {}
+_LOCK = threading.RLock()
+_TICK = itertools.count(1)
+_LAST_USED: Dict[str, int] = {}
+LOAD_SECONDS: Dict[str, float] = {}
+SIZES_MB: Dict[str, float] = {}
+EVICTIONS: Dict[str, int] = {}
+PHASES: Dict[str, dict] = {}
+
+
+def _env_budget() -> Optional[float]:
+    raw = os.environ.get("FAIRNESS_MODEL_BUDGET_MB", "").strip()
+    return float(raw) if raw and float(raw) > 0 else None
+
+
+_BUDGET_MB = _env_budget()
+
+
+def budget_mb() -> Optional[float]:
+    """RAM budget for resident models in MB, or None for no limit."""
+    return _BUDGET_MB
+
+
+def set_budget(mb: Optional[float]):
+    """Change the budget (None or 0: unlimited); takes effect at the next load."""
+    global _BUDGET_MB
+    _BUDGET_MB = float(mb) if mb else None
+
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size of this process, or None where it cannot be read."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / 2 ** 20
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process, or None where it cannot be read."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / 2 ** 20, 1)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10, 1)
+
+
+def model_mb(name: str) -> float:
+    """Measured (or hinted) resident size of a model."""
+    return SIZES_MB.get(name, SIZE_HINTS_MB.get(name, 0.0))
+
+
+def resident_mb() -> float:
+    return sum(model_mb(n) for n in list(_MODELS))
+
+
+def _release_memory():
+    """Collect the evicted model's objects and hand freed heap pages back to the OS (glibc)."""
+    gc.collect()
+    if sys.platform.startswith("linux"):
+        try:
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+
+def _evict(name: str):
+    _MODELS.pop(name, None)
+    EVICTIONS[name] = EVICTIONS.get(name, 0) + 1
+    instrumentation.count("fairness_model_evictions", model=name)
+    _release_memory()
+
+
+def _make_room(name: str):
+    budget = _BUDGET_MB
+    if budget is None:
+        return
+    need = model_mb(name)
+    while _MODELS and resident_mb() + need > budget:
+        _evict(min(_MODELS, key=lambda n: _LAST_USED.get(n, 0)))
+
+
+def register(name: str, loader: Callable[[], Any]):
+    """Register a zero-argument loader; the model is built on first get_model(name)."""
+    _LOADERS[name] = loader
+
+
+def get_model(name: str):
+    """The loaded model, loading it (and evicting least recently used ones over budget) if needed."""
+    _LAST_USED[name] = next(_TICK)
+    model = _MODELS.get(name)
+    if model is not None:
+        return model
+    with _LOCK:
+        model = _MODELS.get(name)
+        if model is None:
+            if name not in _LOADERS:
+                raise KeyError(f"Unknown model: {name}")
+            _make_room(name)
+            rss0 = rss_mb()
+            t0 = time.perf_counter()
+            model = _LOADERS[name]()
+            LOAD_SECONDS[name] = time.perf_counter() - t0
+            if rss0 is not None:
+                # Keep the largest growth seen: a reload can reuse pages freed by an eviction.
+                SIZES_MB[name] = max(SIZES_MB.get(name, 0.0), rss_mb() - rss0)
+            _MODELS[name] = model
+    return model
+
+
+def prewarm(names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Load the given (default: all registered) models now; returns load seconds per model."""
+    for name in (list(_LOADERS) if names is None else names):
+        get_model(name)
+    return dict(LOAD_SECONDS)
+
+
+def registered() -> list:
+    return list(_LOADERS)
+
+
+def is_loaded(name: str) -> bool:
+    return name in _MODELS
+
+
+def unload(name: str):
+    with _LOCK:
+        if _MODELS.pop(name, None) is not None:
+            _release_memory()
+
+
+class _PeakSampler(threading.Thread):
+    """Polls RSS until stopped; catches peaks the process high-water mark cannot attribute."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.interval = interval
+        self.peak = rss_mb() or 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, rss_mb() or 0.0)
+
+    def stop(self) -> float:
+        self._stop_event.set()
+        self.join()
+        return max(self.peak, rss_mb() or 0.0)
+
+
+@contextmanager
+def phase(name: str, interval: float = PHASE_SAMPLE_SECONDS):
+    """Yield a dict that receives the block's seconds, peak_rss_mb and evicted models (totals in PHASES)."""
+    stats = {"seconds": 0.0, "peak_rss_mb": None, "evicted": []}
+    evictions = dict(EVICTIONS)
+    hwm = peak_rss_mb()
+    sampler = _PeakSampler(interval) if rss_mb() is not None else None
+    if sampler is not None:
+        sampler.start()
+    t0 = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats["seconds"] = time.perf_counter() - t0
+        peak = sampler.stop() if sampler is not None else None
+        hwm_end = peak_rss_mb()
+        if hwm is not None and hwm_end is not None and hwm_end > hwm:
+            peak = max(peak or 0.0, hwm_end)
+        stats["peak_rss_mb"] = None if peak is None else round(peak, 1)
+        stats["evicted"] = [n for n, c in EVICTIONS.items() if c > evictions.get(n, 0)]
+        merge_phase(PHASES, name, stats)
+        instrumentation.count("fairness_phase_seconds", stats["seconds"], phase=name)
+
+
+def merge_phase(into: Dict[str, dict], name: str, stats: dict):
+    """Fold one phase's stats into a per-name total: seconds add up, peaks take the max,
+    metric and eviction lists are unioned."""
+    cur = into.setdefault(name, {"seconds": 0.0, "peak_rss_mb": None})
+    cur["seconds"] += stats.get("seconds", 0.0)
+    peaks = [p for p in (cur["peak_rss_mb"], stats.get("peak_rss_mb")) if p is not None]
+    cur["peak_rss_mb"] = max(peaks) if peaks else None
+    for key in ("metrics", "evicted"):
+        if key in stats or key in cur:
+            cur[key] = list(dict.fromkeys(cur.get(key, []) + list(stats.get(key, ()))))
+
+
+def _collect():
+    for name, secs in LOAD_SECONDS.items():
+        yield "gauge", "fairness_model_load_seconds", {"model": name}, secs
+        yield "gauge", "fairness_model_loaded", {"model": name}, int(name in _MODELS)
+        if name in SIZES_MB:
+            yield "gauge", "fairness_model_resident_mb", {"model": name}, SIZES_MB[name]
+    for name, st in PHASES.items():
+        if st.get("peak_rss_mb") is not None:
+            yield "gauge", "fairness_phase_peak_rss_mb", {"phase": name}, st["peak_rss_mb"]
+    if _BUDGET_MB is not None:
+        yield "gauge", "fairness_model_budget_mb", {}, _BUDGET_MB
+
+
+instrumentation.register_collector(_collect)
+
+
+def model_id(name: str) -> str:
+    """Identity of a model's outputs, e.g. for cache namespaces; includes a non-default backend."""
+    from utilities.onnxBackend import backend
+    base = EMBEDDING_MODEL_NAME if name == "embedder" else name
+    b = backend()
+    return base if b == "torch" or name not in ("embedder", "detoxify") else f"{base}@{b}"
+
+
+# Heavy backends are imported inside their loaders so importing this module
+# (or metricsUtils) never pulls in torch. FAIRNESS_BACKEND=onnx/onnx-int8
+# swaps the embedder and Detoxify for utilities.onnxBackend sessions.
+def _load_embedder():
+    from utilities import onnxBackend
+    b = onnxBackend.backend()
+    if b != "torch":
+        return onnxBackend.load_embedder(EMBEDDING_MODEL_NAME, quantize=b == "onnx-int8")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+def _load_vader():
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
+
+
+def _load_detoxify():
+    from utilities import onnxBackend
+    b = onnxBackend.backend()
+    if b != "torch":
+        return onnxBackend.load_detoxify(quantize=b == "onnx-int8")
+    from detoxify import Detoxify
+    return Detoxify("original")
+
+
+register("embedder", _load_embedder)
+register("vader", _load_vader)
+register("detoxify", _load_detoxify)
@@ -0,0 +1,335 @@
+"""ONNX Runtime backend for the embedder and Detoxify (optionally int8-quantized).
+
+Select it with FAIRNESS_BACKEND=onnx or FAIRNESS_BACKEND=onnx-int8 (default:
+torch). The first load exports the PyTorch model to ONNX and caches it in
+reports/.onnx_cache (FAIRNESS_ONNX_DIR); the int8 file is a dynamic
+quantization of that export. Later runs load the cached files with
+onnxruntime and the `tokenizers` library, without importing transformers or
+torch. FAIRNESS_ONNX_THREADS sets the intra-op thread count (default: all
+cores). Requires `pip install onnxruntime onnx`.
+
+    python -m utilities.onnxBackend export --quantize
+    python -m utilities.onnxBackend check --quantize --tolerance 0.02
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_DIR = Path(__file__).resolve().parents[1] / "reports" / ".onnx_cache"
+OPSET = 17
+DETOXIFY_MODEL_TYPE = "original"
+
+
+def backend() -> str:
+    name = os.environ.get("FAIRNESS_BACKEND", "torch").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"FAIRNESS_BACKEND={name!r}; choose from {BACKENDS}")
+    return name
+
+
+def _require_ort():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError("The ONNX backend requires onnxruntime and onnx: pip install onnxruntime onnx") from e
+    return onnxruntime
+
+
+def cache_dir(model_key: str, directory=None) -> Path:
+    root = Path(directory or os.environ.get("FAIRNESS_ONNX_DIR", DEFAULT_DIR))
+    return root / re.sub(r"[^A-Za-z0-9_.-]+", "_", model_key)
+
+
+def _model_file(d: Path, quantize: bool) -> Path:
+    return d / ("model.int8.onnx" if quantize else "model.onnx")
+
+
+def _read_meta(d: Path) -> Optional[dict]:
+    try:
+        with open(d / "meta.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _export(module, d: Path, output_name: str, meta: dict, tokenizer):
+    """Trace a HF encoder taking (input_ids, attention_mask) into d/model.onnx with dynamic batch/sequence axes."""
+    import torch
+
+    class _Wrapped(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask):
+            return self.inner(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    d.mkdir(parents=True, exist_ok=True)
+    wrapped = _Wrapped(module).eval()
+    sample = tokenizer(["an example sentence", "a second, longer example sentence"], padding=True,
+                       return_tensors="pt")
+    axes = {0: "batch", 1: "sequence"}
+    out_axes = {0: "batch"} if output_name == "logits" else axes
+    kwargs = {"input_names": ["input_ids", "attention_mask"], "output_names": [output_name],
+              "dynamic_axes": {"input_ids": axes, "attention_mask": axes, output_name: out_axes},
+              "opset_version": OPSET}
+    tmp = d / "model.onnx.tmp"
+    with torch.no_grad():
+        try:
+            torch.onnx.export(wrapped, (sample["input_ids"], sample["attention_mask"]), str(tmp),
+                              dynamo=False, **kwargs)
+        except TypeError:  # torch < 2.5 has no dynamo switch
+            torch.onnx.export(wrapped, (sample["input_ids"], sample["attention_mask"]), str(tmp), **kwargs)
+    tokenizer.save_pretrained(str(d))
+    if not getattr(tokenizer, "is_fast", False):
+        from transformers.convert_slow_tokenizer import convert_slow_tokenizer
+        convert_slow_tokenizer(tokenizer).save(str(d / "tokenizer.json"))
+    os.replace(tmp, d / "model.onnx")
+    meta = {**meta, "opset": OPSET, "torch": torch.__version__, "pad_id": int(tokenizer.pad_token_id or 0)}
+    with open(d / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _quantize(d: Path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    tmp = d / "model.int8.onnx.tmp"
+    quantize_dynamic(str(d / "model.onnx"), str(tmp), weight_type=QuantType.QInt8)
+    os.replace(tmp, _model_file(d, True))
+
+
+def _is_mean_pooling(module) -> bool:
+    # sentence-transformers < 6 exposes pooling_mode_mean_tokens, later versions a pooling_mode string.
+    if hasattr(module, "pooling_mode_mean_tokens"):
+        return bool(module.pooling_mode_mean_tokens) and not any(
+            getattr(module, f"pooling_mode_{m}", False) for m in ("cls_token", "max_tokens", "mean_sqrt_len_tokens"))
+    return getattr(module, "pooling_mode", None) == "mean"
+
+
+def export_embedder(model_name: str, quantize: bool = False, directory=None, st_model=None) -> Path:
+    """Export (once) a mean-pooling SentenceTransformer; returns its cache directory."""
+    d = cache_dir(model_name, directory)
+    if not (d / "model.onnx").exists() or _read_meta(d) is None:
+        if st_model is None:
+            from sentence_transformers import SentenceTransformer
+            st_model = SentenceTransformer(model_name)
+        modules = list(st_model)
+        if len(modules) < 2 or not _is_mean_pooling(modules[1]):
+            raise ValueError(f"{model_name}: only mean-pooling sentence encoders can be exported")
+        _export(modules[0].auto_model, d, "last_hidden_state",
+                {"kind": "embedder", "source": model_name, "max_length": int(st_model.max_seq_length),
+                 "normalize": any(type(m).__name__ == "Normalize" for m in modules[2:])},
+                st_model.tokenizer)
+    if quantize and not _model_file(d, True).exists():
+        _quantize(d)
+    return d
+
+
+def export_detoxify(model_type: str = DETOXIFY_MODEL_TYPE, quantize: bool = False, directory=None,
+                    detox_model=None) -> Path:
+    """Export (once) a Detoxify classifier; returns its cache directory."""
+    d = cache_dir(f"detoxify-{model_type}", directory)
+    if not (d / "model.onnx").exists() or _read_meta(d) is None:
+        if detox_model is None:
+            from detoxify import Detoxify
+            detox_model = Detoxify(model_type)
+        tokenizer = detox_model.tokenizer
+        _export(detox_model.model, d, "logits",
+                {"kind": "detoxify", "source": model_type, "class_names": list(detox_model.class_names),
+                 "max_length": int(min(getattr(tokenizer, "model_max_length", 512), 512))},
+                tokenizer)
+    if quantize and not _model_file(d, True).exists():
+        _quantize(d)
+    return d
+
+
+class _Tokenizer:
+    """The subset of a transformers tokenizer call used here, over a saved tokenizer.json."""
+
+    def __init__(self, path: Path, pad_id: int, max_length: int):
+        from tokenizers import Tokenizer
+        self._full = Tokenizer.from_file(str(path))
+        self._full.no_padding()
+        self._full.no_truncation()
+        self._truncated = Tokenizer.from_file(str(path))
+        self._truncated.no_padding()
+        self._truncated.enable_truncation(max_length)
+        self.pad_id = pad_id
+
+    def __call__(self, texts, padding=False, truncation=False, max_length=None, add_special_tokens=True,
+                 return_tensors=None):
+        tok = self._truncated if truncation else self._full
+        ids = [e.ids for e in tok.encode_batch(list(texts), add_special_tokens=add_special_tokens)]
+        if return_tensors != "np":
+            return {"input_ids": ids, "attention_mask": [[1] * len(x) for x in ids]}
+        width = max(map(len, ids), default=0)
+        input_ids = np.full((len(ids), width), self.pad_id, dtype=np.int64)
+        mask = np.zeros((len(ids), width), dtype=np.int64)
+        for i, x in enumerate(ids):
+            input_ids[i, :len(x)] = x
+            mask[i, :len(x)] = 1
+        return {"input_ids": input_ids, "attention_mask": mask}
+
+
+class _OnnxModel:
+    """An ORT session plus the tokenizer saved next to it.
+
+    Sessions are opened lazily and reopened after a fork: ORT thread pools do
+    not survive fork, so forked evaluation workers each open their own.
+    """
+
+    def __init__(self, directory, quantize: bool = False, threads: Optional[int] = None):
+        self.directory = Path(directory)
+        self.path = _model_file(self.directory, quantize)
+        self.meta = _read_meta(self.directory) or {}
+        self.max_length = int(self.meta.get("max_length", 512))
+        if (self.directory / "tokenizer.json").exists() and "pad_id" in self.meta:
+            self.tokenizer = _Tokenizer(self.directory / "tokenizer.json", self.meta["pad_id"], self.max_length)
+        else:  # exported before tokenizer.json and pad_id were saved
+            from transformers import AutoTokenizer
+            self.tokenizer = AutoTokenizer.from_pretrained(str(self.directory))
+        self.threads = threads
+        self._session = None
+        self._pid = None
+
+    def session(self):
+        if self._session is None or self._pid != os.getpid():
+            ort = _require_ort()
+            opts = ort.SessionOptions()
+            opts.intra_op_num_threads = int(self.threads or os.environ.get("FAIRNESS_ONNX_THREADS", 0)
+                                            or os.cpu_count() or 1)
+            opts.inter_op_num_threads = 1
+            opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._session = ort.InferenceSession(str(self.path), opts, providers=["CPUExecutionProvider"])
+            self._pid = os.getpid()
+        return self._session
+
+    def _run(self, texts: List[str]):
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                             return_tensors="np")
+        mask = enc["attention_mask"].astype(np.int64)
+        out = self.session().run(None, {"input_ids": enc["input_ids"].astype(np.int64), "attention_mask": mask})[0]
+        return out, mask
+
+
+class OnnxEmbedder(_OnnxModel):
+    """SentenceTransformer.encode() stand-in: mean pooling over the ONNX encoder output."""
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **_):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            hidden, mask = self._run(texts[start:start + batch_size])
+            m = mask[:, :, None].astype(np.float32)
+            emb = (hidden * m).sum(1) / np.clip(m.sum(1), 1e-9, None)
+            if normalize_embeddings or self.meta.get("normalize"):
+                emb /= np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+            chunks.append(emb.astype(np.float32))
+        emb = np.concatenate(chunks) if chunks else np.zeros((0, 0), dtype=np.float32)
+        return emb[0] if single else emb
+
+
+class OnnxDetoxify(_OnnxModel):
+    """Detoxify.predict() stand-in returning {class_name: scores}."""
+
+    def __init__(self, directory, quantize: bool = False, threads: Optional[int] = None):
+        super().__init__(directory, quantize, threads)
+        self.class_names = self.meta["class_names"]
+
+    def predict(self, text):
+        single = isinstance(text, str)
+        logits, _ = self._run([text] if single else list(text))
+        scores = 1.0 / (1.0 + np.exp(-logits))
+        return {c: (float(scores[0, i]) if single else scores[:, i].tolist())
+                for i, c in enumerate(self.class_names)}
+
+
+def load_embedder(model_name: str, quantize: bool = False, directory=None) -> OnnxEmbedder:
+    return OnnxEmbedder(export_embedder(model_name, quantize, directory), quantize)
+
+
+def load_detoxify(model_type: str = DETOXIFY_MODEL_TYPE, quantize: bool = False, directory=None) -> OnnxDetoxify:
+    return OnnxDetoxify(export_detoxify(model_type, quantize, directory), quantize)
+
+
+def max_deviation(reference: Sequence[float], candidate: Sequence[float]) -> float:
+    reference, candidate = np.asarray(reference, dtype=np.float64), np.asarray(candidate, dtype=np.float64)
+    return float(np.max(np.abs(reference - candidate))) if reference.size else 0.0
+
+
+def accuracy_check(pairs: List[dict], quantize: bool, model_name: Optional[str] = None) -> Dict[str, dict]:
+    """Max |ONNX - PyTorch| of SPS, LES and every toxicity head over the pairs' mock RAG responses."""
+    from utilities.embeddingUtil import pair_similarities
+    from utilities.fairnessEval import fetch_responses
+    from utilities.modelRegistry import EMBEDDING_MODEL_NAME
+    from utilities.rag_clientSample import MockRAGClient
+    from sentence_transformers import SentenceTransformer
+    from detoxify import Detoxify
+
+    model_name = model_name or EMBEDDING_MODEL_NAME
+    ra, rb = fetch_responses(pairs, MockRAGClient())
+    texts = [(a.text, b.text) for a, b in zip(ra, rb)]
+    lang = [t for t, p in zip(texts, pairs) if p.get("is_lang_pair")]
+    uniq = list(dict.fromkeys(t for p in texts for t in p))
+
+    ref_embedder, ref_detox = SentenceTransformer(model_name), Detoxify(DETOXIFY_MODEL_TYPE)
+    onnx_embedder = load_embedder(model_name, quantize)
+    onnx_detox = load_detoxify(DETOXIFY_MODEL_TYPE, quantize)
+
+    report = {}
+    for metric, subset in (("SPS", texts), ("LES", lang)):
+        timings, values = [], []
+        for model in (ref_embedder, onnx_embedder):
+            t0 = time.perf_counter()
+            values.append(pair_similarities(model, subset, cache=None) if subset else np.zeros(0))
+            timings.append(time.perf_counter() - t0)
+        report[metric] = {"max_abs_dev": max_deviation(*values), "torch_s": timings[0], "onnx_s": timings[1]}
+    t0 = time.perf_counter()
+    ref = ref_detox.predict(uniq)
+    t1 = time.perf_counter()
+    got = onnx_detox.predict(uniq)
+    t2 = time.perf_counter()
+    report["Toxicity"] = {"max_abs_dev": max(max_deviation(ref[h], got[h]) for h in onnx_detox.class_names),
+                          "torch_s": t1 - t0, "onnx_s": t2 - t1}
+    return report
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="onnx-backend", description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("export", "check"):
+        p = sub.add_parser(name)
+        p.add_argument("--quantize", action="store_true", help="int8 dynamic quantization")
+    p.add_argument("--pairs", default=str(Path(__file__).resolve().parents[1] / "data" / "counterfactual_pairs.json"))
+    p.add_argument("--tolerance", type=float, default=0.02, help="max allowed |ONNX - PyTorch| per metric")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "export":
+        from utilities.modelRegistry import EMBEDDING_MODEL_NAME
+        for d in (export_embedder(EMBEDDING_MODEL_NAME, args.quantize), export_detoxify(quantize=args.quantize)):
+            print(_model_file(d, args.quantize))
+        return 0
+
+    from utilities.pairLoader import load_pairs
+    report = accuracy_check(load_pairs(args.pairs), args.quantize)
+    ok = True
+    for metric, r in report.items():
+        passed = r["max_abs_dev"] <= args.tolerance
+        ok &= passed
+        print(f"[{'PASS' if passed else 'FAIL'}] {metric}: max |dev|={r['max_abs_dev']:.6f} "
+              f"torch={r['torch_s']:.3f}s onnx={r['onnx_s']:.3f}s")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
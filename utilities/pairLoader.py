@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import io
+import json
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+REQUIRED_FIELDS = ("id", "query_a", "query_b")
+GROUP_FIELDS = ("id", "base")
+VARIANT_FIELDS = ("id", "query")
+
+
+class PairSchemaError(ValueError):
+    pass
+
+
+def validate_pair(row, where: str = "") -> dict:
+    """Check one pair record and fill optional fields; raises PairSchemaError."""
+    if not isinstance(row, dict):
+        raise PairSchemaError(f"{where}: expected an object, got {type(row).__name__}")
+    for key in REQUIRED_FIELDS:
+        if not isinstance(row.get(key), str) or not row[key].strip():
+            raise PairSchemaError(f"{where}: field '{key}' must be a non-empty string")
+    lang = row.setdefault("is_lang_pair", False)
+    if not isinstance(lang, bool):
+        raise PairSchemaError(f"{where}: field 'is_lang_pair' must be a boolean")
+    if not isinstance(row.get("inspect", False), bool):
+        raise PairSchemaError(f"{where}: field 'inspect' must be a boolean")
+    return row
+
+
+def validate_group(row, where: str = "") -> dict:
+    """Check one N-way group record ({id, base, variants: [{id, query, is_lang?}]}); raises PairSchemaError."""
+    if not isinstance(row, dict):
+        raise PairSchemaError(f"{where}: expected an object, got {type(row).__name__}")
+    for key in GROUP_FIELDS:
+        if not isinstance(row.get(key), str) or not row[key].strip():
+            raise PairSchemaError(f"{where}: field '{key}' must be a non-empty string")
+    variants = row.get("variants")
+    if not isinstance(variants, list) or not variants:
+        raise PairSchemaError(f"{where}: field 'variants' must be a non-empty list")
+    seen = set()
+    for j, v in enumerate(variants):
+        at = f"{where}.variants[{j}]"
+        if not isinstance(v, dict):
+            raise PairSchemaError(f"{at}: expected an object, got {type(v).__name__}")
+        for key in VARIANT_FIELDS:
+            if not isinstance(v.get(key), str) or not v[key].strip():
+                raise PairSchemaError(f"{at}: field '{key}' must be a non-empty string")
+        if v["id"] in seen:
+            raise PairSchemaError(f"{at}: duplicate variant id '{v['id']}'")
+        seen.add(v["id"])
+        if not isinstance(v.setdefault("is_lang", False), bool):
+            raise PairSchemaError(f"{at}: field 'is_lang' must be a boolean")
+    return row
+
+
+def parse_shard(spec: Union[str, Tuple[int, int], None]) -> Optional[Tuple[int, int]]:
+    """Parse "i/N" (0 <= i < N) into (i, N)."""
+    if spec is None or isinstance(spec, tuple):
+        return spec
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {spec!r}") from None
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"Shard index must satisfy 0 <= i < N, got {spec!r}")
+    return i, n
+
+
+def shard_of(pair_id: str, n_shards: int) -> int:
+    """Stable shard for a pair id, independent of file order and PYTHONHASHSEED."""
+    digest = hashlib.blake2b(pair_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % n_shards
+
+
+def _open_text(path: Path):
+    if path.suffix == ".gz":
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _iter_records(path: Path) -> Iterator[Tuple[str, object]]:
+    is_jsonl = path.name.endswith((".jsonl", ".jsonl.gz", ".ndjson", ".ndjson.gz"))
+    with _open_text(path) as f:
+        if is_jsonl:
+            for lineno, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield f"{path.name}:{lineno}", json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise PairSchemaError(f"{path.name}:{lineno}: invalid JSON ({e.msg})") from None
+        else:
+            # Plain .json arrays are small fixtures and are parsed in one go.
+            for idx, row in enumerate(json.load(f)):
+                yield f"{path.name}[{idx}]", row
+
+
+def _iter_validated(path, shard, validate) -> Iterator[dict]:
+    shard = parse_shard(shard)
+    for where, row in _iter_records(Path(path)):
+        row = validate(row, where)
+        if shard is None or shard_of(row["id"], shard[1]) == shard[0]:
+            yield row
+
+
+def iter_pairs(path, shard=None) -> Iterator[dict]:
+    """Lazily yield validated pairs from .json, .jsonl or .jsonl.gz, optionally one shard only.
+
+    JSONL input is streamed line by line, so memory stays flat whatever the
+    file size.
+    """
+    return _iter_validated(path, shard, validate_pair)
+
+
+def load_pairs(path, shard=None) -> List[dict]:
+    return list(iter_pairs(path, shard=shard))
+
+
+def iter_groups(path, shard=None) -> Iterator[dict]:
+    """Like iter_pairs, for N-way counterfactual group files (sharded by group id)."""
+    return _iter_validated(path, shard, validate_group)
+
+
+def load_groups(path, shard=None) -> List[dict]:
+    return list(iter_groups(path, shard=shard))
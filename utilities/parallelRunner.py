@@ -0,0 +1,213 @@
+"""Multi-core fairness evaluation: forked workers share the models the parent loaded.
+
+Pairs go out as small index ranges so idle workers take the next one. Without
+fork (Windows, macOS) or with one worker, evaluate() runs in-process.
+"""
+import gc
+import math
+import multiprocessing as mp
+import os
+import pickle
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# fairnessEval is used as a module (not from-imported) because its CLI imports this one.
+from utilities import embeddingCache, fairnessEval, instrumentation, sentimentCache
+from utilities.lexiconUtil import SENSITIVE_LEXICON
+from utilities import modelRegistry
+from utilities.modelRegistry import get_model, merge_phase
+from utilities.processState import env_int
+
+CHUNKS_PER_WORKER = 4
+MAX_CHUNK = 256
+
+# Set in the parent right before the fork; workers read it copy-on-write.
+_JOB: Optional[dict] = None
+
+
+def default_workers() -> int:
+    return env_int("FAIRNESS_WORKERS", 1)
+
+
+def can_fork() -> bool:
+    return "fork" in mp.get_all_start_methods()
+
+
+def chunk_ranges(n: int, workers: int, chunk_size: Optional[int] = None) -> List[Tuple[int, int]]:
+    """[start, stop) ranges; several per worker so uneven chunks even out."""
+    if n <= 0:
+        return []
+    size = chunk_size or min(MAX_CHUNK, max(1, math.ceil(n / (workers * CHUNKS_PER_WORKER))))
+    return [(i, min(i + size, n)) for i in range(0, n, size)]
+
+
+def prewarm_for(metrics: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """Load the models the selected metrics use (those that fit a RAM budget); returns {model: error}."""
+    specs = fairnessEval.METRICS
+    names = list(specs) if metrics is None else list(metrics)
+    failed = {}
+    for model in dict.fromkeys(specs[m].model for m in names if m in specs and specs[m].model):
+        budget = modelRegistry.budget_mb()
+        if budget is not None and not modelRegistry.is_loaded(model) and \
+                modelRegistry.resident_mb() + modelRegistry.model_mb(model) > budget:
+            continue
+        try:
+            get_model(model)
+        except Exception as exc:
+            failed[model] = repr(exc)
+    return failed
+
+
+def _init_worker(threads: int):
+    # The parent's recorded timings were inherited by the fork; keep only this worker's.
+    instrumentation.reset()
+    # Stop every worker's torch/ORT from spawning a thread per core on top of the pool.
+    os.environ["FAIRNESS_ONNX_THREADS"] = str(threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def _portable(exc: BaseException) -> BaseException:
+    try:
+        pickle.loads(pickle.dumps(exc))
+        return exc
+    except Exception:
+        return fairnessEval.MetricError(repr(exc))
+
+
+def _caches(result_cache=None) -> dict:
+    """The caches open in this process, keyed so the parent can find its own copy."""
+    caches = {("embedding", name, norm): c for (name, norm), c in embeddingCache._CACHES.instances.items()}
+    sentiment = sentimentCache._CACHE.peek()
+    if sentiment is not None:
+        caches[("sentiment",)] = sentiment
+    if result_cache is not None:
+        caches[("result",)] = result_cache
+    return caches
+
+
+def _counts(caches: dict) -> Dict[tuple, Tuple[int, int]]:
+    return {key: (c.hits, c.misses) for key, c in caches.items()}
+
+
+def _add_cache_counts(counts: Dict[tuple, Dict[str, int]], result_cache=None):
+    """Add hits/misses counted in workers to this process's caches."""
+    for key, st in counts.items():
+        if key[0] == "embedding":
+            cache = embeddingCache.get_embedding_cache(key[1], key[2])
+        elif key[0] == "sentiment":
+            cache = sentimentCache.get_sentiment_cache()
+        else:
+            cache = result_cache
+        if cache is not None:
+            cache.hits += st["hits"]
+            cache.misses += st["misses"]
+
+
+def _run_chunk(bounds: Tuple[int, int]):
+    start, stop = bounds
+    job = _JOB
+    before = _counts(_caches(job["result_cache"]))
+    result = fairnessEval.evaluate(
+        job["pairs"][start:stop], job["responses_a"][start:stop], job["responses_b"][start:stop],
+        job["thresholds"], job["authority_weights"], active_year=job["active_year"], metrics=job["metrics"],
+        sensitive_terms=job["sensitive_terms"], result_cache=job["result_cache"], mode=job["mode"])
+    timings = None
+    if instrumentation.enabled():
+        timings = instrumentation.snapshot()
+        instrumentation.reset()
+    caches = {}
+    for key, (hits, misses) in _counts(_caches(job["result_cache"])).items():
+        old_hits, old_misses = before.get(key, (0, 0))
+        if hits - old_hits or misses - old_misses:
+            caches[key] = {"hits": hits - old_hits, "misses": misses - old_misses}
+    return (start, result.columns, result.passed, {k: _portable(e) for k, e in result.errors.items()},
+            result.skipped, result.phases, caches, timings)
+
+
+def merge_results(parts: Sequence[Tuple[int, dict, dict, dict, dict, dict, dict]]) -> "fairnessEval.EvalResult":
+    """Concatenate per-chunk (start, columns, passed, errors, skipped, phases, caches) in pair order.
+
+    Seconds and cache counts add up; a column missing from a chunk is NaN (None) there.
+    """
+    parts = sorted(parts, key=lambda p: p[0])
+    merged = fairnessEval.EvalResult()
+    if not parts:
+        return merged
+    for name in dict.fromkeys(n for p in parts for n in p[1]):
+        present = [p[1][name] for p in parts if name in p[1]]
+        arrays = all(isinstance(c, np.ndarray) for c in present)
+        chunks = [p[1][name] if name in p[1] else
+                  (np.full(len(p[1]["pair_id"]), np.nan) if arrays else [None] * len(p[1]["pair_id"]))
+                  for p in parts]
+        if arrays:
+            merged.columns[name] = np.concatenate(chunks)
+        else:
+            merged.columns[name] = [v for c in chunks for v in c]
+    for _, _, _, errors, *_ in parts:
+        for metric, exc in errors.items():
+            merged.errors.setdefault(metric, exc)
+    for metric in dict.fromkeys(m for p in parts for m in p[2]):
+        merged.passed[metric] = np.concatenate([
+            p[2].get(metric, np.zeros(len(p[1]["pair_id"]), dtype=bool)) for p in parts])
+    for metric in dict.fromkeys(m for p in parts for m in p[4]):
+        merged.skipped[metric] = np.concatenate([
+            p[4].get(metric, np.zeros(len(p[1]["pair_id"]), dtype=bool)) for p in parts])
+    for part in parts:
+        for model, stats in part[5].items():
+            merge_phase(merged.phases, model, stats)
+        for key, st in part[6].items():
+            total = merged.caches.setdefault(key, {"hits": 0, "misses": 0})
+            total["hits"] += st["hits"]
+            total["misses"] += st["misses"]
+    return merged
+
+
+def evaluate_parallel(pairs: List[dict], responses_a: list, responses_b: list, thresholds: dict,
+                      authority_weights: Dict[str, float], workers: Optional[int] = None,
+                      active_year: Optional[int] = None, metrics: Optional[Iterable[str]] = None,
+                      sensitive_terms=SENSITIVE_LEXICON, chunk_size: Optional[int] = None,
+                      result_cache=None, mode: str = "full") -> "fairnessEval.EvalResult":
+    """evaluate() spread over `workers` forked processes (default FAIRNESS_WORKERS).
+
+    Fail-fast/triage decisions and the model RAM budget apply per chunk and per worker.
+    """
+    global _JOB
+    workers = default_workers() if workers is None else int(workers)
+    metrics = None if metrics is None else list(metrics)
+    ranges = chunk_ranges(len(pairs), workers, chunk_size)
+    if workers <= 1 or len(ranges) <= 1 or not can_fork():
+        return fairnessEval.evaluate(pairs, responses_a, responses_b, thresholds, authority_weights,
+                                     active_year=active_year, metrics=metrics, sensitive_terms=sensitive_terms,
+                                     result_cache=result_cache, mode=mode)
+    unknown = [m for m in (metrics or []) if m not in fairnessEval.METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics {unknown}; choose from {list(fairnessEval.METRICS)}")
+    if mode not in fairnessEval.MODES:
+        raise ValueError(f"Unknown mode {mode!r}; choose from {list(fairnessEval.MODES)}")
+    workers = min(workers, len(ranges))
+    prewarm_for(metrics)
+    _JOB = {"pairs": pairs, "responses_a": responses_a, "responses_b": responses_b,
+            "thresholds": thresholds, "authority_weights": authority_weights, "active_year": active_year,
+            "metrics": metrics, "sensitive_terms": sensitive_terms, "result_cache": result_cache, "mode": mode}
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # Frozen objects are skipped by the collector, so workers do not dirty (and copy) their pages.
+    gc.freeze()
+    try:
+        with mp.get_context("fork").Pool(workers, initializer=_init_worker, initargs=(threads,)) as pool:
+            parts = []
+            for *part, timings in pool.imap_unordered(_run_chunk, ranges, chunksize=1):
+                parts.append(tuple(part))
+                if timings is not None:
+                    instrumentation.merge(timings)
+    finally:
+        gc.unfreeze()
+        _JOB = None
+    merged = merge_results(parts)
+    for model, stats in merged.phases.items():
+        merge_phase(modelRegistry.PHASES, model, stats)
+    _add_cache_counts(merged.caches, result_cache)
+    return merged
@@ -0,0 +1,53 @@
+"""FAIRNESS_* settings and the process-wide caches built from them."""
+import os
+import threading
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+from utilities import instrumentation
+
+T = TypeVar("T")
+_OFF = ("0", "false", "off", "no")
+
+
+def env_flag(name: str, default: bool = True) -> bool:
+    value = os.environ.get(name, "").strip().lower()
+    return value not in _OFF if value else default
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.environ.get(name, "").strip()
+    return int(value) if value else default
+
+
+class Shared(Generic[T]):
+    """Process-wide instances: get(*key) builds factory(*key) once per key, under a lock."""
+
+    def __init__(self, factory: Callable[..., T]):
+        self.factory = factory
+        self.instances: Dict[tuple, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self, *key) -> T:
+        with self._lock:
+            inst = self.instances.get(key)
+            if inst is None:
+                inst = self.instances[key] = self.factory(*key)
+            return inst
+
+    def peek(self, *key) -> Optional[T]:
+        return self.instances.get(key)
+
+
+def export_stats(prefix: str, stats: Callable[[], Dict[str, dict]], label: str = "cache"):
+    """Export hits/misses (and entries) of each stats() value as fairness_<prefix>_* metrics.
+
+    stats() maps a `label` value to a stats dict; an empty key exports no label.
+    """
+    def collect():
+        for key, st in stats().items():
+            labels = {label: key} if key else {}
+            yield "counter", f"fairness_{prefix}_hits", labels, st["hits"]
+            yield "counter", f"fairness_{prefix}_misses", labels, st["misses"]
+            if "entries" in st:
+                yield "gauge", f"fairness_{prefix}_entries", labels, st["entries"]
+    instrumentation.register_collector(collect)
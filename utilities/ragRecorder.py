@@ -0,0 +1,375 @@
+"""Record RAG answers once, replay them without a network or a model.
+
+    python -m utilities.ragRecorder record --store reports/rag_store [--rag-url URL]
+    python -m utilities.ragRecorder info --store reports/rag_store
+
+A store is an append-only responses.dat plus a memory-mapped hash index
+(responses.idx) that is rebuilt from the data file when missing or behind.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from utilities import instrumentation
+from utilities.rag_clientSample import RAGResponse, as_async_client
+
+DATA_FILE = "responses.dat"  # records: <u32 length><JSON {q, text, citations, retrieved}>
+INDEX_FILE = "responses.idx"  # open-addressing slots of (query hash, record offset)
+INITIAL_CAPACITY = 1024
+_MAGIC = 0x3158444947415200  # "\0RAGIDX1"
+_HEADER = 4  # uint64 words: magic, capacity, entries, data bytes indexed
+_LEN = struct.Struct("<I")
+
+
+def query_hash(q: str) -> int:
+    h = int.from_bytes(hashlib.blake2b(q.encode("utf-8"), digest_size=8).digest(), "little")
+    return h or 1  # 0 marks an empty slot
+
+
+class ReplayMiss(KeyError):
+    pass
+
+
+class ResponseStore:
+    """Append-only RAGResponse store with a memory-mapped hash index (read-only unless writable)."""
+
+    def __init__(self, path, writable: bool = False):
+        self.path = Path(path)
+        self.writable = writable
+        if writable:
+            self.path.mkdir(parents=True, exist_ok=True)
+        elif not (self.path / DATA_FILE).exists():
+            raise FileNotFoundError(f"No recorded responses in {self.path}")
+        self._lock = threading.RLock()
+        self._data = open(self.path / DATA_FILE, "a+b" if writable else "rb")
+        self._map: Optional[mmap.mmap] = None
+        self._map_size = 0
+        self._index: Optional[np.memmap] = None
+        self._words: Optional[memoryview] = None
+        # Records past what a read-only index covers: {query: offset}.
+        self._tail = {}
+        self._open_index()
+        self._catch_up()
+
+    # -- index -------------------------------------------------------------
+
+    def _open_index(self):
+        path = self.path / INDEX_FILE
+        if path.exists() and path.stat().st_size >= _HEADER * 8:
+            index = np.memmap(path, dtype="<u8", mode="r+" if self.writable else "r")
+            if int(index[0]) == _MAGIC and len(index) == _HEADER + 2 * int(index[1]):
+                self._map_index(index)
+                return
+            del index
+        if self.writable:
+            self._write_index(np.zeros((INITIAL_CAPACITY, 2), dtype="<u8"), entries=0, indexed=0)
+
+    def _map_index(self, index: np.memmap):
+        self._index = index
+        # Plain ints per word: a memoryview is far cheaper to probe than numpy scalar indexing.
+        self._words = memoryview(index).cast("B").cast("Q")
+
+    def _unmap_index(self):
+        if self._index is not None:
+            self._words.release()
+            if self.writable:
+                self._index.flush()
+            self._index = self._words = None
+
+    def _write_index(self, slots: np.ndarray, entries: int, indexed: int):
+        path, tmp = self.path / INDEX_FILE, self.path / (INDEX_FILE + ".tmp")
+        header = np.array([_MAGIC, len(slots), entries, indexed], dtype="<u8")
+        with open(tmp, "wb") as f:
+            header.tofile(f)
+            slots.tofile(f)
+        self._unmap_index()  # Windows cannot replace a file that is still mapped
+        os.replace(tmp, path)
+        self._map_index(np.memmap(path, dtype="<u8", mode="r+"))
+
+    @property
+    def _slots(self) -> np.ndarray:
+        return self._index[_HEADER:].reshape(-1, 2)
+
+    def _probe(self, h: int) -> int:
+        """Word position of h's key, or of the empty slot where it would go."""
+        words = self._words
+        mask = words[1] - 1
+        i = h & mask
+        while True:
+            pos = _HEADER + 2 * i
+            key = words[pos]
+            if key == 0 or key == h:
+                return pos
+            i = (i + 1) & mask
+
+    def _insert(self, h: int, offset: int):
+        words = self._words
+        if (words[2] + 1) * 2 > words[1]:
+            self._grow()
+            words = self._words
+        pos = self._probe(h)
+        if words[pos] == 0:
+            words[2] += 1
+        words[pos] = h
+        words[pos + 1] = offset
+
+    def _grow(self):
+        old = np.array(self._slots[self._slots[:, 0] != 0])
+        words = self._words
+        slots = np.zeros((2 * words[1], 2), dtype="<u8")
+        mask = len(slots) - 1
+        home = old[:, 0] & np.uint64(mask)
+        for (h, offset), i in zip(old.tolist(), home.tolist()):
+            while slots[i, 0]:
+                i = (i + 1) & mask
+            slots[i] = (h, offset)
+        self._write_index(slots, words[2], words[3])
+
+    # -- data file -----------------------------------------------------------
+
+    def _remap(self):
+        self._data.flush()
+        size = os.fstat(self._data.fileno()).st_size
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._data.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._map_size = size
+
+    def _read(self, offset: int) -> dict:
+        if self._map is None or offset + _LEN.size > self._map_size:
+            self._remap()
+        (n,) = _LEN.unpack_from(self._map, offset)
+        if offset + _LEN.size + n > self._map_size:
+            self._remap()
+        return json.loads(self._map[offset + _LEN.size:offset + _LEN.size + n])
+
+    def _catch_up(self):
+        """Index records appended after the index was last written; drop a torn trailing record."""
+        start = self._words[3] if self._index is not None else 0
+        self._remap()
+        offset = start
+        while offset + _LEN.size <= self._map_size:
+            (n,) = _LEN.unpack_from(self._map, offset)
+            end = offset + _LEN.size + n
+            if end > self._map_size:
+                break
+            q = json.loads(self._map[offset + _LEN.size:end])["q"]
+            if self.writable:
+                self._insert(query_hash(q), offset)
+            else:
+                self._tail[q] = offset
+            offset = end
+        if self.writable:
+            if offset < self._map_size:
+                self._map.close()
+                self._map = None
+                self._data.truncate(offset)
+                self._remap()
+            self._words[3] = offset
+            self._index.flush()
+
+    # -- public API ----------------------------------------------------------
+
+    def _indexed(self, q: str) -> Optional[int]:
+        if self._index is None:
+            return None
+        h = query_hash(q)
+        pos = self._probe(h)
+        return self._words[pos + 1] if self._words[pos] == h else None
+
+    def get(self, q: str) -> Optional[RAGResponse]:
+        with self._lock:
+            offset = self._tail.get(q)
+            if offset is None:
+                offset = self._indexed(q)
+            if offset is None:
+                return None
+            rec = self._read(offset)
+        if rec["q"] != q:  # 64-bit hash collision
+            return None
+        return RAGResponse(text=rec["text"], citations=rec["citations"], retrieved=rec["retrieved"])
+
+    def __contains__(self, q: str) -> bool:
+        return self.get(q) is not None
+
+    def __len__(self):
+        with self._lock:
+            indexed = self._words[2] if self._index is not None else 0
+            return indexed + sum(1 for q in self._tail if self._indexed(q) is None)
+
+    def put(self, q: str, response: RAGResponse):
+        self.put_many([(q, response)])
+
+    def put_many(self, items: Iterable[Tuple[str, RAGResponse]]):
+        if not self.writable:
+            raise PermissionError(f"{self.path} was opened read-only")
+        with self._lock:
+            self._data.seek(0, os.SEEK_END)
+            offset = self._data.tell()
+            for q, r in items:
+                payload = json.dumps({"q": q, "text": r.text, "citations": list(r.citations or []),
+                                      "retrieved": [dict(d) for d in r.retrieved or []]},
+                                     ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                self._data.write(_LEN.pack(len(payload)) + payload)
+                self._insert(query_hash(q), offset)
+                offset += _LEN.size + len(payload)
+            self._data.flush()
+            self._words[3] = offset
+
+    def queries(self) -> Iterator[str]:
+        """Every recorded query (latest record per query)."""
+        with self._lock:
+            offsets = [] if self._index is None else [int(o) for o in self._slots[self._slots[:, 0] != 0, 1]]
+            offsets += self._tail.values()
+        for offset in offsets:
+            with self._lock:
+                q = self._read(offset)["q"]
+            yield q
+
+    def data_bytes(self) -> int:
+        return os.fstat(self._data.fileno()).st_size
+
+    def close(self):
+        with self._lock:
+            self._unmap_index()
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordingRAGClient:
+    """Pass-through client that appends every answer it returns to a writable ResponseStore."""
+
+    def __init__(self, client, store: ResponseStore, concurrency=16):
+        self.client = client
+        self.store = store
+        self._async = as_async_client(client, concurrency=concurrency)
+
+    def query(self, q: str) -> RAGResponse:
+        resp = self.client.query(q)
+        self.store.put(q, resp)
+        return resp
+
+    async def aquery(self, q: str) -> RAGResponse:
+        resp = await self._async.aquery(q)
+        self.store.put(q, resp)
+        return resp
+
+    async def aquery_many(self, queries: Iterable[str], concurrency: Optional[int] = None,
+                          return_exceptions: bool = False) -> List[RAGResponse]:
+        queries = list(queries)
+        answers = await self._async.aquery_many(queries, concurrency=concurrency,
+                                                return_exceptions=return_exceptions)
+        self.store.put_many((q, a) for q, a in dict(zip(queries, answers)).items()
+                            if not isinstance(a, BaseException))
+        return answers
+
+    async def aclose(self):
+        if hasattr(self._async, "aclose"):
+            await self._async.aclose()
+
+
+class ReplayRAGClient:
+    """Answers from a ResponseStore; unrecorded queries raise ReplayMiss or go to `fallback`."""
+
+    def __init__(self, store: ResponseStore, fallback=None):
+        self.store = store
+        self.fallback = fallback
+
+    def _lookup(self, q: str, return_exceptions: bool = False) -> Optional[RAGResponse]:
+        resp = self.store.get(q)
+        instrumentation.count("fairness_rag_replay", result="miss" if resp is None else "hit")
+        if resp is None and self.fallback is None:
+            miss = ReplayMiss(f"No recorded response for {q!r} in {self.store.path}")
+            if return_exceptions:
+                return miss
+            raise miss
+        return resp
+
+    def query(self, q: str) -> RAGResponse:
+        resp = self._lookup(q)
+        return resp if resp is not None else self.fallback.query(q)
+
+    async def aquery(self, q: str) -> RAGResponse:
+        return (await self.aquery_many([q]))[0]
+
+    async def aquery_many(self, queries: Iterable[str], concurrency: Optional[int] = None,
+                          return_exceptions: bool = False) -> List[RAGResponse]:
+        queries = list(queries)
+        answers = [self._lookup(q, return_exceptions) for q in queries]
+        missing = [i for i, a in enumerate(answers) if a is None]
+        if missing:
+            fetched = await as_async_client(self.fallback).aquery_many(
+                [queries[i] for i in missing], concurrency=concurrency, return_exceptions=return_exceptions)
+            for i, a in zip(missing, fetched):
+                answers[i] = a
+        return answers
+
+    async def aclose(self):
+        if self.fallback is not None and hasattr(self.fallback, "aclose"):
+            await self.fallback.aclose()
+
+
+def configure_client(client, record: Optional[str] = None, replay: Optional[str] = None):
+    """Wrap `client` to record to and/or replay from a store (defaults: FAIRNESS_RAG_RECORD/_REPLAY).
+
+    With both, replay misses are fetched from `client` and recorded.
+    """
+    record = record if record is not None else os.environ.get("FAIRNESS_RAG_RECORD")
+    replay = replay if replay is not None else os.environ.get("FAIRNESS_RAG_REPLAY")
+    if record:
+        client = RecordingRAGClient(client, ResponseStore(record, writable=True))
+    if replay:
+        client = ReplayRAGClient(ResponseStore(replay), fallback=client if record else None)
+    return client
+
+
+def main(argv=None) -> int:
+    from utilities.fairnessEval import DATA_DIR, fetch_responses
+    from utilities.pairLoader import load_pairs
+    from utilities.rag_clientSample import HTTPRAGClient, MockRAGClient
+
+    ap = argparse.ArgumentParser(prog="rag-recorder", description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="query both sides of every pair and record the answers")
+    rec.add_argument("--store", required=True)
+    rec.add_argument("--pairs", default=str(DATA_DIR / "counterfactual_pairs.json"))
+    rec.add_argument("--shard", default=None, metavar="i/N")
+    rec.add_argument("--rag-url", default=os.environ.get("FAIRNESS_RAG_URL"),
+                     help="RAG service base URL (default: MockRAGClient)")
+    rec.add_argument("--concurrency", type=int, default=16)
+    info = sub.add_parser("info", help="print the number of recorded queries")
+    info.add_argument("--store", required=True)
+    args = ap.parse_args(argv)
+
+    if args.command == "record":
+        client = HTTPRAGClient(args.rag_url, concurrency=args.concurrency) if args.rag_url else MockRAGClient()
+        with ResponseStore(args.store, writable=True) as store:
+            pairs = load_pairs(args.pairs, shard=args.shard)
+            fetch_responses(pairs, RecordingRAGClient(client, store, concurrency=args.concurrency),
+                            concurrency=args.concurrency)
+            print(f"[rag-recorder] {len(pairs)} pairs -> {store.path} ({len(store)} queries)")
+        return 0
+    with ResponseStore(args.store) as store:
+        print(f"[rag-recorder] {store.path}: {len(store)} queries, {store.data_bytes()} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Local HTTP stand-in for the RAG service, backed by MockRAGClient.
+
+    python -m utilities.ragServer --port 8765 --latency 0.25
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utilities.rag_clientSample import MockRAGClient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/query":
+            self.send_error(404)
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            q = body["query"]
+        except (ValueError, KeyError):
+            self.send_error(400, "expected JSON body {\"query\": ...}")
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        payload = json.dumps(self.server.client.query(q).to_dict(), ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+class MockRAGServer:
+    """Threaded HTTP server answering POST /query with MockRAGClient after `latency` seconds.
+
+    Use as a context manager; port=0 picks a free port, see `url`.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, client=None):
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.latency = latency
+        self._httpd.client = client or MockRAGClient()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.0, help="artificial seconds per request")
+    args = ap.parse_args(argv)
+    server = MockRAGServer(args.host, args.port, args.latency)
+    print(f"Mock RAG server on {server.url} (latency {args.latency}s)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,82 @@
+import asyncio
+import random
+import sys
+import time
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Protocol, Sequence, Tuple
+
+from utilities import instrumentation
+from utilities.retrievalBatch import pack_retrieved, unpack_retrieved
 
-from dataclasses import dataclass
-from typing import List, Dict
 
-@dataclass
 class RAGResponse:
-    text: str
-    citations: List[str]
-    retrieved: List[Dict]
+    """One RAG answer, kept compact for caches holding many of them.
+
+    The retrieved documents are stored packed (retrievalBatch.pack_retrieved:
+    interned doc_id/source_type strings plus int16 years) and .retrieved
+    rebuilds them on first access as a tuple of read-only mappings, kept until
+    retrieved is reassigned; a list that would not round-trip (extra keys,
+    non-int years) is kept as a read-only copy.
+    To change them, assign a new list or use replace(). Citations are a tuple
+    of interned strings, since the same sources are cited across many answers.
+    """
+    __slots__ = ("text", "citations", "_names", "_years", "_raw", "_view")
+
+    def __init__(self, text: str, citations: Sequence[str] = (), retrieved: Optional[Iterable[Dict]] = ()):
+        self.text = text
+        self.citations = tuple(sys.intern(c) if type(c) is str else c for c in citations or ())
+        self.retrieved = retrieved
+
+    @property
+    def retrieved(self) -> Tuple[Mapping, ...]:
+        if self._raw is not None:
+            return self._raw
+        if self._view is None:
+            self._view = unpack_retrieved(self._names, self._years)
+        return self._view
+
+    @retrieved.setter
+    def retrieved(self, value: Optional[Iterable[Dict]]):
+        value = list(value or ())
+        self._names, self._years, exact = pack_retrieved(value)
+        self._raw = None if exact else tuple(MappingProxyType(dict(d)) for d in value)
+        self._view = None
+
+    @property
+    def packed_docs(self) -> Tuple[tuple, bytes]:
+        return self._names, self._years
+
+    def replace(self, **changes) -> "RAGResponse":
+        """A copy with the given text, citations or retrieved replaced."""
+        fields = {"text": self.text, "citations": self.citations, "retrieved": self.retrieved}
+        fields.update(changes)
+        return RAGResponse(**fields)
+
+    def to_dict(self) -> dict:
+        return {"text": self.text, "citations": list(self.citations),
+                "retrieved": [dict(d) for d in self.retrieved]}
+
+    def __eq__(self, other):
+        if not isinstance(other, RAGResponse):
+            return NotImplemented
+        return (self.text, self.citations, self._names, self._years, self._raw) == \
+            (other.text, other.citations, other._names, other._years, other._raw)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"RAGResponse(text={self.text!r}, citations={list(self.citations)!r}, "
+                f"retrieved={[dict(d) for d in self.retrieved]!r})")
+
+    def __reduce__(self):
+        return RAGResponse, (self.text, self.citations, [dict(d) for d in self.retrieved])
+
 
 class MockRAGClient:
     def __init__(self):
         pass
 
+    @instrumentation.instrumented("fairness_rag_query_seconds", client="MockRAGClient")
     def query(self, q: str) -> RAGResponse:
         ql = q.lower()
         base_text = "To file a claim, collect photos, policy number, contact support, and submit the form. Processing is fast and accurate."
@@ -56,3 +121,177 @@ class MockRAGClient:
             ]
 
         return RAGResponse(text=text, citations=citations, retrieved=retrieved)
+
+
+class AsyncRAGClient(Protocol):
+    async def aquery(self, q: str) -> RAGResponse: ...
+
+    async def aquery_many(self, queries: Iterable[str], concurrency: Optional[int] = None,
+                          return_exceptions: bool = False) -> List[RAGResponse]: ...
+
+
+class _AsyncQueryMixin:
+    """Concurrency limit, per-request timeout and retry with backoff around _aquery_once."""
+    concurrency: int = 16
+    timeout: Optional[float] = 30.0
+    retries: int = 3
+    backoff: float = 0.2
+
+    def _is_retryable(self, exc: Exception) -> bool:
+        return isinstance(exc, (asyncio.TimeoutError, OSError))
+
+    async def aquery(self, q: str) -> RAGResponse:
+        client = type(self).__name__
+        for attempt in range(self.retries + 1):
+            try:
+                with instrumentation.timer("fairness_rag_query_seconds", client=client):
+                    return await asyncio.wait_for(self._aquery_once(q), self.timeout)
+            except Exception as exc:
+                if attempt == self.retries or not self._is_retryable(exc):
+                    instrumentation.count("fairness_rag_errors", client=client, error=type(exc).__name__)
+                    raise
+                instrumentation.count("fairness_rag_retries", client=client)
+                await asyncio.sleep(self._delay(attempt))
+
+    def _delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** attempt) * (1 + random.random())
+
+    async def aquery_many(self, queries: Iterable[str], concurrency: Optional[int] = None,
+                          return_exceptions: bool = False) -> List[RAGResponse]:
+        """Answer every query (identical queries are sent once), preserving input order.
+
+        With return_exceptions=True a failed query's exception takes its place
+        instead of being raised.
+        """
+        queries = list(queries)
+        sem = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def one(q):
+            async with sem:
+                return await self.aquery(q)
+
+        uniq = list(dict.fromkeys(queries))
+        answers = dict(zip(uniq, await asyncio.gather(*(one(q) for q in uniq),
+                                                      return_exceptions=return_exceptions)))
+        return [answers[q] for q in queries]
+
+
+class AsyncRAGClientAdapter(_AsyncQueryMixin):
+    """Async interface over a blocking client such as MockRAGClient (queries run in threads)."""
+
+    def __init__(self, client, concurrency=16, timeout=30.0, retries=0):
+        self.client = client
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+
+    async def _aquery_once(self, q: str) -> RAGResponse:
+        return await asyncio.to_thread(self.client.query, q)
+
+
+def _httpx():
+    try:
+        import httpx
+    except ImportError as e:
+        raise ImportError("HTTPRAGClient requires httpx: pip install httpx") from e
+    return httpx
+
+
+class HTTPRAGClient(_AsyncQueryMixin):
+    """Pooled async client for a RAG service answering POST {base_url}/query.
+
+    The request body is {"query": q}; the response is a JSON object with the
+    RAGResponse fields (text, citations, retrieved). Blocking query() calls
+    share one keep-alive connection pool, released by close().
+    """
+
+    def __init__(self, base_url: str, concurrency=16, timeout=30.0, retries=3, backoff=0.2):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._http = None
+        self._sync_http = None
+
+    def _limits(self, httpx):
+        return httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+
+    def _client(self):
+        if self._http is None:
+            httpx = _httpx()
+            self._http = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self._limits(httpx))
+        return self._http
+
+    def _sync_client(self):
+        if self._sync_http is None:
+            httpx = _httpx()
+            self._sync_http = httpx.Client(base_url=self.base_url, timeout=self.timeout, limits=self._limits(httpx))
+        return self._sync_http
+
+    def _is_retryable(self, exc: Exception) -> bool:
+        import httpx
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code == 429 or exc.response.status_code >= 500
+        return isinstance(exc, (httpx.TransportError, asyncio.TimeoutError))
+
+    @staticmethod
+    def _response(resp) -> RAGResponse:
+        resp.raise_for_status()
+        body = resp.json()
+        return RAGResponse(text=body["text"], citations=list(body.get("citations") or []),
+                           retrieved=list(body.get("retrieved") or []))
+
+    async def _aquery_once(self, q: str) -> RAGResponse:
+        return self._response(await self._client().post("/query", json={"query": q}))
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def query(self, q: str) -> RAGResponse:
+        """Blocking aquery(): same timeout and retries, over the shared synchronous pool."""
+        client = type(self).__name__
+        for attempt in range(self.retries + 1):
+            try:
+                with instrumentation.timer("fairness_rag_query_seconds", client=client):
+                    return self._response(self._sync_client().post("/query", json={"query": q}))
+            except Exception as exc:
+                if attempt == self.retries or not self._is_retryable(exc):
+                    instrumentation.count("fairness_rag_errors", client=client, error=type(exc).__name__)
+                    raise
+                instrumentation.count("fairness_rag_retries", client=client)
+                time.sleep(self._delay(attempt))
+
+    def close(self):
+        if self._sync_http is not None:
+            self._sync_http.close()
+            self._sync_http = None
+
+
+def as_async_client(client, concurrency=16) -> AsyncRAGClient:
+    return client if hasattr(client, "aquery_many") else AsyncRAGClientAdapter(client, concurrency=concurrency)
+
+
+class PrefetchedRAGClient:
+    """Blocking client whose answers for the given queries were fetched concurrently up front."""
+
+    def __init__(self, client, queries: Iterable[str], concurrency=16):
+        self.client = client
+        queries = list(dict.fromkeys(queries))
+        async_client = as_async_client(client, concurrency=concurrency)
+
+        async def fetch():
+            try:
+                return await async_client.aquery_many(queries, concurrency=concurrency)
+            finally:
+                if hasattr(async_client, "aclose"):
+                    await async_client.aclose()
+
+        self.responses: Dict[str, RAGResponse] = dict(zip(queries, asyncio.run(fetch())))
+
+    def query(self, q: str) -> RAGResponse:
+        resp = self.responses.get(q)
+        instrumentation.count("fairness_rag_prefetch", result="miss" if resp is None else "hit")
+        return resp if resp is not None else self.client.query(q)
@@ -0,0 +1,156 @@
+"""Content-addressed cache of per-pair metric results for incremental re-evaluation.
+
+Keys hash the pair, both responses, the metric version, model id and extra
+inputs; thresholds are not part of the key, so gates are re-applied each run.
+"""
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utilities.processState import Shared, env_flag, env_int, export_stats
+
+DEFAULT_PATH = Path(__file__).resolve().parents[1] / "reports" / ".result_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 2_000_000
+_SQL_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    metric TEXT NOT NULL,
+    row TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used);
+"""
+
+
+def _digest(obj) -> bytes:
+    data = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).digest()
+
+
+def pair_fingerprint(pair: dict, response_a, response_b) -> bytes:
+    """Hash of a pair's queries and both responses."""
+    return _digest([pair["query_a"], pair["query_b"], bool(pair.get("is_lang_pair", False)),
+                    [response_a.text, list(response_a.citations or []), [dict(d) for d in response_a.retrieved or []]],
+                    [response_b.text, list(response_b.citations or []), [dict(d) for d in response_b.retrieved or []]]])
+
+
+def result_key(fingerprint: bytes, metric_fingerprint: bytes) -> bytes:
+    return hashlib.blake2b(fingerprint + metric_fingerprint, digest_size=16).digest()
+
+
+def metric_fingerprint(name: str, version: int, model_id: Optional[str], context) -> bytes:
+    return _digest([name, version, model_id, context])
+
+
+def _encode(values: Sequence[float]) -> str:
+    return json.dumps([None if isinstance(v, float) and math.isnan(v) else v for v in values])
+
+
+def _decode(row: str) -> List[float]:
+    return [math.nan if v is None else v for v in json.loads(row)]
+
+
+class ResultCache:
+    """SQLite store of {key: column values}; one connection per process (safe across fork)."""
+
+    def __init__(self, path=DEFAULT_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            self._pid = os.getpid()
+        return self._db
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, List[float]]:
+        found = {}
+        with self._lock:
+            db = self._conn()
+            for start in range(0, len(keys), _SQL_CHUNK):
+                chunk = list(keys[start:start + _SQL_CHUNK])
+                marks = ",".join("?" * len(chunk))
+                found.update((bytes(k), _decode(r)) for k, r in
+                             db.execute(f"SELECT key, row FROM results WHERE key IN ({marks})", chunk))
+            if found:
+                now = time.time()
+                with db:
+                    db.executemany("UPDATE results SET last_used=? WHERE key=?", ((now, k) for k in found))
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, metric: str, items: Sequence[Tuple[bytes, Sequence[float]]]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.executemany("INSERT OR REPLACE INTO results(key, metric, row, last_used) VALUES (?, ?, ?, ?)",
+                               ((k, metric, _encode(v), now) for k, v in items))
+            self._prune(db)
+
+    def _prune(self, db):
+        count = db.execute("SELECT count(*) FROM results").fetchone()[0]
+        if count > self.max_entries:
+            with db:
+                db.execute("DELETE FROM results WHERE key IN "
+                           "(SELECT key FROM results ORDER BY last_used LIMIT ?)", (count - self.max_entries,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn().execute("SELECT count(*) FROM results").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute("DELETE FROM results")
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        if self._db is not None and self._pid == os.getpid():
+            self._db.close()
+        self._db = None
+
+
+_CACHE: Shared[ResultCache] = Shared(lambda: ResultCache(
+    os.environ.get("FAIRNESS_RESULT_CACHE_PATH", DEFAULT_PATH), env_int("FAIRNESS_RESULT_CACHE_MAX", DEFAULT_MAX_ENTRIES)))
+
+
+def cache_enabled() -> bool:
+    return env_flag("FAIRNESS_RESULT_CACHE")
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Process-wide cache (None when FAIRNESS_RESULT_CACHE=0)."""
+    return _CACHE.get() if cache_enabled() else None
+
+
+def cache_stats() -> Dict[str, int]:
+    cache = _CACHE.peek()
+    return cache.stats() if cache is not None else {"hits": 0, "misses": 0}
+
+
+export_stats("result_cache", lambda: {"": cache_stats()})
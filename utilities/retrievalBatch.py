@@ -0,0 +1,285 @@
+"""Array form of retrieved-document lists and vectorized retrieval metrics.
+
+A RetrievalBatch holds n retrieved lists as padded (n, width) arrays: interned
+doc-id codes (int32), years (int16) and source-type codes (uint8), plus each
+list's length. RFI, DRI, authority and rank-biased overlap are then computed
+for every row at once instead of walking per-document dicts.
+
+RAGResponse keeps its retrieved list packed (see pack_retrieved), and
+RAGResponseBatch turns n responses into columns without building any dicts.
+"""
+import struct
+import sys
+import threading
+from itertools import chain
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+PAD = -1
+MISSING_YEAR = -1
+RECENCY_HORIZON = 3
+
+
+class Interner:
+    """Stable str -> int code mapping shared by the batches that are compared."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.names: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def code(self, name) -> int:
+        c = self.codes.get(name)
+        if c is None:
+            with self._lock:
+                c = self.codes.get(name)
+                if c is None:
+                    self.names.append(name)
+                    c = self.codes[name] = len(self.names) - 1
+        return c
+
+
+class SourceTypes:
+    """Source-type codes with their authority weights, built once from authority_weights.json.
+
+    Types missing from the weights share one code weighted like "unknown",
+    matching authority_score's fallback.
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        self.names = list(weights)
+        self.codes = {name: i for i, name in enumerate(self.names)}
+        self.other = len(self.names)
+        if self.other > np.iinfo(np.uint8).max:
+            raise ValueError("At most 255 source types are supported")
+        fallback = float(weights.get("unknown", 0.3))
+        self.weights = np.array([float(weights[n]) for n in self.names] + [fallback], dtype=np.float64)
+
+    def code(self, source_type) -> int:
+        return self.codes.get(source_type, self.other)
+
+
+def _year(value) -> int:
+    try:
+        y = int(value)
+    except (TypeError, ValueError):
+        return MISSING_YEAR
+    return y if 0 <= y <= np.iinfo(np.int16).max else MISSING_YEAR
+
+
+class RetrievalBatch:
+    __slots__ = ("doc_codes", "years", "source_codes", "lengths")
+
+    def __init__(self, doc_codes: np.ndarray, years: np.ndarray, source_codes: np.ndarray, lengths: np.ndarray):
+        self.doc_codes = doc_codes
+        self.years = years
+        self.source_codes = source_codes
+        self.lengths = lengths
+
+    def __len__(self):
+        return len(self.lengths)
+
+    @property
+    def width(self) -> int:
+        return self.doc_codes.shape[1]
+
+    def valid(self) -> np.ndarray:
+        return np.arange(self.width)[None, :] < self.lengths[:, None]
+
+    @classmethod
+    def from_lists(cls, retrieved_lists: Iterable[Sequence[dict]], doc_ids: Interner, sources: SourceTypes,
+                   width: Optional[int] = None) -> "RetrievalBatch":
+        lists = [list(r or []) for r in retrieved_lists]
+        width = width if width is not None else max((len(r) for r in lists), default=0)
+        n = len(lists)
+        docs = np.full((n, width), PAD, dtype=np.int32)
+        years = np.full((n, width), MISSING_YEAR, dtype=np.int16)
+        srcs = np.full((n, width), sources.other, dtype=np.uint8)
+        lengths = np.zeros(n, dtype=np.int32)
+        for i, retrieved in enumerate(lists):
+            retrieved = retrieved[:width]
+            lengths[i] = len(retrieved)
+            for j, d in enumerate(retrieved):
+                docs[i, j] = doc_ids.code(d.get("doc_id"))
+                years[i, j] = _year(d.get("year"))
+                srcs[i, j] = sources.code(d.get("source_type", "unknown"))
+        return cls(docs, years, srcs, lengths)
+
+
+_YEARS = "<i2"
+
+
+def pack_retrieved(retrieved: Optional[Iterable[dict]]) -> Tuple[tuple, bytes, bool]:
+    """Compact form of a retrieved list: (names, years, exact).
+
+    names alternates each document's doc_id and source_type (strings interned,
+    so responses citing the same documents share them and they are freed with
+    the last response); years are int16 bytes. exact is whether
+    unpack_retrieved() gives the list back: documents with other keys, a
+    missing key or a year that does not fit int16 are still packed (as
+    RetrievalBatch.from_lists would encode them) but the caller must keep the
+    original list as well.
+    """
+    names, years = [], []
+    exact = True
+    intern = sys.intern
+    for d in retrieved or ():
+        doc, year, source = d.get("doc_id"), d.get("year"), d.get("source_type", "unknown")
+        if type(year) is not int or not 0 <= year <= 32767:
+            y = _year(year)
+            exact = exact and y == year and type(year) is int
+            year = y
+        exact = exact and len(d) == 3 and "source_type" in d and type(doc) is str and type(source) is str
+        names += (intern(doc) if type(doc) is str else doc, intern(source) if type(source) is str else source)
+        years.append(year)
+    return tuple(names), (struct.pack(f"<{len(years)}h", *years) if years else b""), exact
+
+
+def unpack_retrieved(names: tuple, years: bytes) -> Tuple[Mapping, ...]:
+    """Read-only documents rebuilt from pack_retrieved() output."""
+    return tuple(MappingProxyType({"doc_id": d, "year": y, "source_type": s})
+                 for d, s, (y,) in zip(names[0::2], names[1::2], struct.iter_unpack("<h", years)))
+
+
+class RAGResponseBatch:
+    """Columns of n RAG responses: texts, citation counts and the retrieved documents.
+
+    `retrieved` is a RetrievalBatch over arrays this batch owns, built straight
+    from the responses' packed documents without building any dicts. Doc codes
+    come from the `doc_ids` interner passed in, so batches built with the same
+    interner (A and B sides) compare directly and the codes go away with it.
+    """
+    __slots__ = ("texts", "citation_counts", "retrieved")
+
+    def __init__(self, texts: List[str], citation_counts: np.ndarray, retrieved: RetrievalBatch):
+        self.texts = texts
+        self.citation_counts = citation_counts
+        self.retrieved = retrieved
+
+    def __len__(self):
+        return len(self.texts)
+
+    @classmethod
+    def from_responses(cls, responses: Sequence, doc_ids: Interner, sources: SourceTypes,
+                       width: Optional[int] = None) -> "RAGResponseBatch":
+        """Any objects with text/citations/retrieved; RAGResponse skips the dicts entirely."""
+        names, years = [], []
+        for r in responses:
+            packed = getattr(r, "packed_docs", None)
+            if packed is None:
+                packed = pack_retrieved(r.retrieved)
+            names.append(packed[0])
+            years.append(packed[1])
+        n = len(years)
+        lengths = np.fromiter((len(y) // 2 for y in years), dtype=np.int32, count=n)
+        width = int(lengths.max(initial=0)) if width is None else width
+        flat_years = np.frombuffer(b"".join(years), dtype=_YEARS)
+        flat_names = list(chain.from_iterable(names))
+        total = len(flat_years)
+        flat_docs = np.fromiter(map(doc_ids.code, flat_names[0::2]), dtype=np.int32, count=total)
+        flat_srcs = np.fromiter(map(sources.code, flat_names[1::2]), dtype=np.uint8, count=total)
+        rows = np.repeat(np.arange(n), lengths)
+        cols = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        keep = cols < width
+        rows, cols = rows[keep], cols[keep]
+        docs = np.full((n, width), PAD, dtype=np.int32)
+        yrs = np.full((n, width), MISSING_YEAR, dtype=np.int16)
+        srcs = np.full((n, width), sources.other, dtype=np.uint8)
+        docs[rows, cols] = flat_docs[keep]
+        yrs[rows, cols] = flat_years[keep]
+        srcs[rows, cols] = flat_srcs[keep]
+        counts = np.fromiter((len(r.citations or ()) for r in responses), dtype=np.int64, count=n)
+        return cls([r.text for r in responses], counts,
+                   RetrievalBatch(docs, yrs, srcs, np.minimum(lengths, width)))
+
+
+def _unique_topk(codes: np.ndarray, k: int) -> np.ndarray:
+    """Top-k codes per row, sorted, with duplicates and padding set to PAD."""
+    s = np.sort(codes[:, :k], axis=1)
+    if s.shape[1] > 1:
+        dup = s[:, 1:] == s[:, :-1]
+        s[:, 1:][dup] = PAD
+    return s
+
+
+def retrieval_fairness_indices(a: RetrievalBatch, b: RetrievalBatch, k: int = 5) -> np.ndarray:
+    """Jaccard overlap of the top-k doc ids of each row pair (1.0 when both are empty)."""
+    ua, ub = _unique_topk(a.doc_codes, k), _unique_topk(b.doc_codes, k)
+    na, nb = (ua >= 0).sum(1), (ub >= 0).sum(1)
+    both = np.sort(np.concatenate([ua, ub], axis=1), axis=1)
+    inter = ((both[:, 1:] == both[:, :-1]) & (both[:, 1:] >= 0)).sum(1)
+    union = na + nb - inter
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rfi = np.where(union > 0, inter / np.maximum(union, 1), 1.0)
+    return np.round(rfi, 4)
+
+
+def doc_recency_indices(batch: RetrievalBatch, active_year: int, horizon: int = RECENCY_HORIZON) -> np.ndarray:
+    """Share of each list's documents at most `horizon` years older than active_year."""
+    years = batch.years.astype(np.int32)
+    recent = batch.valid() & (years != MISSING_YEAR) & ((active_year - years) <= horizon)
+    return np.round(recent.sum(1) / np.maximum(batch.lengths, 1), 4)
+
+
+def authority_scores(batch: RetrievalBatch, sources: SourceTypes) -> np.ndarray:
+    """Mean authority weight of each list's sources (0.0 for empty lists)."""
+    w = np.where(batch.valid(), sources.weights[batch.source_codes], 0.0)
+    return np.round(w.sum(1) / np.maximum(batch.lengths, 1), 4)
+
+
+def rank_biased_overlaps(a: RetrievalBatch, b: RetrievalBatch, p: float = 0.9,
+                         depth: Optional[int] = None) -> np.ndarray:
+    """Extrapolated rank-biased overlap (Webber et al., 2010) of each row pair.
+
+    Unlike top-k Jaccard, agreement near the top of the rankings weighs more
+    (persistence p). Each row is evaluated to the depth of its longer list,
+    capped at `depth`; a shorter list is treated as ending in non-matching
+    documents and a repeated doc id only counts at its first rank.
+    """
+    n = len(a)
+    depth = depth or max(a.width, b.width, 1)
+    docs_a = _first_occurrence(a.doc_codes[:, :depth])
+    docs_b = _first_occurrence(b.doc_codes[:, :depth])
+    rows_depth = np.maximum(np.minimum(a.lengths, depth), np.minimum(b.lengths, depth))
+    if n == 0 or depth == 0:
+        return np.zeros(n)
+    # A document shared by both lists at ranks r and s is in the overlap from depth max(r, s) on.
+    span = int(max(docs_a.max(initial=0), docs_b.max(initial=0))) + 1
+    rows_b, ranks_b = np.nonzero(docs_b >= 0)
+    keys_b = rows_b.astype(np.int64) * span + docs_b[rows_b, ranks_b]
+    order = np.argsort(keys_b)
+    keys_b, ranks_b = keys_b[order], ranks_b[order]
+    rows_a, ranks_a = np.nonzero(docs_a >= 0)
+    keys_a = rows_a.astype(np.int64) * span + docs_a[rows_a, ranks_a]
+    pos = np.searchsorted(keys_b, keys_a)
+    found = pos < len(keys_b)
+    found[found] = keys_b[pos[found]] == keys_a[found]
+    joined = np.maximum(ranks_a[found], ranks_b[pos[found]])
+    counts = np.zeros((n, depth), dtype=np.int64)
+    np.add.at(counts, (rows_a[found], joined), 1)
+    overlap = np.cumsum(counts, axis=1)
+    d = np.arange(1, depth + 1)
+    weights = p ** d
+    in_depth = d[None, :] <= rows_depth[:, None]
+    agreement = overlap / d
+    partial = ((1 - p) / p) * np.where(in_depth, agreement * weights, 0.0).sum(1)
+    last = np.maximum(rows_depth, 1) - 1
+    tail = agreement[np.arange(n), last] * p ** np.maximum(rows_depth, 1)
+    rbo = np.where(rows_depth > 0, partial + tail, 1.0)
+    return np.round(rbo, 4)
+
+
+def _first_occurrence(codes: np.ndarray) -> np.ndarray:
+    """Copy of codes where repeats of a doc id within a row, after its first rank, are PAD."""
+    out = codes.copy()
+    if out.shape[1] > 1:
+        order = np.argsort(out, axis=1, kind="stable")
+        s = np.take_along_axis(out, order, axis=1)
+        rows, cols = np.nonzero((s[:, 1:] == s[:, :-1]) & (s[:, 1:] >= 0))
+        out[rows, order[rows, cols + 1]] = PAD
+    return out
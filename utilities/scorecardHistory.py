@@ -0,0 +1,203 @@
+"""Indexed history of fairness scorecards for trend and regression queries.
+
+    python -m utilities.scorecardHistory ingest
+    python -m utilities.scorecardHistory trend SPS --pair gender_pronoun
+    python -m utilities.scorecardHistory diff 20251028_154635 20251102_222218
+    python -m utilities.scorecardHistory regressions SPS --tolerance 0.05
+
+Ingest skips files already loaded (same name, size and mtime).
+"""
+import argparse
+import csv
+import json
+import re
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from utilities.scorecardWriter import RUN_PREFIX, iter_rows
+
+REPORTS_DIR = Path(__file__).resolve().parents[1] / "reports"
+DEFAULT_DB = REPORTS_DIR / "scorecard_history.sqlite"
+
+NON_METRIC_COLUMNS = {"pair_id", "query_a", "query_b", "is_lang_pair", "ACTIVE_YEAR", "Thresholds"}
+LOWER_IS_BETTER = {"SPG", "BLF", "ToxicityGap"}
+_TS_RE = re.compile(r"(\d{8}_\d{6})")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_ts TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    thresholds TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    run_ts TEXT NOT NULL,
+    pair_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, pair_id, metric)
+);
+CREATE INDEX IF NOT EXISTS results_metric_pair_ts ON results(metric, pair_id, run_ts);
+CREATE INDEX IF NOT EXISTS results_metric_ts ON results(metric, run_ts);
+"""
+
+
+def connect(db_path=DEFAULT_DB) -> sqlite3.Connection:
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(db_path))
+    con.execute("PRAGMA foreign_keys=ON")
+    con.executescript(_SCHEMA)
+    return con
+
+
+def _scorecard_files(reports_dir: Path) -> Iterator[Path]:
+    """One file per run: legacy JSON wins over its CSV twin, run CSVs are used as-is."""
+    legacy = {}
+    for p in reports_dir.glob("fairness_scorecard_*"):
+        if p.suffix in (".json", ".csv"):
+            if p.stem not in legacy or p.suffix == ".json":
+                legacy[p.stem] = p
+    yield from sorted(legacy.values())
+    yield from sorted(reports_dir.glob(f"{RUN_PREFIX}*.csv"))
+
+
+def _read_rows(path: Path) -> Tuple[List[dict], Optional[dict]]:
+    if path.name.startswith(RUN_PREFIX):
+        meta_path = path.with_name(path.stem + ".meta.json")
+        meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+        return list(iter_rows(path)), meta.get("Thresholds")
+    if path.suffix == ".json":
+        rows = json.loads(path.read_text(encoding="utf-8"))
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    thresholds = rows[0].get("Thresholds") if rows else None
+    return rows, thresholds if isinstance(thresholds, dict) else None
+
+
+def _metric_values(rows: Iterable[dict]) -> Iterator[Tuple[str, str, float]]:
+    for row in rows:
+        for metric, value in row.items():
+            if metric in NON_METRIC_COLUMNS or value in ("", None) or isinstance(value, bool):
+                continue
+            try:
+                yield row["pair_id"], metric, float(value)
+            except (TypeError, ValueError):
+                continue
+
+
+def ingest(con: sqlite3.Connection, reports_dir=REPORTS_DIR) -> dict:
+    """Load scorecards not seen before; returns {"loaded": n, "skipped": n}."""
+    loaded = skipped = 0
+    for path in _scorecard_files(Path(reports_dir)):
+        m = _TS_RE.search(path.name)
+        if not m:
+            continue
+        run_ts, st = m.group(1), path.stat()
+        prev = con.execute("SELECT run_id, source, size, mtime FROM runs WHERE run_ts=?", (run_ts,)).fetchone()
+        if prev is not None:
+            same_file = prev[1] == path.name and prev[2] == st.st_size and prev[3] == st.st_mtime
+            if same_file or prev[1] != path.name:
+                skipped += 1
+                continue
+        rows, thresholds = _read_rows(path)
+        with con:
+            if prev is not None:
+                con.execute("DELETE FROM runs WHERE run_id=?", (prev[0],))
+            cur = con.execute("INSERT INTO runs(run_ts, source, size, mtime, thresholds) VALUES (?, ?, ?, ?, ?)",
+                              (run_ts, path.name, st.st_size, st.st_mtime,
+                               json.dumps(thresholds) if thresholds else None))
+            run_id = cur.lastrowid
+            con.executemany("INSERT OR REPLACE INTO results(run_id, run_ts, pair_id, metric, value) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            ((run_id, run_ts, pid, metric, v) for pid, metric, v in _metric_values(rows)))
+        loaded += 1
+    return {"loaded": loaded, "skipped": skipped}
+
+
+def runs(con) -> List[str]:
+    return [r[0] for r in con.execute("SELECT run_ts FROM runs ORDER BY run_ts")]
+
+
+def trend(con, metric: str, pair_id: Optional[str] = None, since: Optional[str] = None) -> List[tuple]:
+    """(run_ts, pair_id, value) for a metric over time, oldest first."""
+    q = "SELECT run_ts, pair_id, value FROM results WHERE metric=?"
+    args = [metric]
+    if pair_id is not None:
+        q += " AND pair_id=?"
+        args.append(pair_id)
+    if since is not None:
+        q += " AND run_ts>=?"
+        args.append(since)
+    return con.execute(q + " ORDER BY pair_id, run_ts", args).fetchall()
+
+
+def diff(con, run_a: str, run_b: str, metric: Optional[str] = None, min_delta: float = 0.0) -> List[tuple]:
+    """(pair_id, metric, value_a, value_b, delta) where two runs differ by more than min_delta."""
+    q = ("SELECT b.pair_id, b.metric, a.value, b.value, b.value - a.value FROM results b "
+         "JOIN results a ON a.pair_id=b.pair_id AND a.metric=b.metric AND a.run_ts=? "
+         "WHERE b.run_ts=? AND abs(b.value - a.value) > ?")
+    args = [run_a, run_b, min_delta]
+    if metric is not None:
+        q += " AND b.metric=?"
+        args.append(metric)
+    return con.execute(q + " ORDER BY b.metric, b.pair_id", args).fetchall()
+
+
+def regressions(con, metric: str, tolerance: float = 0.0, pair_id: Optional[str] = None) -> List[tuple]:
+    """(run_ts, pair_id, previous, value) for every run where a metric got worse (gaps: rose) than before."""
+    sign = -1.0 if metric in LOWER_IS_BETTER else 1.0
+    q = ("SELECT run_ts, pair_id, prev, value FROM ("
+         " SELECT run_ts, pair_id, value, LAG(value) OVER (PARTITION BY pair_id ORDER BY run_ts) AS prev"
+         " FROM results WHERE metric=?" + (" AND pair_id=?" if pair_id else "") +
+         ") WHERE prev IS NOT NULL AND (prev - value) * ? > ? ORDER BY pair_id, run_ts")
+    args = [metric] + ([pair_id] if pair_id else []) + [sign, tolerance]
+    return con.execute(q, args).fetchall()
+
+
+def _print_rows(rows, header):
+    print("\t".join(header))
+    for r in rows:
+        print("\t".join(f"{v:.4f}" if isinstance(v, float) else str(v) for v in r))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--db", default=str(DEFAULT_DB))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("ingest")
+    p.add_argument("--reports", default=str(REPORTS_DIR))
+    p = sub.add_parser("trend")
+    p.add_argument("metric")
+    p.add_argument("--pair", default=None)
+    p.add_argument("--since", default=None)
+    p = sub.add_parser("diff")
+    p.add_argument("run_a")
+    p.add_argument("run_b")
+    p.add_argument("--metric", default=None)
+    p.add_argument("--min-delta", type=float, default=0.0)
+    p = sub.add_parser("regressions")
+    p.add_argument("metric")
+    p.add_argument("--pair", default=None)
+    p.add_argument("--tolerance", type=float, default=0.0)
+    args = ap.parse_args(argv)
+
+    con = connect(args.db)
+    if args.cmd == "ingest":
+        print(ingest(con, args.reports))
+    elif args.cmd == "trend":
+        _print_rows(trend(con, args.metric, args.pair, args.since), ["run_ts", "pair_id", args.metric])
+    elif args.cmd == "diff":
+        _print_rows(diff(con, args.run_a, args.run_b, args.metric, args.min_delta),
+                    ["pair_id", "metric", args.run_a, args.run_b, "delta"])
+    else:
+        _print_rows(regressions(con, args.metric, args.tolerance, args.pair),
+                    ["run_ts", "pair_id", "previous", args.metric])
+
+
+if __name__ == "__main__":
+    main()
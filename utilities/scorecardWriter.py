@@ -0,0 +1,182 @@
+"""Streaming fairness scorecard: rows are appended and flushed while the run is in progress.
+
+Each run writes reports/fairness_run_<ts>.csv (one compact row per pair) and a
+fairness_run_<ts>.meta.json sidecar holding run-level data such as thresholds
+and ACTIVE_YEAR once. The legacy fairness_scorecard_<ts>.csv/.json layout is
+derived on demand:
+
+    python -m utilities.scorecardWriter export reports/fairness_run_<ts>.csv
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from utilities import instrumentation
+
+RUN_PREFIX = "fairness_run_"
+TEXT_COLUMNS = ("pair_id", "query_a", "query_b")
+
+
+def _write_json_atomic(path: Path, data):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def meta_path_for(rows_path) -> Path:
+    rows_path = Path(rows_path)
+    return rows_path.with_name(rows_path.stem + ".meta.json")
+
+
+class ScorecardWriter:
+    """Append-only scorecard for one run; buffers at most `flush_every` rows in memory.
+
+    A column first seen after the header was written widens it (the file is
+    rewritten once per new column set). Nothing is written until the first flush.
+    """
+
+    def __init__(self, directory, metadata: Optional[dict] = None, run_id: Optional[str] = None,
+                 flush_every: int = 50):
+        self.run_id = run_id or datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"{RUN_PREFIX}{self.run_id}.csv"
+        self.meta_path = meta_path_for(self.path)
+        self.flush_every = max(1, int(flush_every))
+        self.metadata = {"run_id": self.run_id, "started_at": datetime.datetime.now().isoformat(),
+                         "status": "running", "rows": 0, **(metadata or {})}
+        self._buffer: List[dict] = []
+        self._fields: Optional[List[str]] = None
+        self._file = None
+        self._writer = None
+        self._count = 0
+
+    def __len__(self):
+        return self._count + len(self._buffer)
+
+    def append(self, row: dict):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def extend(self, rows: Iterable[dict]):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        with instrumentation.timer("fairness_scorecard_flush_seconds"):
+            self._flush()
+        instrumentation.count("fairness_scorecard_rows", len(self._buffer))
+        self._count += len(self._buffer)
+        self._buffer.clear()
+
+    def _flush(self):
+        fields = list(dict.fromkeys([*(self._fields or []), *(k for r in self._buffer for k in r)]))
+        if self._writer is None:
+            self._fields = fields
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.DictWriter(self._file, fieldnames=fields, restval="")
+            self._writer.writeheader()
+            _write_json_atomic(self.meta_path, self.metadata)
+        elif len(fields) > len(self._fields):
+            self._widen(fields)
+        self._writer.writerows({k: ("" if v is None else v) for k, v in r.items()} for r in self._buffer)
+        self._file.flush()
+
+    def _widen(self, fields: List[str]):
+        """Rewrite the rows written so far under a header with the new columns appended."""
+        self._file.close()
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(self.path, "r", newline="", encoding="utf-8") as src, \
+                open(tmp, "w", newline="", encoding="utf-8") as dst:
+            w = csv.DictWriter(dst, fieldnames=fields, restval="")
+            w.writeheader()
+            w.writerows(csv.DictReader(src))
+        os.replace(tmp, self.path)
+        self._fields = fields
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=fields, restval="")
+
+    def close(self, status: str = "complete"):
+        self.flush()
+        if self._file is None:
+            return  # no rows: no run files
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        self.metadata.update(status=status, rows=self._count, columns=self._fields,
+                             finished_at=datetime.datetime.now().isoformat())
+        _write_json_atomic(self.meta_path, self.metadata)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close("complete" if exc_type is None else "failed")
+
+
+def _parse_value(v: str):
+    if v == "":
+        return ""
+    if v in ("True", "False"):
+        return v == "True"
+    for cast in (int, float):
+        try:
+            return cast(v)
+        except ValueError:
+            pass
+    return v
+
+
+def iter_rows(rows_path) -> Iterable[dict]:
+    """Typed rows of a run file, streamed."""
+    with open(rows_path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield {k: (v if k in TEXT_COLUMNS else _parse_value(v)) for k, v in row.items()}
+
+
+def read_metadata(rows_path) -> Dict:
+    with open(meta_path_for(rows_path), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def export_legacy(rows_path, out_dir=None):
+    """Derive fairness_scorecard_<run_id>.csv/.json (thresholds repeated per row) from a run file."""
+    rows_path = Path(rows_path)
+    meta = read_metadata(rows_path)
+    out_dir = Path(out_dir) if out_dir else rows_path.parent
+    csv_path = out_dir / f"fairness_scorecard_{meta['run_id']}.csv"
+    json_path = out_dir / f"fairness_scorecard_{meta['run_id']}.json"
+    extra = {"ACTIVE_YEAR": meta.get("ACTIVE_YEAR", ""), "Thresholds": meta.get("Thresholds", {})}
+    rows = [{**row, **extra} for row in iter_rows(rows_path)]
+    if rows:
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=list(rows[0]))
+            w.writeheader()
+            w.writerows(rows)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+    return csv_path, json_path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Scorecard run files")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    exp = sub.add_parser("export", help="write the legacy fairness_scorecard CSV/JSON for a run")
+    exp.add_argument("rows", nargs="+")
+    exp.add_argument("--out-dir", default=None)
+    args = ap.parse_args(argv)
+    for rows in args.rows:
+        for path in export_legacy(rows, args.out_dir):
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
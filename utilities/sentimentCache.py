@@ -0,0 +1,119 @@
+"""Memoized VADER compound scores.
+
+Response texts repeat across pairs (one baseline answer is compared against
+many demographic variants), so compound scores are kept in a bounded in-process
+LRU keyed by text. compound_scores() scores each unique uncached text once,
+optionally fanning large batches out over a process pool.
+
+FAIRNESS_SENTIMENT_CACHE_MAX bounds the LRU (0 disables caching) and
+FAIRNESS_SENTIMENT_WORKERS sets the default pool size (0/1 = in-process).
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from utilities.modelRegistry import get_model
+from utilities.processState import Shared, env_int, export_stats
+
+DEFAULT_MAX_ENTRIES = 100_000
+MIN_TEXTS_PER_WORKER = 256
+
+
+class SentimentCache:
+    """Bounded LRU of text -> VADER compound score with hit/miss counters."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max(0, int(max_entries))
+        self._scores: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._scores)
+
+    def lookup(self, texts: Iterable[str]) -> Dict[str, float]:
+        """Cached scores for the given texts; each text counts once as a hit or a miss."""
+        found = {}
+        with self._lock:
+            for t in texts:
+                score = self._scores.get(t)
+                if score is None:
+                    self.misses += 1
+                else:
+                    self._scores.move_to_end(t)
+                    self.hits += 1
+                    found[t] = score
+        return found
+
+    def store(self, scores: Dict[str, float]):
+        if not self.max_entries:
+            return
+        with self._lock:
+            for t, score in scores.items():
+                self._scores[t] = score
+                self._scores.move_to_end(t)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._scores.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._scores)}
+
+
+_CACHE = Shared(lambda: SentimentCache(env_int("FAIRNESS_SENTIMENT_CACHE_MAX", DEFAULT_MAX_ENTRIES)))
+get_sentiment_cache = _CACHE.get
+
+
+def cache_stats() -> Dict[str, int]:
+    return get_sentiment_cache().stats()
+
+
+export_stats("sentiment_cache", lambda: {"": c.stats()} if (c := _CACHE.peek()) is not None else {})
+
+
+def _score_chunk(texts: List[str]) -> List[float]:
+    # Runs in pool workers too: each process loads VADER once through the registry.
+    vader = get_model("vader")
+    return [vader.polarity_scores(t)["compound"] for t in texts]
+
+
+def _default_workers() -> int:
+    return env_int("FAIRNESS_SENTIMENT_WORKERS", 0)
+
+
+def compound_scores(texts: Iterable[str], workers: Optional[int] = None,
+                    cache: Optional[SentimentCache] = None,
+                    scorer: Optional[Callable[[List[str]], Optional[list]]] = None) -> Dict[str, float]:
+    """{text: compound} for every distinct text, scoring only texts not already cached.
+
+    With workers > 1 and enough uncached texts, scoring is split across a
+    process pool; small batches stay in-process since a pool costs more to start,
+    unless scorer(texts) scores them (it returns None to decline).
+    """
+    cache = cache if cache is not None else get_sentiment_cache()
+    unique = list(dict.fromkeys(texts))
+    scores = cache.lookup(unique)
+    missing = [t for t in unique if t not in scores]
+    if not missing:
+        return scores
+    workers = _default_workers() if workers is None else workers
+    workers = min(workers, len(missing) // MIN_TEXTS_PER_WORKER)
+    if workers > 1:
+        size = -(-len(missing) // workers)
+        chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            values = [v for chunk in pool.map(_score_chunk, chunks) for v in chunk]
+    else:
+        values = scorer(missing) if scorer is not None else None
+        if values is None:
+            values = _score_chunk(missing)
+    fresh = dict(zip(missing, values))
+    cache.store(fresh)
+    scores.update(fresh)
+    return scores